@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User
+from .models import CaregiverAvailabilityOverride, User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 class UserModelAdmin(BaseUserAdmin):
@@ -29,4 +29,12 @@ class UserModelAdmin(BaseUserAdmin):
 admin.site.register(User, UserModelAdmin)
 
 
+@admin.register(CaregiverAvailabilityOverride)
+class CaregiverAvailabilityOverrideAdmin(admin.ModelAdmin):
+    list_display = ["id", "caregiver", "date", "hours_mask"]
+    list_filter = ["date"]
+    search_fields = ["caregiver__email"]
+    raw_id_fields = ["caregiver"]
+
+
 
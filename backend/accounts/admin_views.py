@@ -6,6 +6,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.shortcuts import get_object_or_404
 
+from bookings import state_machine
 from bookings.models import Booking
 from verifications.models import CaregiverVerification
 try:
@@ -13,6 +14,7 @@ try:
 except ImportError:
     Complaint = None
 
+from . import dashboards
 from .models import User, UserProfile
 
 
@@ -104,6 +106,9 @@ class AdminDashboardSummaryView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request):
+        return Response(dashboards.cached(dashboards.ADMIN_SCOPE, self.summary), status=status.HTTP_200_OK)
+
+    def summary(self):
         recent_qs = Booking.objects.select_related("family", "caregiver").order_by(
             "-date",
             "-start_time",
@@ -143,20 +148,17 @@ class AdminDashboardSummaryView(APIView):
                     }
                 )
 
-        return Response(
-            {
-                "total_users": User.objects.count(),
-                "total_caregivers": User.objects.filter(role="caregiver").count(),
-                "total_bookings": Booking.objects.count(),
-                "pending_verifications": CaregiverVerification.objects.filter(
-                    verification_status="pending"
-                ).count(),
-                "open_complaints": open_complaints,
-                "recent_bookings": recent_bookings,
-                "recent_complaints": recent_complaints,
-            },
-            status=status.HTTP_200_OK,
-        )
+        return {
+            "total_users": User.objects.count(),
+            "total_caregivers": User.objects.filter(role="caregiver").count(),
+            "total_bookings": Booking.objects.count(),
+            "pending_verifications": CaregiverVerification.objects.filter(
+                verification_status="pending"
+            ).count(),
+            "open_complaints": open_complaints,
+            "recent_bookings": recent_bookings,
+            "recent_complaints": recent_complaints,
+        }
 
 
 def _serialize_booking_for_admin(booking):
@@ -227,6 +229,11 @@ class AdminBookingDetailView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        booking.status = new_status
-        booking.save(update_fields=["status"])
+        # admins may override the transition table, but not a concurrent change
+        try:
+            state_machine.transition(booking, new_status, force=True)
+        except state_machine.SlotTaken as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except state_machine.TransitionError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
         return Response(_serialize_booking_for_admin(booking), status=status.HTTP_200_OK)
\ No newline at end of file
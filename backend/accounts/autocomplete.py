@@ -0,0 +1,237 @@
+"""
+In-memory location autocomplete for the caregiver search box.
+
+Entries come from the bundled gazetteer (accounts/data/nepal_localities.json)
+and from the profile addresses of bookable caregivers, the ones the
+directory lists. Lookups are a bisect over a sorted
+token list for prefixes, with a trigram fallback that tolerates typos
+("baneswor" still finds Baneshwor), so a keystroke never touches the DB.
+
+The index is built lazily per process and kept current by the UserProfile
+signals in accounts/signals.py. Changes saved by other processes are picked
+up by a full rebuild every AUTOCOMPLETE_REBUILD_SECONDS. That rebuild loads
+into a new index on a background thread while searches keep using the old
+one, then swaps it in and replays the signal updates that arrived meanwhile.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from . import geo
+
+logger = logging.getLogger(__name__)
+
+MIN_TRIGRAM_SCORE = 0.3
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LocationIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.built_at = None
+        self._rebuilding = False
+        self._replay = None          # [(user_id, address)] seen while a build loads
+        self._reset()
+
+    def _reset(self):
+        self.entries = {}            # normalized key -> entry dict
+        self.tokens = []             # sorted [(token, key)]
+        self.trigrams = defaultdict(set)
+        self.user_keys = {}          # bookable caregiver user_id -> normalized address key
+        self._tokens_dirty = False
+
+    # building
+
+    def build(self):
+        """Load a new index from the gazetteer and the DB, then swap it in."""
+        with self._lock:
+            self._replay = []
+        try:
+            fresh = LocationIndex()
+            fresh._load()
+            with self._lock:
+                self.entries, self.tokens = fresh.entries, fresh.tokens
+                self.trigrams, self.user_keys = fresh.trigrams, fresh.user_keys
+                self._tokens_dirty = False
+                self.built_at = time.monotonic()
+                for user_id, address in self._replay:
+                    self._update(user_id, address)
+        finally:
+            with self._lock:
+                self._replay = None
+
+    def _load(self):
+        from .models import UserProfile
+
+        for locality in geo.load_gazetteer():
+            self._add_entry(self._locality_label(locality), locality=locality)
+        rows = UserProfile.objects.filter(user__caregiver_profile__is_bookable=True).exclude(address="").values_list(
+            "user_id", "address"
+        )
+        for user_id, address in rows:
+            self._add_address(user_id, address)
+        self._rebuild_tokens()
+
+    def _rebuild_in_background(self):
+        try:
+            self.build()
+        except DatabaseError as e:
+            logger.warning("Location autocomplete rebuild failed: %s", e)
+        finally:
+            with self._lock:
+                self._rebuilding = False
+            connection.close()
+
+    def _add_entry(self, label, locality=None, count=0):
+        key = geo.normalize(label)
+        if not key:
+            return None
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = {"key": key, "label": label.strip(), "locality": locality, "count": count}
+            self.entries[key] = entry
+            for gram in _trigrams(key):
+                self.trigrams[gram].add(key)
+            self._tokens_dirty = True
+        return entry
+
+    def _locality_names(self, locality):
+        return {geo.normalize(n) for n in [locality["name"], *locality.get("aliases", [])]}
+
+    def _locality_label(self, locality):
+        if locality["district"] != locality["name"]:
+            return f"{locality['name']}, {locality['district']}"
+        return locality["name"]
+
+    def _locality_key(self, locality):
+        return geo.normalize(self._locality_label(locality))
+
+    def _add_address(self, user_id, address):
+        locality = geo.geocode(address)
+        if locality and geo.normalize(address) in self._locality_names(locality):
+            # a bare locality name ("Boudha") counts towards the gazetteer entry
+            entry = self.entries.get(self._locality_key(locality))
+        else:
+            entry = self._add_entry(" ".join(address.split()), locality=locality)
+        if entry is None:
+            return
+        entry["count"] += 1
+        self.user_keys[user_id] = entry["key"]
+        if entry["locality"]:
+            locality_entry = self.entries.get(self._locality_key(entry["locality"]))
+            if locality_entry and locality_entry is not entry:
+                locality_entry["count"] += 1
+
+    def _remove_address(self, user_id):
+        key = self.user_keys.pop(user_id, None)
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry["count"] -= 1
+        if entry["locality"]:
+            locality_entry = self.entries.get(self._locality_key(entry["locality"]))
+            if locality_entry and locality_entry is not entry:
+                locality_entry["count"] -= 1
+        if entry["count"] <= 0 and not self._is_gazetteer(entry):
+            del self.entries[key]
+            for gram in _trigrams(key):
+                self.trigrams[gram].discard(key)
+            self._tokens_dirty = True
+
+    def _is_gazetteer(self, entry):
+        return entry["locality"] is not None and self._locality_key(entry["locality"]) == entry["key"]
+
+    def _rebuild_tokens(self):
+        self.tokens = sorted(
+            (token, key) for key in self.entries for token in key.split()
+        )
+        self._tokens_dirty = False
+
+    # incremental updates (from signals)
+
+    def update_user(self, user_id, address):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((user_id, address))
+            if self.built_at is not None:  # otherwise built from the DB on first use
+                self._update(user_id, address)
+
+    def _update(self, user_id, address):
+        self._remove_address(user_id)
+        if address and address.strip():
+            self._add_address(user_id, address)
+
+    def remove_user(self, user_id):
+        self.update_user(user_id, None)
+
+    # lookups
+
+    def _ensure_fresh(self):
+        max_age = getattr(settings, "AUTOCOMPLETE_REBUILD_SECONDS", 300)
+        if self.built_at is None:
+            self.build()  # nothing to serve yet
+        elif not self._rebuilding and time.monotonic() - self.built_at > max_age:
+            self._rebuilding = True
+            threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+        if self._tokens_dirty:
+            self._rebuild_tokens()
+
+    def search(self, query, limit=8):
+        """Best matching entries for a partial location, most caregivers first."""
+        text = geo.normalize(query)
+        if not text:
+            return []
+        with self._lock:
+            self._ensure_fresh()
+            words = text.split()
+            last = words[-1]
+            # every key that has a token starting with the last (partial) word
+            matches = set()
+            i = bisect_left(self.tokens, (last, ""))
+            while i < len(self.tokens) and self.tokens[i][0].startswith(last):
+                matches.add(self.tokens[i][1])
+                i += 1
+            # earlier words are complete and must appear as whole tokens
+            head = set(words[:-1])
+            matches = [k for k in matches if head.issubset(k.split())]
+            scored = [(1.0, k) for k in matches]
+
+            if len(scored) < limit:
+                grams = _trigrams(text)
+                counts = defaultdict(int)
+                for gram in grams:
+                    for key in self.trigrams.get(gram, ()):
+                        counts[key] += 1
+                seen = set(matches)
+                for key, shared in counts.items():
+                    if key in seen:
+                        continue
+                    score = shared / len(grams | _trigrams(key))
+                    if score >= MIN_TRIGRAM_SCORE:
+                        scored.append((score, key))
+
+            entries = [(score, self.entries[key]) for score, key in scored]
+            entries.sort(key=lambda e: (-e[0], -e[1]["count"], len(e[1]["label"])))
+            return [self._payload(entry) for _, entry in entries[:limit]]
+
+    def _payload(self, entry):
+        locality = entry["locality"]
+        return {
+            "label": entry["label"],
+            "caregiver_count": max(entry["count"], 0),
+            "latitude": locality["lat"] if locality else None,
+            "longitude": locality["lng"] if locality else None,
+        }
+
+
+location_index = LocationIndex()
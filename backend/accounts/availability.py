@@ -0,0 +1,300 @@
+"""
+Structured caregiver availability.
+
+A caregiver's regular week is a 168-bit mask (bit weekday * 24 + hour, Monday
+= 0, Nepal local time) stored as 21 bytes on CaregiverProfile.weekly_availability.
+CaregiverAvailabilityOverride rows replace the mask for specific dates (a
+24-bit day mask, 0 = day off). An empty weekly mask means the caregiver has
+not set a schedule and is treated as always available; so is a mask only
+derived from the free-text available_hours (schedule_explicit False).
+
+Matching unpacks every candidate's mask into one (n, 168) boolean matrix and
+checks all requested hours in a single numpy pass.
+"""
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+HOURS_PER_WEEK = 168
+MASK_BYTES = HOURS_PER_WEEK // 8
+FULL_DAY = (1 << 24) - 1
+
+
+def empty_week():
+    return np.zeros(HOURS_PER_WEEK, dtype=bool)
+
+
+def pack_week(bits):
+    return np.packbits(np.asarray(bits, dtype=bool)).tobytes()
+
+
+def unpack_week(mask):
+    if not mask:
+        return None
+    return np.unpackbits(np.frombuffer(bytes(mask), dtype=np.uint8))[:HOURS_PER_WEEK].astype(bool)
+
+
+def mask_from_schedule(schedule):
+    """
+    {"mon": [[9, 18]], "sat": [[10, 14]]} -> 21-byte mask (end hour exclusive).
+    Raises ValueError on unknown days or bad ranges. An empty schedule gives b"".
+    """
+    if not schedule:
+        return b""
+    if not isinstance(schedule, dict):
+        raise ValueError("Availability must map days to hour ranges.")
+    bits = empty_week()
+    for day, ranges in schedule.items():
+        if day not in DAYS:
+            raise ValueError(f"Unknown day '{day}'.")
+        for hour_range in ranges or []:
+            try:
+                start, end = (int(h) for h in hour_range)
+            except (TypeError, ValueError):
+                raise ValueError("Hour ranges must be [start, end] pairs.")
+            if not 0 <= start < end <= 24:
+                raise ValueError("Hours must be between 0 and 24 with start before end.")
+            offset = DAYS.index(day) * 24
+            bits[offset + start:offset + end] = True
+    return pack_week(bits) if bits.any() else b""
+
+
+def _hour_ranges(day_bits):
+    """24 booleans -> [[start, end], ...] (end exclusive)."""
+    ranges, start = [], None
+    for hour in range(25):
+        on = hour < 24 and day_bits[hour]
+        if on and start is None:
+            start = hour
+        elif not on and start is not None:
+            ranges.append([start, hour])
+            start = None
+    return ranges
+
+
+def schedule_from_mask(mask):
+    """Inverse of mask_from_schedule; {} when unconstrained."""
+    bits = unpack_week(mask)
+    if bits is None:
+        return {}
+    schedule = {}
+    for index, day in enumerate(DAYS):
+        ranges = _hour_ranges(bits[index * 24:(index + 1) * 24])
+        if ranges:
+            schedule[day] = ranges
+    return schedule
+
+
+def day_mask_from_ranges(ranges):
+    """[[9, 13], [15, 18]] -> 24-bit day mask (bit n = hour n); [] is a day off."""
+    if not isinstance(ranges, list):
+        raise ValueError("Hours must be a list of [start, end] pairs.")
+    mask = 0
+    for hour_range in ranges:
+        try:
+            start, end = (int(h) for h in hour_range)
+        except (TypeError, ValueError):
+            raise ValueError("Hour ranges must be [start, end] pairs.")
+        if not 0 <= start < end <= 24:
+            raise ValueError("Hours must be between 0 and 24 with start before end.")
+        mask |= ((1 << (end - start)) - 1) << start
+    return mask
+
+
+def ranges_from_day_mask(mask):
+    """Inverse of day_mask_from_ranges."""
+    return _hour_ranges([bool((mask >> hour) & 1) for hour in range(24)])
+
+
+_DAY_NAMES = {
+    "mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5, "sun": 6, "sunday": 6,
+}
+_DAY = "|".join(sorted(_DAY_NAMES, key=len, reverse=True))
+_TOKEN_RE = re.compile(
+    # order matters: day ranges before single days
+    rf"\b({_DAY})\b\.?\s*(?:-|–|—|to|till|until)\s*({_DAY})\b"
+    r"|(?P<time>\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s*(?:-|–|—|to|till|until)\s*(\d{1,2})(?::(\d{2}))?\s*(am|pm)?)"
+    rf"|\b(?P<day>{_DAY})\b"
+    r"|\b(?P<keyword>weekdays?|weekends?|daily|every\s*day|all\s*week)\b"
+)
+_KEYWORD_DAYS = {"weekday": range(5), "weekend": (5, 6)}
+
+
+def _to_hour(hour, meridiem, default_meridiem=None):
+    hour = int(hour)
+    meridiem = meridiem or default_meridiem
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    return hour
+
+
+def _hour_range(match):
+    """(start, end) hours for a time token; end may be <= start for overnight shifts."""
+    start_hour, start_min, start_mer, end_hour, end_min, end_mer = match.groups()[3:9]
+    end = _to_hour(end_hour, end_mer, default_meridiem="pm" if start_mer == "am" else None)
+    start = _to_hour(start_hour, start_mer)
+    if not start_mer and end_mer == "pm" and start + 12 < end:
+        start += 12  # "1-5pm"
+    if end_min and int(end_min) > 0:
+        end += 1  # 5:30 -> hour 17 still partly worked
+    if not (0 <= start < 24 and 0 <= end <= 24) or start == end:
+        return None
+    return start, end
+
+
+def _days(match):
+    if match.group(1):
+        first, last = _DAY_NAMES[match.group(1)], _DAY_NAMES[match.group(2)]
+        return [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+    if match.group("day"):
+        return [_DAY_NAMES[match.group("day")]]
+    keyword = match.group("keyword").rstrip("s")
+    return list(_KEYWORD_DAYS.get(keyword, range(7)))
+
+
+def parse_available_hours(text):
+    """
+    Best-effort parse of the free-text available_hours into a weekly mask:
+    "Mon–Sat, 9AM – 6PM", "Mon-Fri 9am-5pm, Sat 10am-2pm",
+    "9am-12pm and 3pm-6pm daily". Day names and hour ranges are read as
+    alternating groups; each hour group applies to the days next to it (the
+    days before it, or after it when the text starts with hours), and hours
+    with no days at all apply to every day. Returns b"" (unconstrained) when
+    nothing usable is found.
+    """
+    # [["days", [...]] | ["hours", [(start, end), ...]]], consecutive tokens merged
+    groups = []
+    for match in _TOKEN_RE.finditer((text or "").lower()):
+        if match.group("time"):
+            kind, value = "hours", _hour_range(match)
+            if value is None:
+                continue
+        else:
+            kind, value = "days", _days(match)
+        if groups and groups[-1][0] == kind:
+            groups[-1][1].extend(value if kind == "days" else [value])
+        else:
+            groups.append([kind, list(value) if kind == "days" else [value]])
+
+    if not any(kind == "hours" for kind, _ in groups):
+        return b""
+    hours_first = groups[0][0] == "hours"
+    pairs = []  # [(days, hour ranges)]
+    for i, (kind, value) in enumerate(groups):
+        if kind != "hours":
+            continue
+        neighbour = i + 1 if hours_first else i - 1
+        if 0 <= neighbour < len(groups):
+            pairs.append((groups[neighbour][1], value))
+        elif hours_first or not pairs:
+            pairs.append((range(7), value))
+        else:
+            # "Mon 9-12, 2-5": more hours for the same days
+            pairs.append((pairs[-1][0], value))
+
+    bits = empty_week()
+    for days, ranges in pairs:
+        for day in days:
+            for start, end in ranges:
+                if start < end:
+                    bits[day * 24 + start:day * 24 + end] = True
+                else:
+                    # overnight: runs into the next day
+                    bits[day * 24 + start:day * 24 + 24] = True
+                    next_day = (day + 1) % 7
+                    bits[next_day * 24:next_day * 24 + end] = True
+    return pack_week(bits) if bits.any() else b""
+
+
+def enforced_mask(weekly_availability, explicit):
+    """
+    The mask bookings are checked against: only a schedule the caregiver set
+    explicitly; one derived from free-text available_hours is informational.
+    """
+    return weekly_availability if explicit else b""
+
+
+def requested_hours(date, start_time, duration_hours):
+    """[(date, hour), ...] touched by a booking, crossing midnight if needed."""
+    start = datetime.combine(date, start_time)
+    end = start + timedelta(hours=float(duration_hours))
+    slot = start.replace(minute=0, second=0, microsecond=0)
+    hours = []
+    while slot < end:
+        hours.append((slot.date(), slot.hour))
+        slot += timedelta(hours=1)
+    return hours
+
+
+def available_user_ids(rows, date, start_time, duration_hours, overrides=None):
+    """
+    rows: [(user_id, weekly_mask bytes)]. overrides: {(user_id, date): day_mask}.
+    Returns the set of user ids free for every requested hour.
+    """
+    if not rows:
+        return set()
+    hours = requested_hours(date, start_time, duration_hours)
+    week_index = np.array([d.weekday() * 24 + h for d, h in hours], dtype=np.intp)
+
+    user_ids = np.array([user_id for user_id, _ in rows])
+    has_mask = np.array([bool(mask) for _, mask in rows])
+    packed = np.zeros((len(rows), MASK_BYTES), dtype=np.uint8)
+    for i, (_, mask) in enumerate(rows):
+        if mask:
+            packed[i] = np.frombuffer(bytes(mask), dtype=np.uint8)
+    week = np.unpackbits(packed, axis=1)[:, :HOURS_PER_WEEK].astype(bool)
+
+    # (n, requested hours) matrix; unset schedules count as free
+    free = week[:, week_index] | ~has_mask[:, None]
+
+    if overrides:
+        position = {user_id: i for i, user_id in enumerate(user_ids.tolist())}
+        for (user_id, day), day_mask in overrides.items():
+            row = position.get(user_id)
+            if row is None:
+                continue
+            for col, (d, h) in enumerate(hours):
+                if d == day:
+                    free[row, col] = bool((day_mask >> h) & 1)
+
+    return set(user_ids[free.all(axis=1)].tolist())
+
+
+def load_overrides(user_ids, date, start_time, duration_hours):
+    """
+    {(user_id, date): day_mask} for the dates a booking touches; user_ids None
+    loads every caregiver's overrides for those dates (a handful of rows).
+    """
+    from .models import CaregiverAvailabilityOverride
+
+    dates = {d for d, _ in requested_hours(date, start_time, duration_hours)}
+    rows = CaregiverAvailabilityOverride.objects.filter(date__in=dates)
+    if user_ids is not None:
+        rows = rows.filter(caregiver_id__in=user_ids)
+    return {(user_id, day): mask for user_id, day, mask in rows.values_list("caregiver_id", "date", "hours_mask")}
+
+
+def filter_available(profiles, date, start_time, duration_hours):
+    """
+    CaregiverProfile objects (a queryset or list) who work at the requested
+    time, in their original order. Runs over the rows already loaded, so no
+    id list goes back to the database.
+    """
+    profiles = list(profiles)
+    rows = [(p.user_id, enforced_mask(p.weekly_availability, p.schedule_explicit)) for p in profiles]
+    overrides = load_overrides(None, date, start_time, duration_hours)
+    free = available_user_ids(rows, date, start_time, duration_hours, overrides)
+    return [p for p in profiles if p.user_id in free]
+
+
+def is_available(caregiver_profile, date, start_time, duration_hours):
+    mask = enforced_mask(caregiver_profile.weekly_availability, caregiver_profile.schedule_explicit)
+    rows = [(caregiver_profile.user_id, mask)]
+    overrides = load_overrides([caregiver_profile.user_id], date, start_time, duration_hours)
+    return bool(available_user_ids(rows, date, start_time, duration_hours, overrides))
@@ -0,0 +1,41 @@
+"""
+Cached dashboard summaries.
+
+The caregiver, careseeker and admin home screens poll their summary
+endpoints. Each response is cached whole through backend/cache.py:
+
+    dashboard:v<version>:<user_id>     one user's caregiver/careseeker summary
+    dashboard:v<version>:admin         the admin summary (platform-wide)
+
+Versions are bumped after commit by the signals in accounts/signals.py
+when a booking, payment, review, caregiver profile or verification of that
+user changes (and the admin version for anything the admin summary
+counts), so an unchanged dashboard is served from the L1/Redis entry
+without touching the database. The TTL only bounds the purely time-driven
+parts: pending requests expiring and upcoming bookings ending.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from backend import cache
+
+NAMESPACE = "dashboard"
+ADMIN_SCOPE = "admin"
+
+
+def cached(scope, compute):
+    """compute() -> response data, cached for scope (a user id or ADMIN_SCOPE)."""
+    return cache.get_or_compute(NAMESPACE, [], compute, ttl=settings.DASHBOARD_CACHE_TTL_SECONDS, scope=scope)
+
+
+def invalidate(*user_ids, admin=True):
+    """Drop the dashboards of user_ids (and the admin one) once the transaction commits."""
+    scopes = {user_id for user_id in user_ids if user_id is not None}
+    if admin:
+        scopes.add(ADMIN_SCOPE)
+
+    def bump():
+        for scope in scopes:
+            cache.bump(NAMESPACE, scope=scope)
+
+    transaction.on_commit(bump)
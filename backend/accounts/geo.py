@@ -0,0 +1,151 @@
+"""
+Offline geocoding and proximity search for profile addresses.
+
+Addresses are matched against a bundled gazetteer of Nepal localities
+(accounts/data/nepal_localities.json), so no external geocoding service is
+needed. A matched profile stores latitude/longitude plus a geohash, and
+radius queries first prune by the geohash cells covering the search box
+(an indexed prefix match), then rank the survivors by exact haversine
+distance computed in one numpy pass.
+"""
+import json
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "nepal_localities.json"
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 7  # ~150 m cells, plenty for a home locality
+MAX_SEARCH_CELLS = 16
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def normalize(text):
+    """Lowercase, strip punctuation and collapse spaces."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split())
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    with open(GAZETTEER_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=1)
+def _name_index():
+    """[(normalized name or alias, locality)], longest first."""
+    entries = []
+    for locality in load_gazetteer():
+        for name in [locality["name"], *locality.get("aliases", [])]:
+            entries.append((normalize(name), locality))
+    entries.sort(key=lambda e: -len(e[0]))
+    return entries
+
+
+def geocode(address):
+    """
+    Return the gazetteer locality an address refers to, or None.
+
+    Addresses are usually written most specific first ("Baneshwor,
+    Kathmandu"), so the earliest matching name wins, longest on ties.
+    """
+    text = f" {normalize(address)} "
+    if not text.strip():
+        return None
+    best, best_pos = None, None
+    for name, locality in _name_index():
+        pos = text.find(f" {name} ")
+        if pos != -1 and (best_pos is None or pos < best_pos):
+            best, best_pos = locality, pos
+    return best
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            bit = lng >= mid
+            lng_lo, lng_hi = (mid, lng_hi) if bit else (lng_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            bit = lat >= mid
+            lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+        value = (value << 1) | int(bit)
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def _cell_size_deg(precision):
+    """(lat, lng) size in degrees of a geohash cell."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def covering_cells(lat, lng, radius_km):
+    """
+    Geohash prefixes whose cells together cover the radius around a point,
+    at the finest precision that needs no more than MAX_SEARCH_CELLS.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlng = dlat / max(math.cos(math.radians(lat)), 0.01)
+    lat_min, lat_max = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    lng_min, lng_max = lng - dlng, lng + dlng
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lng = _cell_size_deg(precision)
+        rows = math.ceil((lat_max - lat_min) / cell_lat) + 1
+        cols = math.ceil((lng_max - lng_min) / cell_lng) + 1
+        if rows * cols <= MAX_SEARCH_CELLS or precision == 1:
+            break
+
+    cells = set()
+    for i in range(rows + 1):
+        cell_y = min(lat_min + i * cell_lat, lat_max)
+        for j in range(cols + 1):
+            cell_x = min(lng_min + j * cell_lng, lng_max)
+            cells.add(geohash_encode(cell_y, ((cell_x + 180) % 360) - 180, precision))
+    return sorted(cells)
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distances in km from one point to arrays of points."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def parse_near(value):
+    """'lat,lng' -> (lat, lng) floats, or raise ValueError."""
+    parts = (value or "").split(",")
+    if len(parts) != 2:
+        raise ValueError("near must be lat,lng")
+    lat, lng = float(parts[0]), float(parts[1])
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("near is out of range")
+    return lat, lng
+
+
+def apply_geocode(profile):
+    """Set latitude/longitude/geohash on a UserProfile from its address."""
+    locality = geocode(profile.address)
+    if locality:
+        profile.latitude = locality["lat"]
+        profile.longitude = locality["lng"]
+        profile.geohash = geohash_encode(locality["lat"], locality["lng"])
+    else:
+        profile.latitude = profile.longitude = None
+        profile.geohash = ""
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts import presence
+
+
+class Command(BaseCommand):
+    help = "Write buffered last_seen timestamps from Redis presence to the users table."
+
+    def handle(self, *args, **options):
+        updated = presence.flush_last_seen()
+        self.stdout.write(f"Flushed last_seen for {updated} user(s).")
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:51
+
+import json
+import re
+from pathlib import Path
+
+from django.db import migrations, models
+
+# Frozen copy of the accounts.geo logic used as of this migration, so later
+# changes to that module don't change (or break) what it writes.
+
+GAZETTEER_PATH = Path(__file__).resolve().parent.parent / "data" / "nepal_localities.json"
+GEOHASH_PRECISION = 7
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def normalize(text):
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split())
+
+
+def geocode(address, names):
+    """Earliest matching gazetteer name wins, longest on ties."""
+    text = f" {normalize(address)} "
+    if not text.strip():
+        return None
+    best, best_pos = None, None
+    for name, locality in names:
+        pos = text.find(f" {name} ")
+        if pos != -1 and (best_pos is None or pos < best_pos):
+            best, best_pos = locality, pos
+    return best
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            bit = lng >= mid
+            lng_lo, lng_hi = (mid, lng_hi) if bit else (lng_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            bit = lat >= mid
+            lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+        value = (value << 1) | int(bit)
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geocode_existing_profiles(apps, schema_editor):
+    if not GAZETTEER_PATH.exists():
+        # profiles are geocoded again on their next save
+        return
+    with open(GAZETTEER_PATH, encoding="utf-8") as f:
+        gazetteer = json.load(f)
+    names = sorted(
+        (
+            (normalize(name), locality)
+            for locality in gazetteer
+            for name in [locality["name"], *locality.get("aliases", [])]
+        ),
+        key=lambda entry: -len(entry[0]),
+    )
+
+    UserProfile = apps.get_model("accounts", "UserProfile")
+    profiles = list(UserProfile.objects.exclude(address=""))
+    for profile in profiles:
+        locality = geocode(profile.address, names)
+        if locality:
+            profile.latitude, profile.longitude = locality["lat"], locality["lng"]
+            profile.geohash = geohash_encode(locality["lat"], locality["lng"])
+    UserProfile.objects.bulk_update(profiles, ["latitude", "longitude", "geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_remove_caregiverprofile_languages_spoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(geocode_existing_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_userprofile_geo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='caregiverprofile',
+            name='weekly_availability',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.CreateModel(
+            name='CaregiverAvailabilityOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hours_mask', models.PositiveIntegerField(default=0)),
+                ('caregiver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_overrides', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('caregiver', 'date'), name='unique_availability_override')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+# the services offered in the app today (frontend SERVICE_TYPES)
+DEFAULT_SERVICES = [
+    ("Elderly Companionship", "Support and companionship for older adults."),
+    ("Daily Living Assistance", "Help with daily tasks such as dressing and mobility."),
+    ("Medication Reminders", "Support to ensure medications are taken on time."),
+    ("Light Household Help", "Basic cleaning and household assistance."),
+    ("Hospital & Clinic Escort", "Accompaniment to medical visits and follow-ups."),
+    ("Physiotherapy Support", "Help with recovery exercises and gentle movement support."),
+]
+
+
+def link_existing_services(apps, schema_editor):
+    ServiceType = apps.get_model("accounts", "ServiceType")
+    CaregiverProfile = apps.get_model("accounts", "CaregiverProfile")
+    ServiceType.objects.bulk_create(
+        [ServiceType(name=name, description=description) for name, description in DEFAULT_SERVICES],
+        ignore_conflicts=True,
+    )
+    profiles = list(CaregiverProfile.objects.exclude(service_types=[]))
+    names = {n.strip() for p in profiles for n in p.service_types or [] if n and n.strip()}
+    ServiceType.objects.bulk_create([ServiceType(name=n) for n in names], ignore_conflicts=True)
+    ids = dict(ServiceType.objects.values_list("name", "id"))
+    Through = CaregiverProfile.services.through
+    Through.objects.bulk_create(
+        [
+            Through(caregiverprofile_id=p.id, servicetype_id=ids[n])
+            for p in profiles
+            for n in {n.strip() for n in p.service_types or [] if n and n.strip()}
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_caregiver_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('description', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='caregiverprofile',
+            name='services',
+            field=models.ManyToManyField(blank=True, related_name='caregivers', to='accounts.servicetype'),
+        ),
+        migrations.RunPython(link_existing_services, migrations.RunPython.noop),
+    ]
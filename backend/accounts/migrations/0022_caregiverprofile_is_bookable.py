@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def backfill_bookable(apps, schema_editor):
+    CaregiverProfile = apps.get_model("accounts", "CaregiverProfile")
+    CaregiverVerification = apps.get_model("verifications", "CaregiverVerification")
+    approved = CaregiverVerification.objects.filter(verification_status="approved").values("user_id")
+    (
+        CaregiverProfile.objects.filter(user_id__in=approved)
+        .exclude(service_types=[])
+        .exclude(available_hours="")
+        .update(is_bookable=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0021_service_catalog"),
+        ("verifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="caregiverprofile",
+            name="is_bookable",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="caregiverprofile",
+            index=models.Index(
+                condition=models.Q(("is_bookable", True)), fields=["user"], name="caregiver_bookable_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_bookable, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,149 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:39
+
+import re
+
+import numpy as np
+from django.db import migrations, models
+
+# Frozen copy of accounts.availability.parse_available_hours as of this
+# migration, so later parser changes don't change what it writes.
+
+HOURS_PER_WEEK = 168
+
+
+def empty_week():
+    return np.zeros(HOURS_PER_WEEK, dtype=bool)
+
+
+def pack_week(bits):
+    return np.packbits(np.asarray(bits, dtype=bool)).tobytes()
+
+
+_DAY_NAMES = {
+    "mon": 0, "monday": 0, "tue": 1, "tues": 1, "tuesday": 1, "wed": 2, "wednesday": 2,
+    "thu": 3, "thur": 3, "thurs": 3, "thursday": 3, "fri": 4, "friday": 4,
+    "sat": 5, "saturday": 5, "sun": 6, "sunday": 6,
+}
+_DAY = "|".join(sorted(_DAY_NAMES, key=len, reverse=True))
+_TOKEN_RE = re.compile(
+    # order matters: day ranges before single days
+    rf"\b({_DAY})\b\.?\s*(?:-|–|—|to|till|until)\s*({_DAY})\b"
+    r"|(?P<time>\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)?\s*(?:-|–|—|to|till|until)\s*(\d{1,2})(?::(\d{2}))?\s*(am|pm)?)"
+    rf"|\b(?P<day>{_DAY})\b"
+    r"|\b(?P<keyword>weekdays?|weekends?|daily|every\s*day|all\s*week)\b"
+)
+_KEYWORD_DAYS = {"weekday": range(5), "weekend": (5, 6)}
+
+
+def _to_hour(hour, meridiem, default_meridiem=None):
+    hour = int(hour)
+    meridiem = meridiem or default_meridiem
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0
+    return hour
+
+
+def _hour_range(match):
+    """(start, end) hours for a time token; end may be <= start for overnight shifts."""
+    start_hour, start_min, start_mer, end_hour, end_min, end_mer = match.groups()[3:9]
+    end = _to_hour(end_hour, end_mer, default_meridiem="pm" if start_mer == "am" else None)
+    start = _to_hour(start_hour, start_mer)
+    if not start_mer and end_mer == "pm" and start + 12 < end:
+        start += 12  # "1-5pm"
+    if end_min and int(end_min) > 0:
+        end += 1  # 5:30 -> hour 17 still partly worked
+    if not (0 <= start < 24 and 0 <= end <= 24) or start == end:
+        return None
+    return start, end
+
+
+def _days(match):
+    if match.group(1):
+        first, last = _DAY_NAMES[match.group(1)], _DAY_NAMES[match.group(2)]
+        return [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+    if match.group("day"):
+        return [_DAY_NAMES[match.group("day")]]
+    keyword = match.group("keyword").rstrip("s")
+    return list(_KEYWORD_DAYS.get(keyword, range(7)))
+
+
+def parse_available_hours(text):
+    """
+    Best-effort parse of the free-text available_hours into a weekly mask:
+    "Mon–Sat, 9AM – 6PM", "Mon-Fri 9am-5pm, Sat 10am-2pm",
+    "9am-12pm and 3pm-6pm daily". Day names and hour ranges are read as
+    alternating groups; each hour group applies to the days next to it (the
+    days before it, or after it when the text starts with hours), and hours
+    with no days at all apply to every day. Returns b"" (unconstrained) when
+    nothing usable is found.
+    """
+    # [["days", [...]] | ["hours", [(start, end), ...]]], consecutive tokens merged
+    groups = []
+    for match in _TOKEN_RE.finditer((text or "").lower()):
+        if match.group("time"):
+            kind, value = "hours", _hour_range(match)
+            if value is None:
+                continue
+        else:
+            kind, value = "days", _days(match)
+        if groups and groups[-1][0] == kind:
+            groups[-1][1].extend(value if kind == "days" else [value])
+        else:
+            groups.append([kind, list(value) if kind == "days" else [value]])
+
+    if not any(kind == "hours" for kind, _ in groups):
+        return b""
+    hours_first = groups[0][0] == "hours"
+    pairs = []  # [(days, hour ranges)]
+    for i, (kind, value) in enumerate(groups):
+        if kind != "hours":
+            continue
+        neighbour = i + 1 if hours_first else i - 1
+        if 0 <= neighbour < len(groups):
+            pairs.append((groups[neighbour][1], value))
+        elif hours_first or not pairs:
+            pairs.append((range(7), value))
+        else:
+            # "Mon 9-12, 2-5": more hours for the same days
+            pairs.append((pairs[-1][0], value))
+
+    bits = empty_week()
+    for days, ranges in pairs:
+        for day in days:
+            for start, end in ranges:
+                if start < end:
+                    bits[day * 24 + start:day * 24 + end] = True
+                else:
+                    # overnight: runs into the next day
+                    bits[day * 24 + start:day * 24 + 24] = True
+                    next_day = (day + 1) % 7
+                    bits[next_day * 24:next_day * 24 + end] = True
+    return pack_week(bits) if bits.any() else b""
+
+
+def reparse_available_hours(apps, schema_editor):
+    # the only backfill of masks derived from available_hours (0020 adds the
+    # column empty); for display, derived masks are not enforced
+    CaregiverProfile = apps.get_model("accounts", "CaregiverProfile")
+    profiles = list(CaregiverProfile.objects.all())
+    for profile in profiles:
+        profile.weekly_availability = parse_available_hours(profile.available_hours)
+    CaregiverProfile.objects.bulk_update(profiles, ["weekly_availability"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0022_caregiverprofile_is_bookable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='caregiverprofile',
+            name='schedule_explicit',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(reparse_available_hours, migrations.RunPython.noop),
+    ]
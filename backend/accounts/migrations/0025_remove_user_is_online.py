@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 20:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_userprofile_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='is_online',
+        ),
+    ]
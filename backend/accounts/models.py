@@ -45,8 +45,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     otp = models.CharField(max_length=6, blank=True, null=True)
     otp_created_at = models.DateTimeField(blank=True, null=True)
 
-    # tracking who's online for chat - real-time updates via WebSocket
-    is_online = models.BooleanField(default=False)
+    # when the user was last connected; live presence is in Redis (accounts/presence.py)
     last_seen = models.DateTimeField(null=True, blank=True)
     push_token = models.CharField(max_length=255, blank=True, null=True)
 
@@ -78,12 +77,41 @@ class User(AbstractBaseUser, PermissionsMixin):
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     phone = models.CharField(max_length=20, blank=True)
-    address = models.TextField(blank=True)  # TODO: maybe filter profiles by distance later
+    address = models.TextField(blank=True)
     profile_image = models.ImageField(upload_to="profiles/", null=True, blank=True)
+    # filled from address by accounts/geo.py (offline gazetteer) for distance search
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)  # conversation list ETag (chat/views.py)
 
     def __str__(self):
         return f"Profile: {self.user.email}"
 
+# catalog of services caregivers offer and families book; the service_types
+# JSON lists stay the API shape, the M2M links below are the indexed copy
+class ServiceType(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    description = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def for_names(cls, names):
+        """Catalog rows for a service_types list, adding any new names."""
+        names = {n.strip() for n in names or [] if n and n.strip()}
+        existing = list(cls.objects.filter(name__in=names))
+        missing = names - {s.name for s in existing}
+        if missing:
+            cls.objects.bulk_create([cls(name=n) for n in missing], ignore_conflicts=True)
+            existing = list(cls.objects.filter(name__in=names))
+        return existing
+
+
 # only caregivers need this - describes what they offer and their experience
 class CaregiverProfile(models.Model):
     GENDER_CHOICES = (
@@ -93,16 +121,48 @@ class CaregiverProfile(models.Model):
     )
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="caregiver_profile")
     service_types = models.JSONField(default=list, blank=True)  # caregiver services offered
+    services = models.ManyToManyField(ServiceType, blank=True, related_name="caregivers")
     training_authority = models.CharField(max_length=255, blank=True)
     certification_year = models.IntegerField(null=True, blank=True)
     available_hours = models.CharField(max_length=255, blank=True)
     bio = models.TextField(blank=True)
     gender = models.CharField(max_length=20, choices=GENDER_CHOICES, blank=True, null=True)
     hourly_rate = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # 168-bit week mask, see accounts/availability.py; empty = no schedule set
+    weekly_availability = models.BinaryField(default=b"", blank=True)
+    # set via availability_schedule; masks parsed from available_hours are not enforced
+    schedule_explicit = models.BooleanField(default=False)
+    # verified + services + hours; maintained by accounts/signals.py
+    is_bookable = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user"], condition=models.Q(is_bookable=True), name="caregiver_bookable_idx"),
+        ]
 
     def __str__(self):
         return f"Caregiver Data: {self.user.email}"
 
+    @property
+    def profile_complete(self):
+        return bool(self.service_types) and bool(self.available_hours)
+
+
+class CaregiverAvailabilityOverride(models.Model):
+    # replaces the weekly schedule for one date (holiday, extra shift)
+    caregiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="availability_overrides")
+    date = models.DateField()
+    hours_mask = models.PositiveIntegerField(default=0)  # bit n = hour n, 0 = day off
+
+    class Meta:
+        ordering = ["date"]
+        constraints = [
+            models.UniqueConstraint(fields=["caregiver", "date"], name="unique_availability_override"),
+        ]
+
+    def __str__(self):
+        return f"Availability override {self.caregiver_id} on {self.date}"
+
 
 class Emergency(models.Model):
     STATUS_PENDING = "pending"
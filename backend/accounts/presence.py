@@ -0,0 +1,190 @@
+"""
+Presence store (who is online, when they were last seen) kept in Redis.
+
+Every open chat socket registers a connection for its user. A user is online
+while at least one of their connections has a fresh heartbeat, so closing one
+tab out of two keeps them online, and a crashed worker's connections simply
+age out after PRESENCE_TTL_SECONDS.
+
+last_seen is buffered in Redis and written to User.last_seen in batches by
+flush_last_seen(), so socket churn no longer turns into users-table writes.
+
+Redis keys:
+    presence:conns:<user_id>          sorted set, member = connection id, score = expiry timestamp
+    presence:last_seen                hash, user_id -> unix timestamp not yet written to the DB
+    presence:last_seen:flushing:<id>  batch taken by flush_last_seen(); left behind on error, retried next flush
+    presence:flush_lock               short lock so only one process flushes per interval
+"""
+import logging
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from django.conf import settings
+
+from backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_KEY = "presence:last_seen"
+FLUSH_LOCK_KEY = "presence:flush_lock"
+
+
+def _conns_key(user_id):
+    return f"presence:conns:{user_id}"
+
+
+def _ttl():
+    return settings.PRESENCE_TTL_SECONDS
+
+
+def connect(user_id, connection_id):
+    """
+    Register a connection. Returns True when this is the user's first live
+    connection (offline -> online transition), False otherwise or on error.
+    """
+    now = time.time()
+    key = _conns_key(user_id)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zadd(key, {connection_id: now + _ttl()})
+        pipe.zcard(key)
+        pipe.expire(key, _ttl())
+        pipe.hset(LAST_SEEN_KEY, user_id, now)
+        _, _, count, _, _ = pipe.execute()
+        return count == 1
+    except redis.RedisError as e:
+        logger.warning("Presence connect failed for user %s: %s", user_id, e)
+        return False
+
+
+def heartbeat(user_id, connection_id):
+    """Extend a live connection's expiry and remember the user as seen now."""
+    now = time.time()
+    key = _conns_key(user_id)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zadd(key, {connection_id: now + _ttl()}, xx=True)
+        pipe.expire(key, _ttl())
+        pipe.hset(LAST_SEEN_KEY, user_id, now)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Presence heartbeat failed for user %s: %s", user_id, e)
+
+
+def disconnect(user_id, connection_id):
+    """
+    Drop a connection. Returns True when it was the user's last live
+    connection (online -> offline transition).
+    """
+    now = time.time()
+    key = _conns_key(user_id)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zrem(key, connection_id)
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zcard(key)
+        pipe.hset(LAST_SEEN_KEY, user_id, now)
+        _, _, count, _ = pipe.execute()
+        return count == 0
+    except redis.RedisError as e:
+        logger.warning("Presence disconnect failed for user %s: %s", user_id, e)
+        return False
+
+
+def connection_count(user_id):
+    """Number of live (non-expired) connections for a user."""
+    try:
+        return get_redis().zcount(_conns_key(user_id), time.time(), "+inf")
+    except redis.RedisError as e:
+        logger.warning("Presence count failed for user %s: %s", user_id, e)
+        return 0
+
+
+def get_status(user_id, db_last_seen=None):
+    """
+    Return {"is_online": bool, "last_seen": iso string or None}.
+
+    db_last_seen is the User.last_seen column; used when Redis has nothing
+    newer. Returns None if Redis is unavailable so callers can fall back.
+    """
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zcount(_conns_key(user_id), time.time(), "+inf")
+        pipe.hget(LAST_SEEN_KEY, user_id)
+        count, pending_ts = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Presence lookup failed for user %s: %s", user_id, e)
+        return None
+
+    last_seen = db_last_seen
+    if pending_ts:
+        last_seen = datetime.fromtimestamp(float(pending_ts), tz=dt_timezone.utc)
+    return {
+        "is_online": count > 0,
+        "last_seen": last_seen.isoformat() if last_seen else None,
+    }
+
+
+def maybe_flush_last_seen():
+    """Flush buffered last_seen values if no other process did so this interval."""
+    try:
+        acquired = get_redis().set(
+            FLUSH_LOCK_KEY, "1", nx=True, ex=settings.PRESENCE_FLUSH_INTERVAL_SECONDS
+        )
+    except redis.RedisError as e:
+        logger.warning("Presence flush lock failed: %s", e)
+        return 0
+    if not acquired:
+        return 0
+    return flush_last_seen()
+
+
+def flush_last_seen():
+    """
+    Write buffered last_seen timestamps to the users table in one batch.
+    Batches left behind by a failed flush are picked up again. Returns the
+    number of users updated.
+    """
+    from accounts.models import User
+
+    client = get_redis()
+    try:
+        batch_keys = list(client.scan_iter(match=f"{LAST_SEEN_KEY}:flushing:*", count=100))
+    except redis.RedisError as e:
+        logger.warning("Presence flush failed: %s", e)
+        return 0
+
+    # rename first so timestamps written during the flush land in a fresh hash
+    batch_key = f"{LAST_SEEN_KEY}:flushing:{uuid.uuid4().hex}"
+    try:
+        client.rename(LAST_SEEN_KEY, batch_key)
+        client.expire(batch_key, 24 * 3600)
+        batch_keys.append(batch_key)
+    except redis.ResponseError:
+        pass  # nothing new buffered
+    except redis.RedisError as e:
+        logger.warning("Presence flush failed: %s", e)
+        return 0
+    if not batch_keys:
+        return 0
+
+    try:
+        # a user may appear in several batches; the newest timestamp wins
+        pending = {}
+        for key in batch_keys:
+            for user_id, ts in client.hgetall(key).items():
+                pending[user_id] = max(float(ts), pending.get(user_id, 0.0))
+        users = [
+            User(id=int(user_id), last_seen=datetime.fromtimestamp(ts, tz=dt_timezone.utc))
+            for user_id, ts in pending.items()
+        ]
+        # ids of deleted users simply match no row
+        User.objects.bulk_update(users, ["last_seen"], batch_size=500)
+        client.delete(*batch_keys)
+        return len(users)
+    except Exception as e:
+        logger.warning("Presence flush failed, keeping batches %s: %s", batch_keys, e)
+        return 0
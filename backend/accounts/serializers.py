@@ -2,6 +2,8 @@ import os
 
 from rest_framework import serializers
 from accounts.models import *
+from accounts import availability
+from backend.sparse import SparseFieldsMixin
 from django.utils.encoding import smart_str, force_bytes
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.contrib.auth.tokens import PasswordResetTokenGenerator
@@ -162,6 +164,9 @@ class SavePushTokenSerializer(serializers.Serializer):
 
 
 class CaregiverProfileSerializer(serializers.ModelSerializer):
+    # {"mon": [[9, 18]], ...}; stored as a 168-bit mask, see accounts/availability.py
+    availability_schedule = serializers.JSONField(required=False)
+
     class Meta:
         model = CaregiverProfile
         fields = [
@@ -169,12 +174,77 @@ class CaregiverProfileSerializer(serializers.ModelSerializer):
             "training_authority",
             "certification_year",
             "available_hours",
+            "availability_schedule",
             "bio",
             "gender",
             "hourly_rate"
         ]
 
-class UserProfileSerializer(serializers.ModelSerializer):
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["availability_schedule"] = availability.schedule_from_mask(instance.weekly_availability)
+        return data
+
+    def validate_availability_schedule(self, value):
+        try:
+            return availability.mask_from_schedule(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def _apply_schedule(self, validated_data):
+        mask = validated_data.pop("availability_schedule", None)
+        if mask is not None:
+            # only an explicit schedule is enforced on bookings and search
+            validated_data["weekly_availability"] = mask
+            validated_data["schedule_explicit"] = bool(mask)
+        elif "available_hours" in validated_data and not (self.instance and self.instance.schedule_explicit):
+            # no structured schedule: a best-effort mask from the free text, for display only
+            validated_data["weekly_availability"] = availability.parse_available_hours(
+                validated_data["available_hours"]
+            )
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self._apply_schedule(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self._apply_schedule(validated_data))
+
+class CaregiverAvailabilityOverrideSerializer(serializers.ModelSerializer):
+    # [[start, end], ...] worked that day instead of the weekly schedule; [] = day off
+    hours = serializers.JSONField()
+
+    class Meta:
+        model = CaregiverAvailabilityOverride
+        fields = ["date", "hours"]
+
+    def to_representation(self, instance):
+        return {
+            "date": instance.date.isoformat(),
+            "hours": availability.ranges_from_day_mask(instance.hours_mask),
+        }
+
+    def validate_date(self, value):
+        if value < now().date():
+            raise serializers.ValidationError("Date must not be in the past.")
+        return value
+
+    def validate_hours(self, value):
+        try:
+            return availability.day_mask_from_ranges(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def create(self, validated_data):
+        # one override per date: posting the same date again replaces it
+        override, _ = CaregiverAvailabilityOverride.objects.update_or_create(
+            caregiver=self.context["request"].user,
+            date=validated_data["date"],
+            defaults={"hours_mask": validated_data["hours"]},
+        )
+        return override
+
+class UserProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     email = serializers.EmailField(source="user.email", read_only=True)
     username = serializers.CharField(source="user.username", read_only=True)
     role = serializers.CharField(source="user.role", read_only=True)
@@ -258,30 +328,19 @@ class SendPasswordResetEmailSerializer(serializers.Serializer):
         fields = ['email']
 
     def validate_email(self, value):
-        from django.core.cache import cache
-        from django.utils import timezone
-        import time
+        from backend import cache
         if User.objects.filter(email=value).exists():
             user = User.objects.get(email=value)
-            now_ts = int(time.time())
-            email_key = f"reset_req_{value.lower()}"
-            hourly_key = f"reset_hour_{value.lower()}"
+            email = value.lower()
 
-            # prevents them from spamming reset requests
-            last_req = cache.get(email_key)
-            if last_req and now_ts - last_req < 60:
+            # prevents them from spamming reset requests (limits are shared by all workers)
+            if not cache.allow("reset-cooldown", email, 1, 60):
                 raise serializers.ValidationError("Please wait 60 seconds before requesting another reset link.")
 
             # max 5 resets per hour to prevent abuse
-            req_times = cache.get(hourly_key, [])
-            req_times = [t for t in req_times if now_ts - t < 3600]
-            if len(req_times) >= 5:
+            if not cache.allow("reset-hourly", email, 5, 3600):
                 raise serializers.ValidationError("Too many reset attempts. Please try again later.")
 
-            cache.set(email_key, now_ts, timeout=3600)
-            req_times.append(now_ts)
-            cache.set(hourly_key, req_times, timeout=3600)
-
             uid = urlsafe_base64_encode(force_bytes(user.id))
             token = PasswordResetTokenGenerator().make_token(user)
             frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
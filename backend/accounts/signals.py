@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from bookings.models import Booking
+from payments.models import Payment
+from reviews.models import Review
+from verifications.models import CaregiverVerification
+try:
+    from complaints.models import Complaint
+except ImportError:
+    Complaint = None
+
+from backend import cache
+
+from . import dashboards, geo
+from .autocomplete import location_index
+from .models import CaregiverAvailabilityOverride, CaregiverProfile, ServiceType, User, UserProfile
+
+
+@receiver(pre_save, sender=UserProfile)
+def _geocode_profile_address(instance, update_fields=None, **kwargs):
+    """Keep latitude/longitude/geohash in step with the address (full saves only)."""
+    if update_fields is None:
+        geo.apply_geocode(instance)
+
+
+def _index_address(user_id, bookable, address=None):
+    """Autocomplete lists bookable caregivers' addresses only, like the directory."""
+    if location_index.built_at is None:
+        return  # built from the DB on first use
+    if bookable:
+        if address is None:
+            address = UserProfile.objects.filter(user_id=user_id).values_list("address", flat=True).first()
+        location_index.update_user(user_id, address)
+    else:
+        location_index.remove_user(user_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def _index_profile_address(instance, **kwargs):
+    """Keep the location autocomplete index current for bookable caregivers."""
+    if instance.user.role == "caregiver":
+        bookable = CaregiverProfile.objects.filter(user_id=instance.user_id, is_bookable=True).exists()
+        _index_address(instance.user_id, bookable, instance.address)
+
+
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=CaregiverProfile)
+def _unindex_profile_address(instance, **kwargs):
+    location_index.remove_user(instance.user_id)
+
+
+@receiver(post_save, sender=CaregiverProfile)
+def _sync_caregiver_services(instance, update_fields=None, **kwargs):
+    """Mirror service_types into the indexed catalog links."""
+    if update_fields is None or "service_types" in update_fields:
+        instance.services.set(ServiceType.for_names(instance.service_types))
+
+
+def _sync_bookable(user_id, profile=None):
+    """Recompute CaregiverProfile.is_bookable (verified and profile complete)."""
+    profile = profile or CaregiverProfile.objects.filter(user_id=user_id).first()
+    if profile is None:
+        return
+    bookable = profile.profile_complete and CaregiverVerification.objects.filter(
+        user_id=user_id, verification_status="approved"
+    ).exists()
+    if bookable != profile.is_bookable:
+        CaregiverProfile.objects.filter(pk=profile.pk).update(is_bookable=bookable)
+        profile.is_bookable = bookable
+        _index_address(user_id, bookable)
+
+
+@receiver(post_save, sender=CaregiverProfile)
+def _caregiver_profile_bookable(instance, update_fields=None, **kwargs):
+    if update_fields is None or {"service_types", "available_hours"} & set(update_fields):
+        _sync_bookable(instance.user_id, instance)
+
+
+@receiver(post_save, sender=CaregiverVerification)
+@receiver(post_delete, sender=CaregiverVerification)
+def _verification_bookable(instance, **kwargs):
+    _sync_bookable(instance.user_id)
+
+
+# dashboard summaries, see accounts/dashboards.py
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def _booking_dashboards(instance, **kwargs):
+    dashboards.invalidate(instance.family_id, instance.caregiver_id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def _payment_dashboards(instance, **kwargs):
+    dashboards.invalidate(instance.caregiver_id, instance.careseeker_id, admin=False)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def _review_dashboards(instance, **kwargs):
+    dashboards.invalidate(instance.caregiver_id, instance.careseeker_id, admin=False)
+
+
+@receiver(post_save, sender=CaregiverProfile)
+def _caregiver_profile_dashboard(instance, **kwargs):
+    dashboards.invalidate(instance.user_id, admin=False)
+
+
+@receiver(post_save, sender=CaregiverVerification)
+@receiver(post_delete, sender=CaregiverVerification)
+def _verification_dashboards(instance, **kwargs):
+    dashboards.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def _user_created_dashboard(instance, created, **kwargs):
+    if created:
+        dashboards.invalidate()
+
+
+@receiver(post_delete, sender=User)
+def _user_deleted_dashboard(instance, **kwargs):
+    dashboards.invalidate()
+
+
+if Complaint:
+    @receiver(post_save, sender=Complaint)
+    @receiver(post_delete, sender=Complaint)
+    def _complaint_dashboard(instance, **kwargs):
+        dashboards.invalidate()
+
+
+# ranked directory searches (bookings.views.VerifiedCaregiverListView); the
+# short TTL covers ranking changes, these cover who is listed at all
+@receiver(post_save, sender=CaregiverProfile)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=CaregiverProfile)
+@receiver(post_save, sender=CaregiverVerification)
+@receiver(post_delete, sender=CaregiverVerification)
+@receiver(post_save, sender=CaregiverAvailabilityOverride)
+@receiver(post_delete, sender=CaregiverAvailabilityOverride)
+def _directory_changed(**kwargs):
+    transaction.on_commit(lambda: cache.bump("directory"))
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest.mock import patch
 from accounts.models import User
 
@@ -74,3 +74,460 @@ class LoginTests(TestCase):
         }, content_type='application/json')
         self.assertEqual(response.status_code, 404)
 
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+    "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "l1"},
+})
+class SharedCacheTests(TestCase):
+
+    @patch('accounts.utils.Util.send_email')
+    def test_password_reset_cooldown(self, mock_email):
+        User.objects.create_user(
+            email='gita.rai@gmail.com', username='gitarai', password='Gita@2081', role='careseeker'
+        )
+        first = self.client.post('/api/user/send-reset-password-email/', {'email': 'gita.rai@gmail.com'})
+        second = self.client.post('/api/user/send-reset-password-email/', {'email': 'gita.rai@gmail.com'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(mock_email.call_count, 1)
+
+    def test_get_or_compute_until_bumped(self):
+        from backend import cache
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cache.get_or_compute("test", [1], compute, ttl=60, scope=7), 1)
+        self.assertEqual(cache.get_or_compute("test", [1], compute, ttl=60, scope=7), 1)
+        cache.bump("test", scope=7)
+        self.assertEqual(cache.get_or_compute("test", [1], compute, ttl=60, scope=7), 2)
+
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+        "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "l1"},
+    },
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class DashboardCacheTests(TestCase):
+
+    def test_dashboard_cached_until_booking_changes(self):
+        from datetime import date, time, timedelta
+        from bookings.models import Booking
+        caregiver = User.objects.create_user(
+            email='sunita.gurung@gmail.com', username='sunitagurung', password='Sunita@2081', role='caregiver'
+        )
+        family = User.objects.create_user(
+            email='ramesh.kc@gmail.com', username='rameshkc', password='Ramesh@2081', role='careseeker'
+        )
+        for user in (caregiver, family):
+            user.is_verified = True
+            user.save()
+        token = self.client.post('/api/user/login/', {
+            'email': 'sunita.gurung@gmail.com', 'password': 'Sunita@2081'
+        }, content_type='application/json').data['token']
+
+        def summary():
+            return self.client.get('/api/caregiver/dashboard-summary/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.assertEqual(summary().data['pending_requests'], 0)
+        # served from cache: only the JWT user lookup hits the database
+        with self.assertNumQueries(1):
+            self.assertEqual(summary().data['pending_requests'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                family=family, caregiver=caregiver, service_types=['Elderly Companionship'],
+                date=date.today() + timedelta(days=2), start_time=time(10, 0), duration_hours=2,
+                person_name='Hari', person_age=70, emergency_contact_phone='9800000000',
+                service_address='Patan', total_amount=1000,
+            )
+        self.assertEqual(summary().data['pending_requests'], 1)
+
+
+class ProfileGeocodeTests(TestCase):
+
+    def test_address_geocoded_from_gazetteer(self):
+        from accounts import geo
+        from accounts.models import UserProfile
+        user = User.objects.create_user(
+            email='bina.thapa@gmail.com',
+            username='binathapa',
+            password='Bina@2081',
+            role='caregiver'
+        )
+        profile = UserProfile.objects.create(user=user, address='Jawalakhel, Lalitpur')
+        self.assertAlmostEqual(profile.latitude, 27.6727)
+        self.assertTrue(profile.geohash.startswith('tuut'))
+        # a 5 km search from Kathmandu centre prunes to cells that include it
+        cells = geo.covering_cells(27.7172, 85.3240, 5)
+        self.assertTrue(any(profile.geohash.startswith(c) for c in cells))
+
+
+class ProfileSparseFieldsTests(TestCase):
+
+    def test_profile_fields_and_exclude(self):
+        from accounts.models import CaregiverProfile, UserProfile
+        caregiver = User.objects.create_user(
+            email='anita.lama@gmail.com', username='anitalama', password='Anita@2081', role='caregiver'
+        )
+        caregiver.is_verified = True
+        caregiver.save()
+        UserProfile.objects.create(user=caregiver, phone='9841000000')
+        CaregiverProfile.objects.create(user=caregiver, service_types=['Elderly Companionship'])
+        token = self.client.post('/api/user/login/', {
+            'email': 'anita.lama@gmail.com', 'password': 'Anita@2081'
+        }, content_type='application/json').data['token']
+
+        def profile(params):
+            return self.client.get('/api/user/profile/', params, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        full = profile({}).data
+        self.assertEqual(
+            list(full),
+            ['email', 'username', 'role', 'phone', 'address', 'profile_image',
+             'review_count', 'average_rating', 'caregiver_details', 'verification_status'],
+        )
+        # auth, then the profile row; no caregiver details, verification or reviews
+        with self.assertNumQueries(2):
+            response = profile({'fields': 'username,phone'})
+        self.assertEqual(response.data, {'username': 'anitalama', 'phone': '9841000000'})
+
+        response = profile({'exclude': 'caregiver_details'})
+        self.assertEqual(response.data['review_count'], 0)
+        self.assertNotIn('caregiver_details', response.data)
+        self.assertEqual(profile({'fields': 'password'}).status_code, 400)
+
+
+class LocationAutocompleteTests(TestCase):
+
+    def test_suggestions_follow_profile_edits(self):
+        from accounts.autocomplete import LocationIndex
+        from accounts.models import UserProfile
+        index = LocationIndex()
+        index.build()
+        # typo still finds the gazetteer locality
+        self.assertEqual(index.search('baneswor')[0]['label'], 'Baneshwor, Kathmandu')
+
+        user = User.objects.create_user(
+            email='anil.shah@gmail.com',
+            username='anilshah',
+            password='Anil@2081',
+            role='caregiver'
+        )
+        profile = UserProfile.objects.create(user=user, address='Sanepa, Lalitpur')
+        index.update_user(user.id, profile.address)
+        self.assertEqual(index.search('sane')[0]['caregiver_count'], 1)
+
+        index.update_user(user.id, 'Dhulikhel')
+        self.assertEqual(index.search('sane')[0]['caregiver_count'], 0)
+        self.assertEqual(index.search('dhuli')[0]['caregiver_count'], 1)
+
+
+    def test_only_bookable_caregivers_are_indexed(self):
+        from accounts.autocomplete import LocationIndex
+        from accounts.models import CaregiverProfile, UserProfile
+        user = User.objects.create_user(
+            email='nabin.bk@gmail.com', username='nabinbk', password='Nabin@2081', role='caregiver'
+        )
+        UserProfile.objects.create(user=user, address='Jhamsikhel Marg 14, Lalitpur')
+        caregiver_profile = CaregiverProfile.objects.create(user=user)
+        index = LocationIndex()
+
+        index.build()
+        self.assertNotIn('Jhamsikhel Marg 14, Lalitpur', [s['label'] for s in index.search('jhamsikhel marg')])
+
+        CaregiverProfile.objects.filter(pk=caregiver_profile.pk).update(is_bookable=True)
+        index.build()
+        suggestion = index.search('jhamsikhel marg')[0]
+        self.assertEqual((suggestion['label'], suggestion['caregiver_count']), ('Jhamsikhel Marg 14, Lalitpur', 1))
+
+    @override_settings(AUTOCOMPLETE_REBUILD_SECONDS=0)
+    def test_stale_index_is_rebuilt_off_the_request_path(self):
+        from accounts.autocomplete import LocationIndex
+        from accounts.models import CaregiverProfile, UserProfile
+        index = LocationIndex()
+        index.build()
+        user = User.objects.create_user(
+            email='puja.shrestha@gmail.com', username='pujashrestha', password='Puja@2081', role='caregiver'
+        )
+        # saved by "another process": no signal reaches this index
+        UserProfile.objects.bulk_create([UserProfile(user=user, address='Kupondole Height, Lalitpur')])
+        CaregiverProfile.objects.bulk_create([CaregiverProfile(user=user, is_bookable=True)])
+
+        def labels(query):
+            return [s['label'] for s in index.search(query)]
+
+        started = []
+        with patch('accounts.autocomplete.threading.Thread') as thread:
+            thread.side_effect = lambda target, daemon: started.append(target) or thread.return_value
+            # the old index answers at once; one rebuild is queued, not one per search
+            self.assertNotIn('Kupondole Height, Lalitpur', labels('kupondole height'))
+            self.assertNotIn('Kupondole Height, Lalitpur', labels('kupondole height'))
+        self.assertEqual(len(started), 1)
+
+        # the caregiver moves while the rebuild reads the DB; the signal update
+        # is replayed onto the new index instead of being lost in the swap
+        load = LocationIndex._load
+
+        def load_then_move(fresh):
+            load(fresh)
+            self.assertIn(user.id, fresh.user_keys)
+            index.update_user(user.id, 'Sanepa, Lalitpur')
+
+        with patch.object(LocationIndex, '_load', load_then_move), patch('accounts.autocomplete.connection'):
+            started[0]()
+        self.assertEqual(index.search('sanepa')[0]['caregiver_count'], 1)
+        self.assertNotIn('Kupondole Height, Lalitpur', labels('kupondole height'))
+
+class CaregiverAvailabilityTests(TestCase):
+
+    def test_schedule_mask_matching_and_overrides(self):
+        from datetime import date, time
+        from accounts import availability
+        from accounts.models import CaregiverAvailabilityOverride, CaregiverProfile
+        # Mon 9-18, Sat 10-14 round-trips through the 21-byte mask
+        schedule = {'mon': [[9, 18]], 'sat': [[10, 14]]}
+        mask = availability.mask_from_schedule(schedule)
+        self.assertEqual(len(mask), availability.MASK_BYTES)
+        self.assertEqual(availability.schedule_from_mask(mask), schedule)
+        self.assertEqual(
+            availability.schedule_from_mask(availability.parse_available_hours('Mon–Sat, 9AM – 6PM')),
+            {day: [[9, 18]] for day in ('mon', 'tue', 'wed', 'thu', 'fri', 'sat')},
+        )
+
+        weekday = User.objects.create_user(
+            email='sita.rai@gmail.com', username='sitarai', password='Sita@2081', role='caregiver'
+        )
+        anytime = User.objects.create_user(
+            email='ram.kc@gmail.com', username='ramkc', password='Ram@2081', role='caregiver'
+        )
+        CaregiverProfile.objects.create(user=weekday, weekly_availability=mask, schedule_explicit=True)
+        # a mask derived from free text is shown but not enforced
+        CaregiverProfile.objects.create(
+            user=anytime, available_hours='Mon 9AM-10AM', weekly_availability=availability.parse_available_hours('Mon 9AM-10AM'),
+        )
+        profiles = CaregiverProfile.objects.all()
+        monday = date(2026, 3, 2)
+
+        def free(day, start, hours):
+            return {p.user_id for p in availability.filter_available(profiles, day, start, hours)}
+
+        self.assertEqual(free(monday, time(10, 0), 2), {weekday.id, anytime.id})
+        # runs past 18:00, and Sunday is off
+        self.assertEqual(free(monday, time(17, 30), 1), {anytime.id})
+        self.assertEqual(free(date(2026, 3, 8), time(10, 0), 1), {anytime.id})
+
+        CaregiverAvailabilityOverride.objects.create(caregiver=weekday, date=monday, hours_mask=0)
+        self.assertEqual(free(monday, time(10, 0), 2), {anytime.id})
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    def test_overrides_set_by_caregiver_decide_bookings(self):
+        from datetime import timedelta
+        from django.utils.timezone import localdate
+        from accounts.models import CaregiverAvailabilityOverride
+        from bookings.models import Booking
+        from verifications.models import CaregiverVerification
+        caregiver = User.objects.create_user(
+            email='bina.magar@gmail.com', username='binamagar', password='Bina@2081', role='caregiver'
+        )
+        family = User.objects.create_user(
+            email='hira.joshi@gmail.com', username='hirajoshi', password='Hira@2081', role='careseeker'
+        )
+        User.objects.filter(pk__in=[caregiver.pk, family.pk]).update(is_verified=True)
+        CaregiverVerification.objects.create(user=caregiver, verification_status='approved')
+
+        def login(email, password):
+            return self.client.post(
+                '/api/user/login/', {'email': email, 'password': password}, content_type='application/json'
+            ).data['token']
+
+        caregiver_auth = f"Bearer {login('bina.magar@gmail.com', 'Bina@2081')}"
+        family_auth = f"Bearer {login('hira.joshi@gmail.com', 'Hira@2081')}"
+        self.client.patch(
+            '/api/user/profile/caregiver/',
+            {
+                'service_types': ['Elderly Companionship'], 'available_hours': '9AM - 6PM',
+                'availability_schedule': {day: [[9, 18]] for day in ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')},
+            },
+            content_type='application/json', HTTP_AUTHORIZATION=caregiver_auth,
+        )
+        day = localdate() + timedelta(days=3)
+
+        def book(start_time):
+            return self.client.post('/api/bookings/', {
+                'caregiver': caregiver.id, 'service_types': ['Elderly Companionship'], 'date': day.isoformat(),
+                'start_time': start_time, 'duration_hours': 2, 'service_address': 'Lalitpur, Patan',
+                'emergency_contact_phone': '9841234567', 'person_name': 'Shanti Devi', 'person_age': 80,
+            }, content_type='application/json', HTTP_AUTHORIZATION=family_auth)
+
+        # that day only early morning: 07:00 opens up, 10:00 is blocked
+        response = self.client.post(
+            '/api/user/profile/caregiver/availability-overrides/', {'date': day.isoformat(), 'hours': [[6, 9]]},
+            content_type='application/json', HTTP_AUTHORIZATION=caregiver_auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'date': day.isoformat(), 'hours': [[6, 9]]})
+        self.assertEqual(CaregiverAvailabilityOverride.objects.get(caregiver=caregiver).hours_mask, 0b111 << 6)
+        self.assertEqual(book('10:00').status_code, 400)
+        self.assertEqual(book('07:00').status_code, 201)
+
+        listed = self.client.get('/api/user/profile/caregiver/availability-overrides/', HTTP_AUTHORIZATION=caregiver_auth)
+        self.assertEqual(listed.data, [{'date': day.isoformat(), 'hours': [[6, 9]]}])
+
+        # back to the weekly schedule (once the pending request is answered)
+        url = f'/api/user/profile/caregiver/availability-overrides/{day.isoformat()}/'
+        self.assertEqual(self.client.delete(url, HTTP_AUTHORIZATION=caregiver_auth).status_code, 204)
+        Booking.objects.filter(caregiver=caregiver).update(status='rejected')
+        self.assertEqual(book('10:00').status_code, 201)
+
+        bad = self.client.post(
+            '/api/user/profile/caregiver/availability-overrides/', {'date': day.isoformat(), 'hours': [[9, 25]]},
+            content_type='application/json', HTTP_AUTHORIZATION=caregiver_auth,
+        )
+        self.assertEqual(bad.status_code, 400)
+        forbidden = self.client.get('/api/user/profile/caregiver/availability-overrides/', HTTP_AUTHORIZATION=family_auth)
+        self.assertEqual(forbidden.status_code, 403)
+
+    def test_free_text_hours_with_several_segments(self):
+        from accounts import availability
+
+        def parsed(text):
+            return availability.schedule_from_mask(availability.parse_available_hours(text))
+
+        weekdays = ('mon', 'tue', 'wed', 'thu', 'fri')
+        self.assertEqual(
+            parsed('Mon-Fri 9am-5pm, Sat 10am-2pm'),
+            {**{day: [[9, 17]] for day in weekdays}, 'sat': [[10, 14]]},
+        )
+        self.assertEqual(
+            parsed('9am-12pm and 3pm-6pm daily'),
+            {day: [[9, 12], [15, 18]] for day in availability.DAYS},
+        )
+        self.assertEqual(
+            parsed('Weekdays 8am to 4:30pm; weekends 10-2pm'),
+            {**{day: [[8, 17]] for day in weekdays}, 'sat': [[10, 14]], 'sun': [[10, 14]]},
+        )
+        self.assertEqual(parsed('Mon, Wed, Fri 1-5pm'), {day: [[13, 17]] for day in ('mon', 'wed', 'fri')})
+        self.assertEqual(parsed('Mon 9-12, 2-5pm'), {'mon': [[9, 12], [14, 17]]})
+        self.assertEqual(parsed('Sat 10pm-6am'), {'sat': [[22, 24]], 'sun': [[0, 6]]})
+        self.assertEqual(parsed('Sunday to Tuesday 10am-5pm'), {day: [[10, 17]] for day in ('sun', 'mon', 'tue')})
+        # "monitoring" is not Monday; no days means every day
+        self.assertEqual(parsed('Monitoring, 9-5pm'), {day: [[9, 17]] for day in availability.DAYS})
+        self.assertEqual(parsed('flexible'), {})
+
+    def test_free_text_hours_do_not_constrain_bookings(self):
+        from accounts import availability
+        from accounts.models import CaregiverProfile
+        caregiver = User.objects.create_user(
+            email='hari.thapa@gmail.com', username='harithapa', password='Hari@2081', role='caregiver'
+        )
+        caregiver.is_verified = True
+        caregiver.save()
+        token = self.client.post('/api/user/login/', {
+            'email': 'hari.thapa@gmail.com', 'password': 'Hari@2081'
+        }, content_type='application/json').data['token']
+
+        def update(data):
+            response = self.client.patch(
+                '/api/user/profile/caregiver/', data, content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {token}',
+            )
+            self.assertEqual(response.status_code, 200)
+            return CaregiverProfile.objects.get(user=caregiver)
+
+        profile = update({'available_hours': 'Mon-Fri 9am-5pm'})
+        self.assertFalse(profile.schedule_explicit)
+        self.assertTrue(profile.weekly_availability)
+
+        profile = update({'availability_schedule': {'mon': [[9, 12]]}})
+        self.assertTrue(profile.schedule_explicit)
+        # editing the free text keeps an explicit schedule
+        profile = update({'available_hours': 'Weekends 10am-2pm'})
+        self.assertEqual(bytes(profile.weekly_availability), availability.mask_from_schedule({'mon': [[9, 12]]}))
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class PresenceTests(TestCase):
+
+    def setUp(self):
+        import fakeredis
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        patcher = patch('backend.redis_client._client', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.careseeker = User.objects.create_user(
+            email='sita.karki@gmail.com', username='sitakarki', password='Sita@2081', role='careseeker'
+        )
+        self.caregiver = User.objects.create_user(
+            email='ram.gurung@gmail.com', username='ramgurung', password='Ram@2081', role='caregiver'
+        )
+
+    def _socket(self, user, conversation):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from rest_framework_simplejwt.tokens import AccessToken
+        from chat.routing import websocket_urlpatterns
+        return WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/chat/{conversation.id}/?token={AccessToken.for_user(user)}'
+        )
+
+    async def test_user_stays_online_until_last_socket_closes(self):
+        from asgiref.sync import sync_to_async
+        from accounts import presence
+        from chat.models import Conversation
+        conversation = await Conversation.objects.acreate(user1=self.careseeker, user2=self.caregiver)
+
+        watcher = self._socket(self.careseeker, conversation)
+        await watcher.connect()
+        await watcher.receive_json_from()  # own presence
+
+        first = self._socket(self.caregiver, conversation)
+        second = self._socket(self.caregiver, conversation)
+        await first.connect()
+        self.assertTrue((await watcher.receive_json_from())['is_online'])
+        await second.connect()
+        self.assertTrue((await watcher.receive_json_from())['is_online'])
+        self.assertEqual(await sync_to_async(presence.connection_count)(self.caregiver.id), 2)
+
+        # closing one of two tabs is not an online -> offline transition
+        await first.disconnect()
+        self.assertTrue(await watcher.receive_nothing())
+        self.assertTrue((await sync_to_async(presence.get_status)(self.caregiver.id))['is_online'])
+
+        await second.disconnect()
+        status = await watcher.receive_json_from()
+        self.assertEqual((status['user_id'], status['is_online']), (self.caregiver.id, False))
+        self.assertEqual(await sync_to_async(presence.connection_count)(self.caregiver.id), 0)
+        await watcher.disconnect()
+
+    def test_failed_flush_is_retried(self):
+        from django.db import DatabaseError
+        from accounts import presence
+        presence.connect(self.careseeker.id, 'conn-1')
+        with patch.object(User.objects, 'bulk_update', side_effect=DatabaseError):
+            self.assertEqual(presence.flush_last_seen(), 0)
+        self.assertEqual(len(list(self.redis.scan_iter('presence:last_seen:flushing:*'))), 1)
+
+        presence.connect(self.caregiver.id, 'conn-2')
+        self.assertEqual(presence.flush_last_seen(), 2)
+        self.assertEqual(list(self.redis.scan_iter('presence:last_seen*')), [])
+        self.assertEqual(User.objects.filter(last_seen__isnull=False).count(), 2)
+
+    def test_status_without_redis_is_offline_with_flushed_last_seen(self):
+        import redis
+        from django.utils import timezone
+        from rest_framework_simplejwt.tokens import AccessToken
+        last_seen = timezone.now().replace(microsecond=0)
+        User.objects.filter(pk=self.caregiver.pk).update(last_seen=last_seen)
+        with patch.object(self.redis, 'pipeline', side_effect=redis.ConnectionError):
+            response = self.client.get(
+                f'/api/user/status/{self.caregiver.id}/',
+                HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.careseeker)}',
+            )
+        self.assertEqual(response.data, {'is_online': False, 'last_seen': last_seen.isoformat()})
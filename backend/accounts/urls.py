@@ -16,6 +16,8 @@ urlpatterns = [
     path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('profile/',UserProfileView.as_view(), name='profile'),
     path('profile/caregiver/', CaregiverProfileView.as_view(), name='caregiver-profile'),
+    path('profile/caregiver/availability-overrides/', CaregiverAvailabilityOverrideView.as_view(), name='caregiver-availability-overrides'),
+    path('profile/caregiver/availability-overrides/<str:date>/', CaregiverAvailabilityOverrideView.as_view(), name='caregiver-availability-override'),
     path('admin/profile/<int:user_id>/', AdminUserProfileView.as_view(), name='admin-user-profile'),
     path('changepassword/',UserChangePasswordView.as_view(), name='change-password'),
     path('send-reset-password-email/',SendPasswordResetEmailView.as_view(), name='send-reset-password-email'),
@@ -20,7 +20,11 @@ from bookings.models import Booking
 from notifications.utils import send_push_notification
 import resend
 from .utils import Util
+from . import dashboards, presence
+from backend.conditional import ConditionalGetMixin
 from backend.error_messages import ErrorMessages
+from backend.sparse import SparseFieldsetMixin, sparse_queryset
+from datetime import datetime
 
 def get_tokens_for_user(user):
     # creating JWT tokens that the frontend stores and sends with each request
@@ -160,7 +164,62 @@ class UserLoginView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     
-class UserProfileView(APIView):
+# profile responses add these to UserProfileSerializer's fields for caregivers
+PROFILE_EXTRA_FIELDS = ("caregiver_details", "verification_status")
+
+
+def _profile_data(request, user, profile, fields):
+    """
+    Profile response for user, limited to fields (None = everything);
+    caregiver details, verification and rating are only loaded if asked for.
+    """
+    def wanted(name):
+        return fields is None or name in fields
+
+    rating_fields = [name for name in ("review_count", "average_rating") if wanted(name)]
+    # caregivers' ratings are aggregated below in one query
+    serializer_fields = fields
+    if user.role == "caregiver":
+        serializer_fields = [
+            name for name in fields or UserProfileSerializer.Meta.fields if name not in rating_fields
+        ]
+    data = UserProfileSerializer(profile, context={"request": request, "fields": serializer_fields}).data
+
+    if user.role != "caregiver":
+        return data
+
+    # showing their rating on the profile card (same keys/order as the serializer's)
+    if rating_fields:
+        agg = Review.objects.filter(caregiver=user).aggregate(
+            avg_rating=Avg("rating"),
+            review_count=Count("id"),
+        )
+        rating = {
+            "average_rating": round(agg["avg_rating"] or 0, 1) if agg["review_count"] else None,
+            "review_count": agg["review_count"] or 0,
+        }
+        for name in rating_fields:
+            data[name] = rating[name]
+
+    # caregivers get extra fields displayed on their profile
+    if wanted("caregiver_details"):
+        try:
+            caregiver_profile = user.caregiver_profile
+        except CaregiverProfile.DoesNotExist:
+            caregiver_profile = CaregiverProfile.objects.create(user=user)
+        data["caregiver_details"] = CaregiverProfileSerializer(caregiver_profile).data
+
+    # frontend shows a badge if they're verified
+    if wanted("verification_status"):
+        try:
+            data["verification_status"] = user.verification.verification_status
+        except CaregiverVerification.DoesNotExist:
+            data["verification_status"] = None
+
+    return data
+
+
+class UserProfileView(SparseFieldsetMixin, APIView):
     # get returns both basic profile + caregiver-specific stuff if they're a caregiver
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
@@ -172,38 +231,8 @@ class UserProfileView(APIView):
         except UserProfile.DoesNotExist:
             profile = UserProfile.objects.create(user=request.user)
             
-        serializer = UserProfileSerializer(
-            profile,
-            context={"request": request}
-        )
-
-        data = serializer.data
-
-        # caregivers get extra fields displayed on their profile
-        if request.user.role == 'caregiver':
-            try:
-                caregiver_profile = request.user.caregiver_profile
-            except CaregiverProfile.DoesNotExist:
-                caregiver_profile = CaregiverProfile.objects.create(user=request.user)
-                
-            caregiver_serializer = CaregiverProfileSerializer(caregiver_profile)
-            data['caregiver_details'] = caregiver_serializer.data
-            
-            # frontend shows a badge if they're verified
-            try:
-                verification = request.user.verification
-                data['verification_status'] = verification.verification_status
-            except CaregiverVerification.DoesNotExist:
-                data['verification_status'] = None
-
-            # showing their rating on the profile card
-            agg = Review.objects.filter(caregiver=request.user).aggregate(
-                avg_rating=Avg("rating"),
-                review_count=Count("id"),
-            )
-            data["average_rating"] = round(agg["avg_rating"] or 0, 1) if agg["review_count"] else None
-            data["review_count"] = agg["review_count"] or 0
-
+        fields = self.get_sparse_fields(UserProfileSerializer, extra=PROFILE_EXTRA_FIELDS)
+        data = _profile_data(request, request.user, profile, fields)
         return Response(data, status=200)
 
     def patch(self, request):
@@ -265,7 +294,45 @@ class CaregiverProfileView(APIView):
         return Response(serializer.errors, status=400)
 
 
-class AdminUserProfileView(APIView):
+class CaregiverAvailabilityOverrideView(APIView):
+    """
+    Date-specific changes to a caregiver's weekly schedule.
+
+    GET    /api/user/profile/caregiver/availability-overrides/          upcoming overrides
+    POST   /api/user/profile/caregiver/availability-overrides/          {"date": "2026-03-02", "hours": [[9, 13]]}
+    DELETE /api/user/profile/caregiver/availability-overrides/<date>/   back to the weekly schedule
+
+    "hours": [] marks a day off. Bookings and the directory search use these
+    in place of the weekly schedule for that date (accounts/availability.py).
+    """
+    permission_classes = [IsAuthenticated, IsCaregiver]
+
+    def get(self, request):
+        overrides = CaregiverAvailabilityOverride.objects.filter(
+            caregiver=request.user, date__gte=timezone.localdate()
+        )
+        return Response(CaregiverAvailabilityOverrideSerializer(overrides, many=True).data)
+
+    def post(self, request):
+        serializer = CaregiverAvailabilityOverrideSerializer(data=request.data, context={"request": request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, date):
+        try:
+            day = datetime.strptime(date, "%Y-%m-%d").date()
+        except ValueError:
+            return Response({"error": "date must be YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        override = CaregiverAvailabilityOverride.objects.filter(caregiver=request.user, date=day).first()
+        if override is None:
+            return Response({"error": "No override for this date."}, status=status.HTTP_404_NOT_FOUND)
+        override.delete()  # delete() on the instance so the post_delete signals run
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AdminUserProfileView(SparseFieldsetMixin, APIView):
     # allows admins (and public users) to view ANY caregiver's profile
     permission_classes = [IsAuthenticated]
     permission_classes = [IsAuthenticated]
@@ -281,29 +348,8 @@ class AdminUserProfileView(APIView):
             profile = target_user.profile
         except UserProfile.DoesNotExist:
             profile = UserProfile.objects.create(user=target_user)
-        serializer = UserProfileSerializer(profile, context={"request": request})
-        data = serializer.data
-        
-        if target_user.role == "caregiver":
-            try:
-                caregiver_profile = target_user.caregiver_profile
-            except CaregiverProfile.DoesNotExist:
-                caregiver_profile = CaregiverProfile.objects.create(user=target_user)
-            caregiver_serializer = CaregiverProfileSerializer(caregiver_profile)
-            data["caregiver_details"] = caregiver_serializer.data
-            try:
-                verification = target_user.verification
-                data["verification_status"] = verification.verification_status
-            except CaregiverVerification.DoesNotExist:
-                data["verification_status"] = None
-
-            # Include rating summary for admin view as well
-            agg = Review.objects.filter(caregiver=target_user).aggregate(
-                avg_rating=Avg("rating"),
-                review_count=Count("id"),
-            )
-            data["average_rating"] = round(agg["avg_rating"] or 0, 1) if agg["review_count"] else None
-            data["review_count"] = agg["review_count"] or 0
+        fields = self.get_sparse_fields(UserProfileSerializer, extra=PROFILE_EXTRA_FIELDS)
+        data = _profile_data(request, target_user, profile, fields)
         return Response(data, status=200)
 
 
@@ -351,13 +397,17 @@ class UserStatusView(APIView):
 
     def get(self, request, user_id):
         try:
-            user = User.objects.get(id=user_id)
+            user = User.objects.only("last_seen").get(id=user_id)
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
-        return Response({
-            "is_online": user.is_online,
-            "last_seen": user.last_seen.isoformat() if user.last_seen else None,
-        })
+        # live presence comes from Redis; without it only the flushed last_seen is known
+        status_data = presence.get_status(user.id, db_last_seen=user.last_seen)
+        if status_data is None:
+            status_data = {
+                "is_online": False,
+                "last_seen": user.last_seen.isoformat() if user.last_seen else None,
+            }
+        return Response(status_data)
 
 
 class SavePushTokenView(APIView):
@@ -385,6 +435,9 @@ class CaregiverDashboardSummaryView(APIView):
     permission_classes = [IsAuthenticated, IsCaregiver]
 
     def get(self, request):
+        return Response(dashboards.cached(request.user.id, lambda: self.summary(request)))
+
+    def summary(self, request):
         from bookings.models import Booking
         from bookings.views import expire_pending_bookings
         from bookings.serializers import BookingSerializer
@@ -447,7 +500,7 @@ class CaregiverDashboardSummaryView(APIView):
         completed_count = completed_services
         avg_per_booking = total_earnings / completed_count if completed_count > 0 else 0
 
-        return Response({
+        return {
             "pending_requests": pending_requests,
             "upcoming_bookings": upcoming_bookings,
             "completed_services": completed_services,
@@ -464,7 +517,7 @@ class CaregiverDashboardSummaryView(APIView):
                 "completed_count": completed_count,
                 "average_per_booking": round(avg_per_booking, 2),
             },
-        })
+        }
 
 
 class CareseekerDashboardSummaryView(APIView):
@@ -472,6 +525,9 @@ class CareseekerDashboardSummaryView(APIView):
     permission_classes = [IsAuthenticated, IsCareSeeker]
 
     def get(self, request):
+        return Response(dashboards.cached(request.user.id, lambda: self.summary(request)))
+
+    def summary(self, request):
         from bookings.models import Booking
         from bookings.views import expire_pending_bookings
         from bookings.serializers import BookingSerializer
@@ -512,12 +568,12 @@ class CareseekerDashboardSummaryView(APIView):
             if completed
             else 0
         )
-        service_counts = {}
-        for b in completed:
-            for s in b.service_types or []:
-                service_counts[s] = service_counts.get(s, 0) + 1
         most_used_service = (
-            max(service_counts, key=service_counts.get) if service_counts else None
+            ServiceType.objects.filter(bookings__family=user, bookings__status="completed")
+            .annotate(uses=Count("bookings"))
+            .order_by("-uses", "name")
+            .values_list("name", flat=True)
+            .first()
         )
 
         # Notifications derived from recent booking activity
@@ -550,7 +606,7 @@ class CareseekerDashboardSummaryView(APIView):
             reverse=True,
         )[:5]
 
-        return Response({
+        return {
             "active_bookings": active_bookings,
             "pending_requests": pending_requests,
             "completed_services": completed_services,
@@ -562,24 +618,30 @@ class CareseekerDashboardSummaryView(APIView):
                 "average_session_duration": round(avg_duration, 1),
                 "most_used_service_type": most_used_service,
             },
-        })
+        }
 
 
-class CareseekerBookingListView(APIView):
+class CareseekerBookingListView(SparseFieldsetMixin, ConditionalGetMixin, APIView):
     """List all bookings for the authenticated careseeker."""
     permission_classes = [IsAuthenticated, IsCareSeeker]
 
-    def get(self, request):
-        from bookings.models import Booking
-        from bookings.views import expire_pending_bookings
-        from bookings.serializers import BookingSerializer
+    def get_validators(self, request):
+        from bookings.views import booking_list_validators, expire_pending_bookings
 
+        # runs before get(): expire first so the ETag matches what get() returns
         expire_pending_bookings()
-        bookings = Booking.objects.filter(family=request.user).order_by("-created_at")
+        bookings = Booking.objects.filter(family=request.user)
         expire_pending_bookings(bookings)
+        return booking_list_validators(bookings)
+
+    def get(self, request):
+        from bookings.serializers import BookingSerializer
+
+        fields = self.get_sparse_fields(BookingSerializer)
         bookings = Booking.objects.filter(family=request.user).order_by("-created_at")
+        bookings = sparse_queryset(bookings, BookingSerializer, fields)
 
-        serializer = BookingSerializer(bookings, many=True, context={"request": request})
+        serializer = BookingSerializer(bookings, many=True, context={"request": request, "fields": fields})
         return Response(serializer.data)
 
 
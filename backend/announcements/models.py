@@ -17,6 +17,7 @@ class Announcement(models.Model):
         default=TargetAudience.ALL,
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
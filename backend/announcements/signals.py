@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from backend import cache
+from .models import Announcement
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def _announcements_changed(**kwargs):
+    """Drop the cached per-audience lists (announcements.views.AnnouncementListView)."""
+    transaction.on_commit(lambda: cache.bump("announcements"))
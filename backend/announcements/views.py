@@ -1,13 +1,23 @@
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Count, Max, Q
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from backend import cache
+from backend.conditional import ConditionalGetMixin
 from .models import Announcement
 from .serializers import AnnouncementSerializer
 
 
+def _audience(user):
+    # the _visible_for_user() branch a user falls into
+    if user.is_staff or getattr(user, "role", None) == "admin":
+        return "admin"
+    return getattr(user, "role", None) or "none"
+
+
 def _visible_for_user(qs, user):
     # admins see everything, regular users see based on their role
     if user.is_staff or getattr(user, "role", None) == "admin":
@@ -27,14 +37,26 @@ def _visible_for_user(qs, user):
     return qs.none()
 
 
-class AnnouncementListView(APIView):
+class AnnouncementListView(ConditionalGetMixin, APIView):
     # shows announcements based on user role - need to see if they're an admin or regular user
     permission_classes = [IsAuthenticated]
 
+    def get_validators(self, request):
+        state = _visible_for_user(Announcement.objects.all(), request.user).aggregate(
+            count=Count("id"), last_modified=Max("updated_at")
+        )
+        return (state["count"], state["last_modified"]), state["last_modified"]
+
     def get(self, request):
-        qs = _visible_for_user(Announcement.objects.all(), request.user)
-        serializer = AnnouncementSerializer(qs, many=True)
-        return Response({"announcements": serializer.data})
+        def render():
+            qs = _visible_for_user(Announcement.objects.all(), request.user)
+            return AnnouncementSerializer(qs, many=True).data
+
+        # everyone with the same audience sees the same list: one computation, cached
+        data = cache.get_or_compute(
+            "announcements", [], render, ttl=settings.ANNOUNCEMENT_CACHE_TTL_SECONDS, scope=_audience(request.user)
+        )
+        return Response({"announcements": data})
 
 
 class AdminAnnouncementListCreateView(APIView):
@@ -0,0 +1,118 @@
+"""
+POST /api/batch/: several GETs in one round trip.
+
+The mobile home screen loads profile, dashboard summary, unread count,
+announcements and conversations on launch. On a slow mobile network each
+call is a round trip that also pays JWT authentication and the middleware
+stack again. A batch runs the GETs in-process against the existing views,
+one after another, as the user who authenticated the batch:
+
+    POST /api/batch/
+    {"requests": [
+        {"path": "/api/user/profile/", "query": {"fields": "username,profile_image"}},
+        {"path": "/api/user/notifications/unread-count/"},
+        {"path": "/api/announcements/", "headers": {"If-None-Match": "W/\"...\""}}
+    ]}
+
+    200 [{"status": 200, "headers": {...}, "body": {...}}, {...}, {"status": 304, ...}]
+
+Each result carries the view's own status code, so one failing
+sub-request does not fail the batch. Only GET is supported, and only
+If-None-Match / If-Modified-Since are passed through as headers, so polled
+endpoints can still answer 304.
+"""
+import json
+import logging
+
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from django.utils.http import urlencode
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from backend.renderers import PreRendered
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUESTS = 10
+PASSED_HEADERS = {"if-none-match": "HTTP_IF_NONE_MATCH", "if-modified-since": "HTTP_IF_MODIFIED_SINCE"}
+RETURNED_HEADERS = ("ETag", "Last-Modified")
+# request headers of the batch itself that must not leak into sub-requests
+_DROPPED_META = ("CONTENT_LENGTH", "CONTENT_TYPE", *PASSED_HEADERS.values())
+
+
+def _body(response):
+    if isinstance(response, Response):
+        if isinstance(response.data, PreRendered):
+            return json.loads(response.data)
+        return response.data
+    if not response.content:
+        return None
+    if response.get("Content-Type", "").startswith("application/json"):
+        return json.loads(response.content)
+    return response.content.decode(response.charset)
+
+
+class BatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        items = request.data.get("requests") if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({"error": "requests must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_REQUESTS:
+            return Response(
+                {"error": f"At most {MAX_REQUESTS} requests per batch."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response([self._run(request, item) for item in items])
+
+    def _run(self, request, item):
+        if not isinstance(item, dict) or not isinstance(item.get("path"), str):
+            return {"status": status.HTTP_400_BAD_REQUEST, "body": {"error": "Each request needs a path."}}
+        method = str(item.get("method", "GET")).upper()
+        if method != "GET":
+            return {"status": status.HTTP_405_METHOD_NOT_ALLOWED, "body": {"error": "Only GET can be batched."}}
+
+        path, _, inline_query = item["path"].partition("?")
+        try:
+            match = resolve(path)
+        except Resolver404:
+            match = None
+        if match is None or not path.startswith("/api/") or getattr(match.func, "view_class", None) is BatchView:
+            return {"status": status.HTTP_404_NOT_FOUND, "body": {"error": "Not found."}}
+
+        sub = self._sub_request(request, path, inline_query, item)
+        sub.resolver_match = match
+        try:
+            response = match.func(sub, *match.args, **match.kwargs)
+        except Exception:
+            logger.exception("Batched request to %s failed", path)
+            return {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "body": None}
+
+        headers = {name: response[name] for name in RETURNED_HEADERS if response.has_header(name)}
+        return {"status": response.status_code, "headers": headers, "body": _body(response)}
+
+    def _sub_request(self, request, path, inline_query, item):
+        query = item.get("query")
+        query_string = "&".join(filter(None, [
+            inline_query, urlencode(query, doseq=True) if isinstance(query, dict) else "",
+        ]))
+
+        sub = HttpRequest()
+        sub.method = "GET"
+        sub.path = sub.path_info = path
+        sub.META = {key: value for key, value in request.META.items() if key not in _DROPPED_META}
+        sub.META.update(REQUEST_METHOD="GET", PATH_INFO=path, QUERY_STRING=query_string)
+        headers = item.get("headers")
+        for name, value in (headers.items() if isinstance(headers, dict) else ()):
+            meta_key = PASSED_HEADERS.get(str(name).lower())
+            if meta_key:
+                sub.META[meta_key] = str(value)
+        sub.GET = QueryDict(query_string)
+        sub.COOKIES = request.COOKIES
+        # the batch already authenticated; sub-requests reuse its user and token
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+        return sub
@@ -0,0 +1,223 @@
+"""
+Shared cache for hot reads and rate limits.
+
+Two tiers, both Django caches (see CACHES in settings):
+    default   Redis, the same server as CHANNEL_LAYERS; shared by every
+              daphne/worker process
+    local     per-process LocMem L1, entries live CACHE_L1_TTL_SECONDS so
+              another process's invalidation shows up within that window
+
+Keys are namespaced and versioned:
+
+    <namespace>:v<version>[.<scope version>:<scope>]:<part>:<part>...
+    cachever:<namespace>[:<scope>]          current versions (Redis)
+
+bump(namespace) moves the whole namespace to a new version and
+bump(namespace, scope) just one scope of it (say one user's entries), so
+every old entry is skipped at once and left to expire.
+get_or_compute() refreshes entries probabilistically shortly before they
+expire ("XFetch") and computes through backend/singleflight.py, so a hot
+or missing key is recomputed by one request while concurrent ones wait for
+(or keep serving) that result. If Redis is down, reads fall through
+to compute() (still coalesced within the process) and rate limits let
+requests through, with a warning logged.
+
+Key inventory. Add new keys here.
+
+    via this module (Django cache, KEY_PREFIX "carenest")
+        ratelimit:<name>:<ident>       fixed-window counters, see allow()
+            reset-cooldown:<email>     1 password reset email / 60 s
+            reset-hourly:<email>       5 password reset emails / hour
+        dashboard:v<v>.<v>:<user>|admin
+                                       dashboard summaries, accounts/dashboards.py
+        directory:v<v>:<query hash>    ranked caregiver ids per normalized search,
+                                       bookings/views.py
+        announcements:v<v>.<v>:<audience>
+                                       announcement lists, announcements/views.py
+        caregiver-card:v<v>:<user>     pre-rendered directory entry, bookings/directory.py
+        calendar:v<v>.<v>:<scope>:[<user>:]<YYYY-MM>
+                                       month calendars, bookings/schedule.py
+
+    raw Redis (backend.redis_client)
+        presence:last_seen, presence:flush_lock, presence:conns:<user>
+                                       accounts/presence.py
+        ws:conns:<user>:<kind>, ws:metrics:*
+                                       chat/realtime.py
+        location:latest:<booking>, location:persisted:<booking>
+                                       bookings/location.py
+        location:track:<booking>       bookings/tracks.py
+        ranking:version, ranking:changes
+                                       bookings/ranking.py
+        reminders:due, reminders:sent:<booking>:<min>
+                                       notifications/reminders.py
+        singleflight:<cache key>       backend/singleflight.py
+"""
+import logging
+import math
+import random
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+
+from backend import singleflight
+
+logger = logging.getLogger(__name__)
+
+
+def _shared():
+    return caches["default"]
+
+
+def _local():
+    return caches["local"]
+
+
+def _version_key(namespace, scope):
+    return f"cachever:{namespace}" if scope is None else f"cachever:{namespace}:{scope}"
+
+
+def _version(namespace, scope=None):
+    key = _version_key(namespace, scope)
+    version = _local().get(key)
+    if version is None:
+        version = _shared().get(key)
+        if version is None:
+            # a fresh start (or an evicted version) must not match old entries
+            _shared().add(key, int(time.time()), timeout=None)
+            version = _shared().get(key)
+        _local().set(key, version, timeout=settings.CACHE_L1_TTL_SECONDS)
+    return version
+
+
+def make_key(namespace, *parts, scope=None):
+    """Current key for parts in namespace (and scope); carries both versions."""
+    key = f"{namespace}:v{_version(namespace)}"
+    if scope is not None:
+        key += f".{_version(namespace, scope)}:{scope}"
+    return ":".join([key, *(str(p) for p in parts)])
+
+
+def bump(namespace, scope=None):
+    """Invalidate every entry of namespace (or of its scope) at once."""
+    key = _version_key(namespace, scope)
+    try:
+        _shared().add(key, int(time.time()), timeout=None)
+        _shared().incr(key)
+    except (redis.RedisError, ValueError) as e:
+        logger.warning("Cache version bump failed for %s: %s", key, e)
+    _local().delete(key)
+
+
+def _expired_early(expires_at, delta, beta):
+    # XFetch: the closer to expiry and the slower compute() is, the more
+    # likely a reader refreshes now; 1 - random() keeps log() away from 0
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def get_or_compute(namespace, parts, compute, ttl, scope=None, l1_ttl=None, beta=1.0):
+    """
+    Cached compute() under namespace/parts for ttl seconds, checking the
+    in-process tier first (l1_ttl, default CACHE_L1_TTL_SECONDS; 0 skips it).
+    """
+    l1_ttl = settings.CACHE_L1_TTL_SECONDS if l1_ttl is None else l1_ttl
+    try:
+        key = make_key(namespace, *parts, scope=scope)
+        if l1_ttl:
+            hit = _local().get(key)
+            if hit is not None:
+                return hit[0]
+        entry = _shared().get(key)
+    except redis.RedisError as e:
+        logger.warning("Cache unavailable for %s: %s", namespace, e)
+        return singleflight.do(f"{namespace}:{scope}:{parts}", compute)
+
+    stale = singleflight.MISSING
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not _expired_early(expires_at, delta, beta):
+            if l1_ttl:
+                _local().set(key, (value,), timeout=min(l1_ttl, ttl))
+            return value
+        stale = value
+
+    def compute_and_store():
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        try:
+            _shared().set(key, (value, delta, time.time() + ttl), timeout=ttl)
+        except redis.RedisError as e:
+            logger.warning("Cache write failed for %s: %s", key, e)
+        return value
+
+    # one computation per key at a time; the others wait for it (or keep
+    # serving the stale entry during an early refresh)
+    value = singleflight.do(key, compute_and_store, peek=lambda: _peek(key), stale=stale)
+    if l1_ttl:
+        _local().set(key, (value,), timeout=min(l1_ttl, ttl))
+    return value
+
+
+def _peek(key):
+    try:
+        entry = _shared().get(key)
+    except redis.RedisError:
+        return singleflight.MISSING
+    return singleflight.MISSING if entry is None else entry[0]
+
+
+def get_many(namespace, idents):
+    """{ident: value} for the idents cached under namespace (L1, then Redis)."""
+    try:
+        keys = {make_key(namespace, ident): ident for ident in idents}
+        found = _local().get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = _shared().get_many(missing)
+            if shared:
+                _local().set_many(shared, timeout=settings.CACHE_L1_TTL_SECONDS)
+            found.update(shared)
+    except redis.RedisError as e:
+        logger.warning("Cache unavailable for %s: %s", namespace, e)
+        return {}
+    return {keys[key]: value for key, value in found.items()}
+
+
+def set_many(namespace, values, ttl):
+    """Store {ident: value} under namespace for ttl seconds."""
+    try:
+        entries = {make_key(namespace, ident): value for ident, value in values.items()}
+        _shared().set_many(entries, timeout=ttl)
+    except redis.RedisError as e:
+        logger.warning("Cache write failed for %s: %s", namespace, e)
+        return
+    _local().set_many(entries, timeout=min(settings.CACHE_L1_TTL_SECONDS, ttl))
+
+
+def delete(namespace, *parts, scope=None):
+    try:
+        key = make_key(namespace, *parts, scope=scope)
+        _shared().delete(key)
+    except redis.RedisError as e:
+        logger.warning("Cache delete failed for %s: %s", namespace, e)
+        return
+    _local().delete(key)
+
+
+def allow(name, ident, limit, window):
+    """
+    Count one hit against a fixed window shared by all processes; False once
+    more than limit hits landed in the current window of window seconds.
+    """
+    key = f"ratelimit:{name}:{ident}"
+    try:
+        _shared().add(key, 0, timeout=window)
+        return _shared().incr(key) <= limit
+    except ValueError:
+        # the window expired between add() and incr()
+        return True
+    except redis.RedisError as e:
+        logger.warning("Rate limit check failed for %s: %s", key, e)
+        return True
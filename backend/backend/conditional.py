@@ -0,0 +1,74 @@
+"""
+Conditional GET for APIViews (weak ETag / Last-Modified, 304 Not Modified).
+
+Polling screens mostly get back what they already have. A view that mixes
+in ConditionalGetMixin implements get_validators() with one cheap query
+(counts, MAX(id), MAX(updated_at)) describing what its response depends
+on. The mixin runs it after authentication and permissions but before the
+handler, and answers If-None-Match / If-Modified-Since with a bodiless 304
+so the full query and serialization never run:
+
+    class NotificationListView(ConditionalGetMixin, APIView):
+        def get_validators(self, request):
+            state = Notification.objects.filter(user=request.user).aggregate(...)
+            return state, None
+
+The ETag is weak and hashes the view, the user, the full path (query
+params select different lists) and the state, so it never has to be
+stored. 200 responses carry the same ETag and Last-Modified headers.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+class _Conditional(Exception):
+    """Carries a 304 (or 412) response out of initial()."""
+
+    def __init__(self, response):
+        self.response = response
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+class ConditionalGetMixin:
+    def get_validators(self, request, *args, **kwargs):
+        """
+        (state, last_modified) for this GET: state is any repr()-stable value
+        that changes whenever the response would, last_modified a datetime
+        or None. Return (None, None) to skip conditional handling.
+        """
+        return None, None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._etag = self._last_modified = None
+        if request.method not in ("GET", "HEAD"):
+            return
+        state, last_modified = self.get_validators(request, *args, **kwargs)
+        if state is None and last_modified is None:
+            return
+        self._etag = make_etag(type(self).__name__, request.user.pk, request.get_full_path(), state)
+        self._last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request._request, etag=self._etag, last_modified=self._last_modified)
+        if response is not None:
+            raise _Conditional(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _Conditional):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "_etag", None) and response.status_code in (200, 304):
+            response["ETag"] = self._etag
+            if self._last_modified:
+                response["Last-Modified"] = http_date(self._last_modified)
+            # the same URL answers differently per user
+            patch_vary_headers(response, ["Authorization"])
+        return response
@@ -28,6 +28,7 @@ class ErrorMessages:
     BOOKING_REQUIRED_FIELDS = "Please fill in all required fields."
     BOOKING_INVALID_PHONE = "Phone number must be exactly 10 digits."
     CAREGIVER_NOT_AVAILABLE = "This caregiver is not available for the selected date and time. Please choose a different slot."
+    CAREGIVER_OUTSIDE_SCHEDULE = "This caregiver does not work at the selected time. Please check their weekly schedule."
     DUPLICATE_BOOKING = "You already have a pending request with this caregiver."
     BOOKING_EXPIRED = "This booking has expired and can no longer be updated."
 
@@ -0,0 +1,22 @@
+"""
+Shared Redis connection for app-level state (presence, counters, locks).
+
+Uses the same server as CHANNEL_LAYERS so there is nothing new to deploy.
+"""
+import redis
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """Return a process-wide Redis client (lazy, thread-safe connection pool)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=2,
+            socket_connect_timeout=2,
+        )
+    return _client
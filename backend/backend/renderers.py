@@ -0,0 +1,85 @@
+"""
+ujson-backed JSON renderer and parser for DRF.
+
+Drop-in replacements for rest_framework's JSONRenderer/JSONParser (see
+REST_FRAMEWORK in settings). The byte output is the same as DRF's for
+everything our serializers return:
+
+- anything ujson cannot encode natively (datetimes already converted to
+  Asia/Kathmandu, dates, times, UUIDs, lazy gettext strings, querysets...)
+  goes through DRF's own JSONEncoder.default, so it is formatted the same way;
+- Decimal, str, int, float, dict, list and tuple are encoded by ujson itself;
+- U+2028/U+2029 are escaped afterwards, as DRF does.
+
+Anything ujson rejects outright (NaN/Infinity, ints over 64 bits) is
+handed to DRF's renderer, so the error (or output) is DRF's too. The only
+visible difference is float exponents: 1e-7 instead of 1e-07.
+
+A view holding JSON that is already encoded (the caregiver directory's
+cached cards) returns Response(PreRendered(body)): compact JSON responses
+send those bytes as they are, while ?format=api and indented output decode
+them and render as usual, so content negotiation still applies.
+
+benchmarks: python manage.py bench_json
+"""
+import codecs
+import io
+
+import ujson
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+_default = JSONEncoder().default
+
+
+class PreRendered(bytes):
+    """Compact UTF-8 JSON, already encoded."""
+
+
+class UJSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if isinstance(data, PreRendered):
+            if indent is None and self.compact:
+                return bytes(data)
+            data = ujson.loads(data)
+        if indent is None and not self.compact:
+            # ujson has no ", " / ": " separators without indentation
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = ujson.dumps(
+                data, default=_default, indent=indent or 0,
+                ensure_ascii=self.ensure_ascii, escape_forward_slashes=False,
+                reject_bytes=False, allow_nan=not self.strict,
+            )
+        except (TypeError, OverflowError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
+
+
+class UJSONParser(JSONParser):
+    renderer_class = UJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            data = codecs.getreader(encoding)(stream).read()
+            # ujson accepts NaN/Infinity; DRF's strict parser does not
+            if self.strict and ('NaN' in data or 'Infinity' in data):
+                return super().parse(io.BytesIO(data.encode()), media_type, {'encoding': 'utf-8'})
+            return ujson.loads(data)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
@@ -96,14 +96,82 @@ TEMPLATES = [
 WSGI_APPLICATION = 'backend.wsgi.application'
 ASGI_APPLICATION = 'backend.asgi.application'
 
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
 # Django Channels - in-memory layer for development (no Redis needed)
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
-        "CONFIG": {"hosts": [os.getenv("REDIS_URL", "redis://localhost:6379")]},
+        "CONFIG": {
+            "hosts": [REDIS_URL],
+            # per-channel queue bound; events past it are dropped, which
+            # RealtimeMixin surfaces as sent/delivered gaps in ws:metrics:*
+            "capacity": int(os.getenv("CHANNEL_LAYER_CAPACITY", "100")),
+            "expiry": 60,
+            "group_expiry": 86400,
+        },
     }
 }
 
+# Shared cache on the same Redis, plus a short-lived per-process L1 tier.
+# Use it through backend/cache.py (namespaced, versioned keys; key inventory).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "carenest",
+        "TIMEOUT": 300,
+        "OPTIONS": {"socket_timeout": 2, "socket_connect_timeout": 2},
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "carenest-l1",
+        "TIMEOUT": 5,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+CACHE_L1_TTL_SECONDS = int(os.getenv("CACHE_L1_TTL_SECONDS", "5"))
+# Dashboard summaries are invalidated by signals (accounts/dashboards.py);
+# the TTL only bounds time-driven changes such as pending requests expiring
+DASHBOARD_CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "60"))
+# Shared reads computed once per key (backend/singleflight.py) and cached
+# briefly: the ranked caregiver directory per normalized search, and the
+# announcement list per audience. Profile/announcement edits bump them.
+DIRECTORY_CACHE_TTL_SECONDS = int(os.getenv("DIRECTORY_CACHE_TTL_SECONDS", "30"))
+ANNOUNCEMENT_CACHE_TTL_SECONDS = int(os.getenv("ANNOUNCEMENT_CACHE_TTL_SECONDS", "300"))
+
+# Live booking location, see bookings/location.py: the booking row is written
+# at most every N seconds unless the caregiver moved M metres
+LOCATION_PERSIST_INTERVAL_SECONDS = int(os.getenv("LOCATION_PERSIST_INTERVAL_SECONDS", "30"))
+LOCATION_PERSIST_DISTANCE_METERS = int(os.getenv("LOCATION_PERSIST_DISTANCE_METERS", "50"))
+# Douglas-Peucker tolerance applied to a booking's route when tracking ends
+LOCATION_TRACK_TOLERANCE_METERS = float(os.getenv("LOCATION_TRACK_TOLERANCE_METERS", "10"))
+
+# Location autocomplete (accounts/autocomplete.py) rebuilds its in-memory
+# index this often so profile edits made by other processes show up
+AUTOCOMPLETE_REBUILD_SECONDS = int(os.getenv("AUTOCOMPLETE_REBUILD_SECONDS", "300"))
+
+# "Starting in N minutes" reminders for accepted bookings, sent by
+# `manage.py send_reminders` (notifications/reminders.py)
+REMINDER_OFFSETS_MINUTES = (60, 15)
+REMINDER_TICK_SECONDS = int(os.getenv("REMINDER_TICK_SECONDS", "30"))
+
+# WebSocket connection hygiene, see chat/realtime.py. Sockets without the
+# ping/pong protocol (ws/chat/, ws/notifications/) rely on daphne's protocol
+# pings (--ping-interval / --ping-timeout) to drop half-open connections.
+WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS = int(os.getenv("WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS", "25"))
+WEBSOCKET_IDLE_TIMEOUT_SECONDS = int(os.getenv("WEBSOCKET_IDLE_TIMEOUT_SECONDS", "75"))
+WEBSOCKET_MAX_CONNECTIONS_PER_USER = int(os.getenv("WEBSOCKET_MAX_CONNECTIONS_PER_USER", "5"))
+# pings a client may leave unanswered before it counts as not reading
+WEBSOCKET_MAX_UNANSWERED_PINGS = int(os.getenv("WEBSOCKET_MAX_UNANSWERED_PINGS", "2"))
+WEBSOCKET_SLOW_CONSUMER_LAG_SECONDS = int(os.getenv("WEBSOCKET_SLOW_CONSUMER_LAG_SECONDS", "10"))
+# "close" drops slow clients (4009); "coalesce" keeps only the newest presence/location frame
+WEBSOCKET_OVERFLOW_POLICY = os.getenv("WEBSOCKET_OVERFLOW_POLICY", "close")
+
+# Presence (online/last seen) lives in Redis, see accounts/presence.py
+PRESENCE_TTL_SECONDS = int(os.getenv("PRESENCE_TTL_SECONDS", "90"))
+PRESENCE_FLUSH_INTERVAL_SECONDS = int(os.getenv("PRESENCE_FLUSH_INTERVAL_SECONDS", "60"))
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -169,10 +237,16 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'EXCEPTION_HANDLER': 'backend.exceptions.custom_exception_handler',
-    # ,
-    # 'DEFAULT_RENDERER_CLASSES': (
-    #     'rest_framework.renderers.JSONRenderer',
-    # ),
+    # ujson-backed, byte-compatible with DRF's JSON classes (backend/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.UJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'backend.renderers.UJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 AUTH_USER_MODEL = 'accounts.User'
@@ -0,0 +1,127 @@
+"""
+Single-flight: concurrent identical computations share one result.
+
+do(key, fn) runs fn once per key at a time:
+
+- within a process, other threads asking for the same key wait on the
+  leader's Future instead of running fn themselves;
+- across processes, the leader holds a short Redis lock
+  (singleflight:<key>, SET NX PX). Another process that finds the lock
+  taken polls peek() (normally "is it in the shared cache yet?") until
+  the leader has stored its result, and only computes itself if the lock
+  goes away or the wait times out with nothing to show.
+
+If a stale value is passed, anyone who is not the leader returns it
+at once. backend/cache.py uses this for early (XFetch) refreshes, so only
+one request recomputes and the rest keep serving the old entry.
+
+If Redis is unreachable, only the per-process part applies.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+import redis
+
+from backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+LOCK_TTL_MS = 10_000
+POLL_INTERVAL_SECONDS = 0.05
+
+# compare-and-delete, so a leader never releases a lock that expired and was re-taken
+_RELEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_lock = threading.Lock()
+_inflight = {}
+
+
+def _lock_key(key):
+    return f"singleflight:{key}"
+
+
+def _acquire(key):
+    """Lock token if we lead across processes, None if another process does."""
+    token = uuid.uuid4().hex
+    try:
+        if get_redis().set(_lock_key(key), token, nx=True, px=LOCK_TTL_MS):
+            return token
+        return None
+    except redis.RedisError as e:
+        logger.warning("Single-flight lock unavailable for %s: %s", key, e)
+        return ""
+
+
+def _release(key, token):
+    if not token:
+        return
+    try:
+        get_redis().eval(_RELEASE, 1, _lock_key(key), token)
+    except redis.RedisError as e:
+        logger.warning("Single-flight unlock failed for %s: %s", key, e)
+
+
+def _wait_for_leader(key, peek):
+    """Poll peek() while another process holds the lock; MISSING if it never delivers."""
+    deadline = time.monotonic() + LOCK_TTL_MS / 1000
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL_SECONDS)
+        value = peek()
+        if value is not MISSING:
+            return value
+        try:
+            if not get_redis().exists(_lock_key(key)):
+                return peek()
+        except redis.RedisError:
+            return MISSING
+    return MISSING
+
+
+def _run(key, fn, peek, stale):
+    token = _acquire(key)
+    if token is None:
+        if stale is not MISSING:
+            return stale
+        if peek is not None:
+            value = _wait_for_leader(key, peek)
+            if value is not MISSING:
+                return value
+        token = _acquire(key)
+    try:
+        return fn()
+    finally:
+        _release(key, token)
+
+
+def do(key, fn, peek=None, stale=MISSING):
+    """fn() for key, shared with every concurrent caller of the same key."""
+    with _lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        if stale is not MISSING:
+            return stale
+        return future.result()
+
+    try:
+        result = _run(key, fn, peek, stale)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
@@ -0,0 +1,104 @@
+"""
+Sparse fieldsets: ?fields=a,b and ?exclude=c on list and profile endpoints.
+
+A compact mobile row needs a handful of BookingSerializer's ~30 fields; the
+rest cost bytes and, for method fields, a query or two per row. Views opt
+in with SparseFieldsetMixin and pass the selection to the serializer in its
+context:
+
+    class BookingListView(SparseFieldsetMixin, APIView):
+        def get(self, request):
+            fields = self.get_sparse_fields(BookingSerializer)
+            bookings = sparse_queryset(bookings, BookingSerializer, fields)
+            serializer = BookingSerializer(bookings, many=True, context={"request": request, "fields": fields})
+
+Serializers that mix in SparseFieldsMixin drop the fields that were not
+selected, so their get_<field>() methods never run. sparse_queryset() trims
+the queryset to the columns the selected fields read (.only() plus
+select_related() for fields sourced across relations); method fields
+declare theirs in sparse_sources. Without ?fields/?exclude nothing changes.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ParseError
+
+
+def _names(params, key):
+    return [name.strip() for name in params.get(key, "").split(",") if name.strip()]
+
+
+def parse_fields(params, available):
+    """
+    Field names selected by ?fields= / ?exclude= (in available's order), or
+    None when neither is given; ValueError on names not in available.
+    """
+    fields, exclude = _names(params, "fields"), _names(params, "exclude")
+    if not fields and not exclude:
+        return None
+    unknown = sorted(set(fields + exclude) - set(available))
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}.")
+    return [name for name in available if (not fields or name in fields) and name not in exclude]
+
+
+class SparseFieldsetMixin:
+    def get_sparse_fields(self, serializer_class, extra=()):
+        """Selected fields of serializer_class (plus extra response keys); None for all."""
+        try:
+            return parse_fields(self.request.query_params, [*serializer_class.Meta.fields, *extra])
+        except ValueError as e:
+            raise ParseError(str(e))
+
+
+class SparseFieldsMixin:
+    # {field name: [model paths it reads]} for fields whose source is a
+    # method or property, used by sparse_queryset()
+    sparse_sources = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get("fields")
+        # only the top-level serializer (or list child) is trimmed
+        if selected is None or self.root not in (self, self.parent):
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+def _concrete(model, path):
+    """True if path (a__b__c) walks forward/one-to-one relations to a concrete field."""
+    parts = path.split("__")
+    for i, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return False
+        if i < len(parts) - 1:
+            if not (field.is_relation and (field.many_to_one or field.one_to_one)):
+                return False
+            model = field.related_model
+        elif field.many_to_many or field.one_to_many:
+            return False
+    return True
+
+
+def sparse_queryset(queryset, serializer_class, fields):
+    """queryset loading only what the selected fields of serializer_class read."""
+    if fields is None:
+        return queryset
+    declared = serializer_class().fields
+    paths = set()
+    for name in fields:
+        if name in serializer_class.sparse_sources:
+            paths.update(serializer_class.sparse_sources[name])
+        elif name in declared and declared[name].source != "*":
+            paths.add(declared[name].source.replace(".", "__"))
+    if not all(_concrete(queryset.model, path) for path in paths):
+        # a property or reverse relation we cannot express; load everything
+        return queryset
+
+    relations = set()
+    for path in paths:
+        parts = path.split("__")
+        relations.update("__".join(parts[:i]) for i in range(1, len(parts)))
+    if relations:
+        queryset = queryset.select_related(*relations)
+    return queryset.only(*paths, *relations)
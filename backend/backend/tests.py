@@ -0,0 +1,192 @@
+import io
+import threading
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from backend import singleflight
+from backend.renderers import UJSONParser, UJSONRenderer
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def test_concurrent_calls_share_one_computation(self):
+        calls = []
+        results = []
+        start = threading.Barrier(8)
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'ranked'
+
+        def worker():
+            start.wait()
+            results.append(singleflight.do('directory:test', compute))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['ranked'] * 8)
+        # nothing left in flight: the next call computes again
+        singleflight.do('directory:test', compute)
+        self.assertEqual(len(calls), 2)
+
+
+class UJSONCompatibilityTests(SimpleTestCase):
+    """UJSONRenderer/UJSONParser must produce what DRF's JSON classes do."""
+
+    def assertSameRender(self, data, accepted_media_type=None):
+        self.assertEqual(
+            UJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_serializer_output_matches_drf(self):
+        class Sample(serializers.Serializer):
+            amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+            created_at = serializers.DateTimeField()
+            day = serializers.DateField()
+            start = serializers.TimeField()
+            label = serializers.CharField()
+
+        data = Sample({
+            'amount': Decimal('1500.50'),
+            'created_at': datetime(2026, 1, 1, 3, 15, 30, 123456, tzinfo=dt_timezone.utc),
+            'day': date(2026, 1, 1),
+            'start': dt_time(9, 30),
+            'label': 'नमस्ते',
+        }).data
+        self.assertEqual(data['created_at'], '2026-01-01T09:00:30.123456+05:45')
+        self.assertSameRender(data)
+
+    def test_raw_values_go_through_drf_encoder(self):
+        kathmandu = ZoneInfo('Asia/Kathmandu')
+        self.assertSameRender({
+            'total_amount': Decimal('1500.50'),
+            'price': Decimal('0.1'),
+            'created_at': datetime(2026, 1, 1, 9, 0, 30, 123456, tzinfo=kathmandu),
+            'date': date(2026, 1, 1),
+            'time': dt_time(9, 30, 15, 500),
+            'duration': timedelta(hours=3),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'label': gettext_lazy('Accepted'),
+            'tags': ('elderly care', 'companionship'),
+            'proof': b'bytes',
+        })
+
+    def test_strings_and_containers(self):
+        self.assertSameRender({
+            'url': 'https://carenest.example/media/a.png',
+            'separators': 'line\u2028paragraph\u2029end',
+            'escapes': 'quote " backslash \\ tab \t',
+            'unicode': 'é – 漢字',
+            'nested': [{'a': None, 'b': True}, [], {}],
+            1: 'int key',
+        })
+
+    def test_indent_and_empty(self):
+        data = {'a': [1, {'b': 2}]}
+        self.assertSameRender(data, 'application/json; indent=4')
+        self.assertEqual(UJSONRenderer().render(None), b'')
+
+    def test_out_of_range_values_behave_like_drf(self):
+        with self.assertRaises(ValueError):
+            UJSONRenderer().render({'x': float('nan')})
+        self.assertSameRender({'big': 2 ** 70})
+
+    def test_parser(self):
+        parser = UJSONParser()
+        body = '{"amount": "1500.50", "note": "नमस्ते", "n": [1, 2.5, null]}'.encode()
+        self.assertEqual(parser.parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        for bad in (b'{"a": NaN}', b'{"a": ', b'\xff'):
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(bad))
+
+
+@override_settings(
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "batch"},
+        "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "batch-l1"},
+    },
+)
+class BatchTests(TestCase):
+
+    def setUp(self):
+        from accounts.models import User
+        user = User.objects.create_user(
+            email='sita.karki@gmail.com', username='sitakarki', password='Sita@2081', role='careseeker'
+        )
+        user.is_verified = True
+        user.save()
+        self.token = self.client.post('/api/user/login/', {
+            'email': 'sita.karki@gmail.com', 'password': 'Sita@2081'
+        }, content_type='application/json').data['token']
+
+        from accounts.models import CaregiverProfile
+        from verifications.models import CaregiverVerification
+        self.caregiver = User.objects.create_user(
+            email='ram.gurung@gmail.com', username='ramgurung', password='Ram@2081', role='caregiver'
+        )
+        CaregiverVerification.objects.create(user=self.caregiver, verification_status='approved')
+        CaregiverProfile.objects.create(
+            user=self.caregiver, service_types=['Elderly Companionship'], available_hours='9AM - 6PM',
+        )
+
+    def batch(self, requests):
+        return self.client.post(
+            '/api/batch/', {'requests': requests}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {self.token}',
+        )
+
+    def test_home_screen_in_one_round_trip(self):
+        response = self.batch([
+            {'path': '/api/user/profile/', 'query': {'fields': 'username,role'}},
+            {'path': '/api/user/notifications/unread-count/'},
+            {'path': '/api/announcements/'},
+            {'path': '/api/chat/conversations/'},
+            {'path': '/api/bookings/caregivers/', 'query': {'fields': 'user_id,username'}},
+        ])
+        self.assertEqual(response.status_code, 200)
+        profile, unread, announcements, conversations, caregivers = response.json()
+        self.assertEqual(profile, {
+            'status': 200, 'headers': {}, 'body': {'username': 'sitakarki', 'role': 'careseeker'},
+        })
+        self.assertEqual(unread['body'], {'unread_count': 0})
+        self.assertEqual(conversations['status'], 200)
+        # the directory's pre-rendered body is embedded as JSON, not as a string
+        self.assertEqual(caregivers['body'], [{'user_id': self.caregiver.id, 'username': 'ramgurung'}])
+
+        # polled endpoints still answer 304 inside a batch
+        etag = announcements['headers']['ETag']
+        [again] = self.batch([{'path': '/api/announcements/', 'headers': {'If-None-Match': etag}}]).json()
+        self.assertEqual((again['status'], again['body']), (304, None))
+
+    def test_sub_request_errors_stay_per_item(self):
+        results = self.batch([
+            {'path': '/api/user/profile/', 'query': {'fields': 'bogus'}},
+            {'path': '/api/user/notifications/mark-all-read/', 'method': 'POST'},
+            {'path': '/api/nowhere/'},
+            {'path': '/api/batch/'},
+            {'path': '/api/user/profile/?fields=username'},
+        ]).json()
+        self.assertEqual([r['status'] for r in results], [400, 405, 404, 404, 200])
+        self.assertEqual(results[4]['body'], {'username': 'sitakarki'})
+
+        self.assertEqual(self.batch([]).status_code, 400)
+        self.assertEqual(self.batch([{'path': '/api/user/profile/'}] * 11).status_code, 400)
+        anonymous = self.client.post('/api/batch/', {'requests': []}, content_type='application/json')
+        self.assertEqual(anonymous.status_code, 401)
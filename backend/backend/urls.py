@@ -2,6 +2,7 @@
 from django.contrib import admin
 from django.urls import path,include
 from accounts.views import EmergencyListCreateView, EmergencyDetailView, EmergencyPendingCountView, EmergencyNotifyCaregiverView
+from backend.batch import BatchView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -20,6 +21,7 @@ urlpatterns = [
     path('api/emergency/<int:pk>/', EmergencyDetailView.as_view(), name='emergency-detail'),
     path('api/emergency/<int:pk>/notify-caregiver/', EmergencyNotifyCaregiverView.as_view(), name='emergency-notify-caregiver'),
     path('api/emergency/pending-count/', EmergencyPendingCountView.as_view(), name='emergency-pending-count'),
+    path('api/batch/', BatchView.as_view(), name='batch'),  # several GETs in one round trip
 ]
 
 # Serve uploaded files (profile images, verification docs) in development
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking
+from .models import Booking, LocationTrack
 
 
 @admin.register(Booking)
@@ -7,3 +7,9 @@ class BookingAdmin(admin.ModelAdmin):
     list_display = ["id", "family", "caregiver", "date", "duration_hours", "status"]
     list_filter = ["status"]
 
+
+
+@admin.register(LocationTrack)
+class LocationTrackAdmin(admin.ModelAdmin):
+    list_display = ["booking", "point_count", "raw_point_count", "is_simplified", "updated_at"]
+    exclude = ["data"]
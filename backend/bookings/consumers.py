@@ -0,0 +1,85 @@
+"""
+Live location socket for an in-progress booking:
+    ws://host/ws/bookings/<booking_id>/location/?token=<jwt>
+
+The assigned caregiver sends {"latitude": 27.7, "longitude": 85.3}; the
+family receives {"type": "location", "latitude", "longitude", "updated_at",
+"is_available"} for every fix, starting with the newest known one on connect.
+Throttled persistence to the booking row lives in bookings/location.py.
+"""
+import logging
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from chat.consumers import get_token_from_scope, get_user_from_token
+from chat.realtime import RealtimeMixin, decode_frame
+from . import location
+from .models import Booking
+from .views import expire_stale_in_progress_bookings
+
+logger = logging.getLogger(__name__)
+
+
+@database_sync_to_async
+def get_trackable_booking(booking_id, user):
+    """The in-progress booking if the user is its caregiver or family, else None."""
+    expire_stale_in_progress_bookings(Booking.objects.filter(pk=booking_id))
+    booking = Booking.objects.filter(pk=booking_id, status="in_progress").first()
+    if booking and user.id in (booking.caregiver_id, booking.family_id):
+        return booking
+    return None
+
+
+class BookingLocationConsumer(RealtimeMixin, AsyncWebsocketConsumer):
+
+    async def connect(self):
+        self.booking_id = int(self.scope["url_route"]["kwargs"]["booking_id"])
+
+        token = get_token_from_scope(self.scope)
+        user = await get_user_from_token(token) if token else None
+        if not user:
+            await self.close(code=4001)
+            return
+
+        booking = await get_trackable_booking(self.booking_id, user)
+        if not booking:
+            await self.close(code=4003)
+            return
+
+        self.is_caregiver = user.id == booking.caregiver_id
+        if not await self.open_connection(user.id):
+            return
+
+        if not self.is_caregiver:
+            self.room_name = location.location_group(self.booking_id)
+            await self.channel_layer.group_add(self.room_name, self.channel_name)
+        await self.accept_connection()
+
+        current = await database_sync_to_async(location.get_location)(booking)
+        await self.send_payload({"type": "location", **current})
+
+    async def disconnect(self, close_code):
+        await self.close_connection()
+        if hasattr(self, "room_name"):
+            await self.channel_layer.group_discard(self.room_name, self.channel_name)
+        if getattr(self, "is_caregiver", False):
+            # the last fix may still be sitting under the throttle
+            await database_sync_to_async(location.flush_location)(self.booking_id)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        self.mark_activity()
+        if not self.is_caregiver:
+            return
+        try:
+            data = decode_frame(text_data, bytes_data)
+            await database_sync_to_async(location.record_location)(
+                self.booking_id, data.get("latitude"), data.get("longitude")
+            )
+        except (ValueError, TypeError):
+            await self.send_payload({"type": "error", "error": "latitude and longitude are required numeric fields."})
+        except location.LocationNotAllowed:
+            await self.close(code=4003)
+
+    async def location_update(self, event):
+        await self.send_frame({"type": "location", **event["payload"]}, event, coalesce_key="location")
@@ -0,0 +1,114 @@
+"""
+Serialize-once caregiver directory.
+
+Everything CaregiverListSerializer returns except booking_status and
+has_active_booking is the same for every viewer. That part is rendered
+once per caregiver to JSON bytes ("cards") and kept in the shared cache:
+
+    caregiver-card:v<v>:<user_id>    b'{"user_id":7,"username":...'   (no closing brace)
+
+Cards are re-rendered after commit when the caregiver's profile, user
+profile, reviews or verification change (bookings/signals.py); a missing
+card is rendered on demand. A directory response is then the cards joined
+with a small per-request tail: booking_status and has_active_booking for
+the viewer (one query for the whole page) plus match_score/distance_km.
+
+A sparse request (?fields=/?exclude=) decodes the cached cards and keeps
+only the selected keys, and skips the viewer query unless a viewer field
+was asked for.
+"""
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import CaregiverProfile
+from backend import cache
+from .models import Booking
+from .serializers import CaregiverListSerializer
+
+NAMESPACE = "caregiver-card"
+CARD_TTL_SECONDS = 24 * 3600
+# per-viewer fields, overlaid per request instead of cached
+VIEWER_FIELDS = ("booking_status", "has_active_booking")
+ACTIVE_STATUSES = ("pending", "accepted", "completion_requested", "awaiting_confirmation")
+# every key of a directory item, in response order
+FIELDS = [*CaregiverListSerializer.Meta.fields, "match_score", "distance_km"]
+
+
+def _render(profiles):
+    cards = {}
+    renderer = JSONRenderer()
+    for item in CaregiverListSerializer(profiles, many=True).data:
+        for field in VIEWER_FIELDS:
+            item.pop(field, None)
+        cards[item["user_id"]] = renderer.render(item)[:-1]
+    return cards
+
+
+def cards_for(caregiver_ids):
+    """{user_id: card bytes}, rendering and caching any that are missing."""
+    cards = cache.get_many(NAMESPACE, caregiver_ids)
+    missing = [user_id for user_id in caregiver_ids if user_id not in cards]
+    if missing:
+        fresh = _render(CaregiverProfile.objects.filter(user_id__in=missing).select_related("user", "user__profile"))
+        cache.set_many(NAMESPACE, fresh, CARD_TTL_SECONDS)
+        cards.update(fresh)
+    return cards
+
+
+def refresh(caregiver_id):
+    """Re-render one caregiver's card (or drop it if they no longer have a profile)."""
+    profile = CaregiverProfile.objects.filter(user_id=caregiver_id).select_related("user", "user__profile").first()
+    if profile is None:
+        cache.delete(NAMESPACE, caregiver_id)
+        return
+    cache.set_many(NAMESPACE, _render([profile]), CARD_TTL_SECONDS)
+
+
+def viewer_overlay(viewer, caregiver_ids):
+    """{caregiver_id: (booking_status, has_active_booking)} for the viewer, in one query."""
+    overlay = {}
+    if getattr(viewer, "role", None) != "careseeker":
+        return overlay
+    rows = (
+        Booking.objects.filter(family=viewer, caregiver_id__in=caregiver_ids)
+        .order_by("caregiver_id", "-created_at")
+        .values_list("caregiver_id", "status")
+    )
+    for caregiver_id, status in rows:
+        latest, active = overlay.get(caregiver_id, (status, False))
+        overlay[caregiver_id] = (latest, active or status in ACTIVE_STATUSES)
+    return overlay
+
+
+def render_page(ranked, viewer, fields=None):
+    """
+    JSON array bytes for ranked [(user_id, match_score, distance_km or None)],
+    skipping caregivers whose profile has gone; fields limits each item's keys.
+    """
+    ids = [user_id for user_id, _, _ in ranked]
+    cards = cards_for(ids)
+    if fields is None or any(field in fields for field in VIEWER_FIELDS):
+        overlay = viewer_overlay(viewer, ids)
+    else:
+        overlay = {}
+    items = []
+    for user_id, score, distance in ranked:
+        card = cards.get(user_id)
+        if card is None:
+            continue
+        status, active = overlay.get(user_id, (None, False))
+        tail = {
+            "booking_status": None if status == "cancelled" else status,
+            "has_active_booking": active,
+            "match_score": round(score, 4),
+        }
+        if distance is not None:
+            tail["distance_km"] = round(distance, 2)
+        if fields is None:
+            items.append(card + b"," + json.dumps(tail, separators=(",", ":")).encode()[1:])
+        else:
+            item = {**json.loads(card + b"}"), **tail}
+            item = {key: value for key, value in item.items() if key in fields}
+            items.append(json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode())
+    return b"[" + b",".join(items) + b"]"
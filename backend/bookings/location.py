@@ -0,0 +1,188 @@
+"""
+Live caregiver location for in-progress bookings.
+
+The latest fix is kept in Redis and pushed to the booking's location group;
+Booking.caregiver_latitude/longitude is only written when the caregiver has
+moved LOCATION_PERSIST_DISTANCE_METERS or LOCATION_PERSIST_INTERVAL_SECONDS
+have passed since the last write, so a phone reporting every few seconds
+costs a handful of row updates per service instead of thousands.
+
+Redis keys:
+    location:latest:<booking_id>      hash lat/lng/ts of the newest fix
+    location:persisted:<booking_id>   hash lat/lng/ts of the last fix written to the DB
+
+Every fix is also buffered for the booking's route history and appended to
+its LocationTrack on the same throttle (see bookings/tracks.py).
+
+If Redis is down every fix is written straight to the booking row.
+"""
+import logging
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import redis
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from backend.redis_client import get_redis
+from . import tracks
+from .models import Booking
+
+logger = logging.getLogger(__name__)
+
+KEY_TTL_SECONDS = 6 * 3600
+EARTH_RADIUS_M = 6371000.0
+
+
+class LocationNotAllowed(Exception):
+    """The booking is not (or no longer) in progress."""
+
+
+def location_group(booking_id):
+    return f"booking_location_{booking_id}"
+
+
+def _latest_key(booking_id):
+    return f"location:latest:{booking_id}"
+
+
+def _persisted_key(booking_id):
+    return f"location:persisted:{booking_id}"
+
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance in metres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def parse_coordinates(latitude, longitude):
+    """Return (lat, lng) floats or raise ValueError."""
+    lat, lng = float(latitude), float(longitude)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("coordinates out of range")
+    return lat, lng
+
+
+def location_payload(lat, lng, ts):
+    return {
+        "latitude": lat,
+        "longitude": lng,
+        "updated_at": datetime.fromtimestamp(ts, tz=dt_timezone.utc).isoformat() if ts else None,
+        "is_available": lat is not None and lng is not None,
+    }
+
+
+def _should_persist(last, lat, lng, now):
+    if not last:
+        return True
+    if now - float(last["ts"]) >= settings.LOCATION_PERSIST_INTERVAL_SECONDS:
+        return True
+    moved = distance_m(float(last["lat"]), float(last["lng"]), lat, lng)
+    return moved >= settings.LOCATION_PERSIST_DISTANCE_METERS
+
+
+def _persist(booking_id, lat, lng, ts):
+    """Write a fix to the booking row; raises LocationNotAllowed if it left in_progress."""
+    updated = Booking.objects.filter(pk=booking_id, status="in_progress").update(
+        caregiver_latitude=round(lat, 6),
+        caregiver_longitude=round(lng, 6),
+        location_updated_at=datetime.fromtimestamp(ts, tz=dt_timezone.utc),
+    )
+    if not updated:
+        raise LocationNotAllowed()
+
+
+def record_location(booking_id, latitude, longitude):
+    """
+    Store a caregiver fix for an in-progress booking, broadcast it and
+    persist it when the throttle allows. Returns the location payload.
+    """
+    from chat.realtime import group_send
+
+    lat, lng = parse_coordinates(latitude, longitude)
+    now = time.time()
+    fix = {"lat": lat, "lng": lng, "ts": now}
+
+    try:
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.hset(_latest_key(booking_id), mapping=fix)
+        pipe.expire(_latest_key(booking_id), KEY_TTL_SECONDS)
+        pipe.hgetall(_persisted_key(booking_id))
+        tracks.buffer_point(pipe, booking_id, lat, lng, now)
+        last_persisted = pipe.execute()[2]
+    except redis.RedisError as e:
+        logger.warning("Location store unavailable, writing booking %s directly: %s", booking_id, e)
+        client, last_persisted = None, None
+
+    if client is None or _should_persist(last_persisted, lat, lng, now):
+        _persist(booking_id, lat, lng, now)
+        tracks.append_points(booking_id, [(lat, lng, now)] if client is None else None)
+        if client is not None:
+            try:
+                client.hset(_persisted_key(booking_id), mapping=fix)
+                client.expire(_persisted_key(booking_id), KEY_TTL_SECONDS)
+            except redis.RedisError as e:
+                logger.warning("Location persist marker failed for booking %s: %s", booking_id, e)
+
+    payload = location_payload(lat, lng, now)
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        async_to_sync(group_send)(
+            channel_layer,
+            location_group(booking_id),
+            {"type": "location_update", "payload": payload},
+            frames={"plain": {"type": "location", **payload}},
+        )
+    return payload
+
+
+def flush_location(booking_id):
+    """Write the newest buffered fix to the booking row (e.g. when tracking stops)."""
+    try:
+        client = get_redis()
+        latest = client.hgetall(_latest_key(booking_id))
+        persisted = client.hgetall(_persisted_key(booking_id))
+    except redis.RedisError as e:
+        logger.warning("Location flush failed for booking %s: %s", booking_id, e)
+        return
+    if not latest or latest.get("ts") == persisted.get("ts"):
+        return
+    try:
+        _persist(booking_id, float(latest["lat"]), float(latest["lng"]), float(latest["ts"]))
+    except LocationNotAllowed:
+        return
+    try:
+        client.hset(_persisted_key(booking_id), mapping=latest)
+    except redis.RedisError as e:
+        logger.warning("Location persist marker failed for booking %s: %s", booking_id, e)
+
+
+def get_location(booking):
+    """Newest known location for a booking: Redis first, then the booking row."""
+    try:
+        latest = get_redis().hgetall(_latest_key(booking.pk))
+    except redis.RedisError as e:
+        logger.warning("Location lookup failed for booking %s: %s", booking.pk, e)
+        latest = None
+    if latest:
+        return location_payload(float(latest["lat"]), float(latest["lng"]), float(latest["ts"]))
+
+    if (
+        booking.caregiver_latitude is None
+        or booking.caregiver_longitude is None
+        or booking.location_updated_at is None
+    ):
+        return location_payload(None, None, None)
+    return location_payload(
+        float(booking.caregiver_latitude),
+        float(booking.caregiver_longitude),
+        booking.location_updated_at.timestamp(),
+    )
+
@@ -0,0 +1,73 @@
+import timeit
+from datetime import date, datetime, time
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from backend.renderers import UJSONRenderer
+from bookings.models import Booking
+from bookings.serializers import BookingSerializer
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer
+from reviews.models import Review
+from reviews.serializers import ReviewSerializer
+
+KATHMANDU = ZoneInfo("Asia/Kathmandu")
+
+
+def _synthetic(rows):
+    """
+    A booking-list-shaped payload for databases without data; values are
+    already in the form serializers hand to the renderer.
+    """
+    now = datetime.now(KATHMANDU).isoformat()
+    return [
+        {
+            "id": i,
+            "status": "accepted",
+            "service_types": ["elderly care", "companionship"],
+            "date": date(2026, 1, 1).isoformat(),
+            "start_time": time(9, 30).isoformat(),
+            "duration_hours": 3,
+            "total_amount": str(Decimal("1500.50")),
+            "address": "Baneshwor, Kathmandu / ward 10",
+            "notes": "Prefers Nepali-speaking caregiver – नमस्ते",
+            "created_at": now,
+            "updated_at": now,
+            "caregiver": {"id": i + 1, "username": f"caregiver{i}", "rating": 4.75},
+        }
+        for i in range(rows)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare DRF's JSONRenderer with UJSONRenderer on list endpoint payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Rows per payload.")
+        parser.add_argument("--repeat", type=int, default=50, help="Renders per measurement.")
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        payloads = {
+            "bookings": BookingSerializer(
+                Booking.objects.select_related("family__profile", "caregiver__profile").order_by("-id")[:rows], many=True
+            ).data,
+            "notifications": NotificationSerializer(Notification.objects.order_by("-id")[:rows], many=True).data,
+            "reviews": ReviewSerializer(Review.objects.order_by("-id")[:rows], many=True).data,
+            "synthetic": _synthetic(rows),
+        }
+
+        stdlib, fast = JSONRenderer(), UJSONRenderer()
+        self.stdout.write(f"{'payload':<15}{'rows':>6}{'json ms':>10}{'ujson ms':>10}{'speedup':>9}")
+        for name, data in payloads.items():
+            if not data:
+                self.stdout.write(f"{name:<15}{0:>6}  (no rows, skipped)")
+                continue
+            slow_ms = min(timeit.repeat(lambda: stdlib.render(data), number=repeat, repeat=3)) / repeat * 1000
+            fast_ms = min(timeit.repeat(lambda: fast.render(data), number=repeat, repeat=3)) / repeat * 1000
+            self.stdout.write(
+                f"{name:<15}{len(data):>6}{slow_ms:>10.3f}{fast_ms:>10.3f}{slow_ms / fast_ms:>8.1f}x"
+            )
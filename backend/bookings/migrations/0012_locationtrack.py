@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_alter_booking_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.BinaryField(default=b'')),
+                ('point_count', models.PositiveIntegerField(default=0)),
+                ('raw_point_count', models.PositiveIntegerField(default=0)),
+                ('is_simplified', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='location_track', to='bookings.booking')),
+            ],
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:57
+
+from statistics import median
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+# Frozen copy of bookings.ranking.compute_features as of this migration, so
+# later changes to the ranking module don't change (or break) what it writes.
+ACCEPTED_STATUSES = ("accepted", "in_progress", "completion_requested", "awaiting_confirmation", "completed")
+
+
+def compute_features(bookings, reviews):
+    counts = bookings.aggregate(
+        accepted=Count("id", filter=Q(status__in=ACCEPTED_STATUSES)),
+        rejected=Count("id", filter=Q(status="rejected")),
+        expired=Count("id", filter=Q(status="expired")),
+        completed=Count("id", filter=Q(status="completed")),
+    )
+    ratings = reviews.aggregate(total=Sum("rating"), count=Count("id"))
+    response_times = [
+        (responded_at - created_at).total_seconds()
+        for created_at, responded_at in bookings.filter(responded_at__isnull=False).values_list(
+            "created_at", "responded_at"
+        )
+    ]
+    return {
+        "rating_sum": ratings["total"] or 0,
+        "rating_count": ratings["count"],
+        "accepted_count": counts["accepted"],
+        "decided_count": counts["accepted"] + counts["rejected"] + counts["expired"],
+        "median_response_seconds": max(median(response_times), 0.0) if response_times else None,
+        "completed_count": counts["completed"],
+    }
+
+
+def compute_existing_features(apps, schema_editor):
+    Booking = apps.get_model("bookings", "Booking")
+    Review = apps.get_model("reviews", "Review")
+    CaregiverRankFeatures = apps.get_model("bookings", "CaregiverRankFeatures")
+    caregiver_ids = Booking.objects.values_list("caregiver_id", flat=True).distinct()
+    CaregiverRankFeatures.objects.bulk_create(
+        [
+            CaregiverRankFeatures(
+                caregiver_id=caregiver_id,
+                **compute_features(
+                    Booking.objects.filter(caregiver_id=caregiver_id),
+                    Review.objects.filter(caregiver_id=caregiver_id),
+                ),
+            )
+            for caregiver_id in caregiver_ids
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_locationtrack'),
+        ('reviews', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='responded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CaregiverRankFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('accepted_count', models.PositiveIntegerField(default=0)),
+                ('decided_count', models.PositiveIntegerField(default=0)),
+                ('median_response_seconds', models.FloatField(blank=True, null=True)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('caregiver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rank_features', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(compute_existing_features, migrations.RunPython.noop),
+    ]
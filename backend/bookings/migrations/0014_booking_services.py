@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+def link_existing_services(apps, schema_editor):
+    ServiceType = apps.get_model("accounts", "ServiceType")
+    Booking = apps.get_model("bookings", "Booking")
+    bookings = list(Booking.objects.exclude(service_types=[]).only("id", "service_types"))
+    names = {n.strip() for b in bookings for n in b.service_types or [] if n and n.strip()}
+    ServiceType.objects.bulk_create([ServiceType(name=n) for n in names], ignore_conflicts=True)
+    ids = dict(ServiceType.objects.values_list("name", "id"))
+    Through = Booking.services.through
+    Through.objects.bulk_create(
+        [
+            Through(booking_id=b.id, servicetype_id=ids[n])
+            for b in bookings
+            for n in {n.strip() for n in b.service_types or [] if n and n.strip()}
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0021_service_catalog'),
+        ('bookings', '0013_rank_features'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='services',
+            field=models.ManyToManyField(blank=True, related_name='bookings', to='accounts.servicetype'),
+        ),
+        migrations.RunPython(link_existing_services, migrations.RunPython.noop),
+    ]
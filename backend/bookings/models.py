@@ -28,6 +28,7 @@ class Booking(models.Model):
         related_name="bookings_received",
     )
     service_types = models.JSONField(default=list, blank=True)  # things he/she was hired to do
+    services = models.ManyToManyField("accounts.ServiceType", blank=True, related_name="bookings")
     person_name = models.CharField(max_length=255, blank=True)  # who needs care
     person_age = models.PositiveIntegerField(null=True, blank=True)
     date = models.DateField()
@@ -46,15 +47,30 @@ class Booking(models.Model):
     check_out_time = models.DateTimeField(null=True, blank=True)
     proof_image = models.ImageField(upload_to="booking_proofs/", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     service_address = models.CharField(max_length=255, blank=True)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     caregiver_latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     caregiver_longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     location_updated_at = models.DateTimeField(null=True, blank=True)
+    responded_at = models.DateTimeField(null=True, blank=True)  # caregiver accepted/rejected
+    series = models.ForeignKey(
+        "BookingSeries",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="bookings",
+    )
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # month calendars and overlap checks are date ranges per person
+            models.Index(fields=["caregiver", "date"], name="booking_caregiver_date_idx"),
+            models.Index(fields=["family", "date"], name="booking_family_date_idx"),
+            models.Index(fields=["date"], name="booking_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.family.username} -> {self.caregiver.username} ({self.date})"
@@ -87,3 +103,67 @@ class Booking(models.Model):
         other_end = other_start + timedelta(hours=other_duration_hours)
         
         return self.start_datetime < other_end and other_start < self.end_datetime
+
+
+class BookingSeries(models.Model):
+    # one request for recurring care; each occurrence is a normal Booking
+    FREQUENCY_CHOICES = (
+        ("daily", "Daily"),
+        ("weekly", "Weekly"),
+    )
+
+    family = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="booking_series_made",
+    )
+    caregiver = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="booking_series_received",
+    )
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(default=1)  # every N days/weeks
+    weekdays = models.JSONField(default=list, blank=True)  # weekly only, e.g. ["mon", "thu"]
+    start_date = models.DateField()
+    end_date = models.DateField()  # date of the last occurrence
+    occurrence_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.frequency} series {self.start_date} - {self.end_date} ({self.occurrence_count})"
+
+
+class LocationTrack(models.Model):
+    # caregiver route for one booking, packed by bookings/tracks.py
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name="location_track")
+    data = models.BinaryField(default=b"")
+    point_count = models.PositiveIntegerField(default=0)
+    raw_point_count = models.PositiveIntegerField(default=0)  # before simplification
+    is_simplified = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Track for booking {self.booking_id} ({self.point_count} points)"
+
+
+class CaregiverRankFeatures(models.Model):
+    # precomputed inputs for bookings/ranking.py, refreshed on booking/review changes
+    caregiver = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="rank_features",
+    )
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    accepted_count = models.PositiveIntegerField(default=0)
+    decided_count = models.PositiveIntegerField(default=0)  # accepted + rejected + expired
+    median_response_seconds = models.FloatField(null=True, blank=True)
+    completed_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rank features for caregiver {self.caregiver_id}"
@@ -0,0 +1,293 @@
+"""
+Caregiver ranking for the directory ("best matches first").
+
+Per-caregiver features that need aggregation (rating, acceptance rate,
+median response time, completed bookings) are precomputed into
+CaregiverRankFeatures and refreshed for one caregiver at a time when a
+review is added or removed, or a booking's status moves it between
+feature buckets (see bookings/signals.py). Request-specific features
+(distance, service-type overlap) are computed per request.
+
+Each process keeps a snapshot of all feature rows as numpy arrays with the
+query-independent base score already computed. Every refresh bumps the
+ranking:version counter in Redis and records the caregiver in
+ranking:changes (caregiver id -> version of their last refresh), so a
+process that sees the counter move re-reads only those caregivers' rows.
+It reloads everything on first use, when it fell more than CHANGES_KEPT
+caregivers behind, or every SNAPSHOT_MAX_AGE_SECONDS if Redis is down.
+Scoring a candidate list is then a single vectorized pass with no queries.
+"""
+import logging
+import threading
+import time
+from statistics import median
+
+import numpy as np
+import redis
+from django.db.models import Count, Q, Sum
+
+from backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "ranking:version"
+CHANGES_KEY = "ranking:changes"
+CHANGES_KEPT = 1000
+SNAPSHOT_MAX_AGE_SECONDS = 60
+
+# bump the version and record who changed in one step, so a reader never
+# sees a version whose caregiver is not in ranking:changes yet
+_BUMP = """
+local version = redis.call("incr", KEYS[1])
+redis.call("zadd", KEYS[2], version, ARGV[1])
+redis.call("zremrangebyrank", KEYS[2], 0, -tonumber(ARGV[2]) - 1)
+return version
+"""
+
+WEIGHTS = {
+    "rating": 0.35,
+    "acceptance": 0.20,
+    "response": 0.15,
+    "completed": 0.10,
+    "distance": 0.10,
+    "services": 0.10,
+}
+# Bayesian prior: a caregiver with few reviews is pulled towards PRIOR_RATING
+PRIOR_RATING = 3.5
+PRIOR_REVIEWS = 5
+# a response slower than the pending window scores zero
+RESPONSE_WINDOW_SECONDS = 30 * 60
+
+ACCEPTED_STATUSES = ("accepted", "in_progress", "completion_requested", "awaiting_confirmation", "completed")
+
+FEATURE_COLUMNS = (
+    "rating_sum",
+    "rating_count",
+    "accepted_count",
+    "decided_count",
+    "median_response_seconds",
+    "completed_count",
+)
+
+
+# feature computation
+
+def compute_features(bookings, reviews):
+    """
+    Aggregate one caregiver's features from their bookings and reviews
+    querysets.
+    """
+    counts = bookings.aggregate(
+        accepted=Count("id", filter=Q(status__in=ACCEPTED_STATUSES)),
+        rejected=Count("id", filter=Q(status="rejected")),
+        expired=Count("id", filter=Q(status="expired")),
+        completed=Count("id", filter=Q(status="completed")),
+    )
+    ratings = reviews.aggregate(total=Sum("rating"), count=Count("id"))
+    response_times = [
+        (responded_at - created_at).total_seconds()
+        for created_at, responded_at in bookings.filter(responded_at__isnull=False).values_list(
+            "created_at", "responded_at"
+        )
+    ]
+    return {
+        "rating_sum": ratings["total"] or 0,
+        "rating_count": ratings["count"],
+        "accepted_count": counts["accepted"],
+        "decided_count": counts["accepted"] + counts["rejected"] + counts["expired"],
+        "median_response_seconds": max(median(response_times), 0.0) if response_times else None,
+        "completed_count": counts["completed"],
+    }
+
+
+def _buckets(status):
+    return (status in ACCEPTED_STATUSES, status == "rejected", status == "expired", status == "completed")
+
+
+def affects_features(previous_status, status):
+    """True if a booking moving from previous_status to status changes its caregiver's counts."""
+    return _buckets(previous_status) != _buckets(status)
+
+
+def refresh_caregiver(caregiver_id):
+    """Recompute one caregiver's features and tell every process to re-read them."""
+    from reviews.models import Review
+    from .models import Booking, CaregiverRankFeatures
+
+    features = compute_features(
+        Booking.objects.filter(caregiver_id=caregiver_id),
+        Review.objects.filter(caregiver_id=caregiver_id),
+    )
+    CaregiverRankFeatures.objects.update_or_create(caregiver_id=caregiver_id, defaults=features)
+    try:
+        get_redis().eval(_BUMP, 2, VERSION_KEY, CHANGES_KEY, caregiver_id, CHANGES_KEPT)
+    except redis.RedisError as e:
+        logger.warning("Ranking version bump failed for caregiver %s: %s", caregiver_id, e)
+        _snapshot.invalidate()
+
+
+# scoring
+
+def base_scores(rating_sum, rating_count, accepted, decided, response_seconds, completed):
+    """Query-independent score in [0, 1] for arrays of features."""
+    rating = (rating_sum + PRIOR_RATING * PRIOR_REVIEWS) / (rating_count + PRIOR_REVIEWS) / 5.0
+    acceptance = (accepted + 1.0) / (decided + 2.0)  # Laplace smoothing; 0.5 with no history
+    response = np.where(
+        np.isnan(response_seconds), 0.5, 1.0 - np.clip(response_seconds / RESPONSE_WINDOW_SECONDS, 0.0, 1.0)
+    )
+    most_completed = completed.max() if completed.size else 0
+    completed_score = np.log1p(completed) / np.log1p(most_completed) if most_completed else np.zeros_like(completed)
+    return (
+        WEIGHTS["rating"] * rating
+        + WEIGHTS["acceptance"] * acceptance
+        + WEIGHTS["response"] * response
+        + WEIGHTS["completed"] * completed_score
+    )
+
+
+# base score of a caregiver with no feature row yet (no bookings, no reviews)
+DEFAULT_BASE_SCORE = float(
+    base_scores(
+        np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1), np.full(1, np.nan), np.zeros(1)
+    )[0]
+)
+
+
+def _as_arrays(rows):
+    """(caregiver ids, features matrix) from (caregiver_id, *FEATURE_COLUMNS) rows."""
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    features = np.array(
+        [[np.nan if v is None else v for v in row[1:]] for row in rows], dtype=np.float64
+    ).reshape(len(rows), len(FEATURE_COLUMNS))
+    return ids, features
+
+
+class FeatureSnapshot:
+    """All caregivers' base scores as arrays, kept in step with ranking:changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.loaded_at = None
+        self.position = {}
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.features = np.zeros((0, len(FEATURE_COLUMNS)))
+        self.scores = np.zeros(0)
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def _changes_since(self, version):
+        """
+        (current version, caregiver ids refreshed after version), with None
+        for the ids when they cannot be known; None if Redis is unavailable.
+        """
+        try:
+            pipe = get_redis().pipeline()
+            pipe.get(VERSION_KEY)
+            pipe.zcard(CHANGES_KEY)
+            pipe.zrange(CHANGES_KEY, 0, 0, withscores=True)
+            pipe.zrangebyscore(CHANGES_KEY, f"({version or 0}", "+inf")
+            current, kept, oldest, changed = pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Ranking version lookup failed: %s", e)
+            return None
+        current = int(current or 0)
+        # a full log that starts after our version may have dropped a caregiver we need
+        trimmed = kept >= CHANGES_KEPT and oldest and oldest[0][1] > (version or 0) + 1
+        if version is None or current < version or trimmed:
+            return current, None
+        return current, [int(caregiver_id) for caregiver_id in changed]
+
+    def refresh(self):
+        since = self.version
+        changes = self._changes_since(since)
+        with self._lock:
+            if self.version != since:
+                return self  # another thread caught up meanwhile
+            if changes is None:
+                if self.loaded_at is None or time.monotonic() - self.loaded_at > SNAPSHOT_MAX_AGE_SECONDS:
+                    self._load(None)
+            elif self.loaded_at is None or changes[1] is None:
+                self._load(changes[0])
+            elif changes[0] != self.version:
+                self._update(changes[1], changes[0])
+        return self
+
+    def _rows(self, queryset):
+        return list(queryset.values_list("caregiver_id", *FEATURE_COLUMNS))
+
+    def _load(self, version):
+        from .models import CaregiverRankFeatures
+
+        ids, features = _as_arrays(self._rows(CaregiverRankFeatures.objects.all()))
+        self._publish(ids, features, {caregiver_id: i for i, caregiver_id in enumerate(ids.tolist())})
+        self.version = version
+        self.loaded_at = time.monotonic()
+
+    def _update(self, caregiver_ids, version):
+        """Re-read only the given caregivers' rows and rescore."""
+        from .models import CaregiverRankFeatures
+
+        ids, features = _as_arrays(self._rows(CaregiverRankFeatures.objects.filter(caregiver_id__in=caregiver_ids)))
+        all_ids, all_features, position = self.ids, self.features.copy(), dict(self.position)
+        added = []
+        for i, caregiver_id in enumerate(ids.tolist()):
+            if caregiver_id in position:
+                all_features[position[caregiver_id]] = features[i]
+            else:
+                position[caregiver_id] = len(all_ids) + len(added)
+                added.append(i)
+        if added:
+            all_ids = np.concatenate([all_ids, ids[added]])
+            all_features = np.vstack([all_features, features[added]])
+        # the completed-bookings term is relative to the busiest caregiver, so rescore everyone
+        self._publish(all_ids, all_features, position)
+        self.version = version
+
+    def _publish(self, ids, features, position):
+        # scores before position, so base_for() never indexes past the arrays
+        self.ids, self.features = ids, features
+        self.scores = base_scores(*features.T)
+        self.position = position
+
+    def base_for(self, caregiver_ids):
+        """Base scores for caregiver ids, DEFAULT_BASE_SCORE where no row exists."""
+        index = np.array([self.position.get(cid, -1) for cid in caregiver_ids], dtype=np.intp)
+        scores = np.full(len(caregiver_ids), DEFAULT_BASE_SCORE)
+        known = index >= 0
+        scores[known] = self.scores[index[known]]
+        return scores
+
+
+_snapshot = FeatureSnapshot()
+
+
+def rank(profiles, distances=None, radius_km=None, service_types=None):
+    """
+    Order CaregiverProfile objects best match first.
+
+    distances (km, aligned with profiles) and radius_km add a proximity term;
+    service_types adds the share of requested services each caregiver offers.
+    Returns (profiles, scores, order), order being the input index of each
+    ranked profile so callers can reorder their own aligned lists.
+    """
+    profiles = list(profiles)
+    if not profiles:
+        return [], [], np.zeros(0, dtype=np.intp)
+    snapshot = _snapshot.refresh()
+    scores = snapshot.base_for([p.user_id for p in profiles])
+
+    if distances is not None and radius_km:
+        proximity = 1.0 - np.clip(np.asarray(distances, dtype=np.float64) / radius_km, 0.0, 1.0)
+        scores = scores + WEIGHTS["distance"] * proximity
+
+    wanted = sorted({s for s in service_types or [] if s})
+    if wanted:
+        offered = np.array(
+            [[service in (p.service_types or []) for service in wanted] for p in profiles], dtype=bool
+        )
+        scores = scores + WEIGHTS["services"] * offered.mean(axis=1)
+
+    order = np.argsort(-scores, kind="stable")
+    return [profiles[i] for i in order], [float(scores[i]) for i in order], order
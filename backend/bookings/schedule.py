@@ -0,0 +1,130 @@
+"""
+Month calendar of bookings, aggregated in SQL.
+
+A month is one indexed date-range query grouped by day (counts and hours
+via conditional aggregation) plus one query for the booked intervals, so
+the cost depends on the month's bookings, not on a user's whole history.
+
+Results go through backend/cache.py with one scope per calendar and month:
+    caregiver:<user_id>:<YYYY-MM>
+    family:<user_id>:<YYYY-MM>
+    all:<YYYY-MM>                              admin, platform-wide
+The Booking signals bump the scopes of the months a booking was in before
+and after the save once the transaction commits; a month computed from
+older data is stored under the old version and never read again.
+"""
+import calendar
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from backend import cache
+from .models import Booking
+
+NAMESPACE = "calendar"
+
+CACHE_TTL_SECONDS = 6 * 3600
+# statuses that occupy the caregiver's time
+BOOKED_STATUSES = ("pending", "accepted", "in_progress", "completion_requested", "awaiting_confirmation", "completed")
+
+
+def parse_month(value):
+    """'YYYY-MM' -> first day of that month, or raise ValueError."""
+    return datetime.strptime(value or "", "%Y-%m").date().replace(day=1)
+
+
+def _scope(scope, user_id, month):
+    if scope == "all":
+        return f"all:{month:%Y-%m}"
+    return f"{scope}:{user_id}:{month:%Y-%m}"
+
+
+def _month_of(day):
+    return day.replace(day=1) if isinstance(day, date) else parse_month(str(day)[:7])
+
+
+def _compute(scope, user_id, month):
+    last_day = month.replace(day=calendar.monthrange(month.year, month.month)[1])
+    bookings = Booking.objects.filter(date__range=(month, last_day))
+    if scope == "caregiver":
+        bookings = bookings.filter(caregiver_id=user_id)
+    elif scope == "family":
+        bookings = bookings.filter(family_id=user_id)
+
+    booked = Q(status__in=BOOKED_STATUSES)
+    rows = (
+        bookings.order_by()
+        .values("date")
+        .annotate(
+            bookings=Count("id", filter=booked),
+            hours=Sum("duration_hours", filter=booked),
+            pending=Count("id", filter=Q(status="pending")),
+            completed=Count("id", filter=Q(status="completed")),
+        )
+        .order_by("date")
+    )
+    days = {
+        row["date"]: {
+            "date": row["date"].isoformat(),
+            "bookings": row["bookings"],
+            "hours": row["hours"] or 0,
+            "pending": row["pending"],
+            "completed": row["completed"],
+        }
+        for row in rows
+        if row["bookings"]
+    }
+
+    # platform-wide months only carry the per-day totals
+    if scope != "all":
+        intervals = bookings.filter(booked).order_by("date", "start_time").values_list(
+            "id", "date", "start_time", "duration_hours", "status"
+        )
+        for booking_id, day, start_time, duration_hours, booking_status in intervals:
+            start = datetime.combine(day, start_time or datetime.min.time())
+            end = start + timedelta(hours=duration_hours)
+            days[day].setdefault("intervals", []).append({
+                "booking_id": booking_id,
+                "start": start.strftime("%H:%M"),
+                "end": end.strftime("%H:%M") if end.date() == day else "24:00",
+                "status": booking_status,
+            })
+
+    return {
+        "month": f"{month:%Y-%m}",
+        "days": list(days.values()),
+        "total_bookings": sum(d["bookings"] for d in days.values()),
+        "total_hours": sum(d["hours"] for d in days.values()),
+    }
+
+
+def month_calendar(scope, user_id, month):
+    """Cached calendar for a caregiver, a family, or (scope 'all') the platform."""
+    return cache.get_or_compute(
+        NAMESPACE, [], lambda: _compute(scope, user_id, month),
+        ttl=CACHE_TTL_SECONDS, scope=_scope(scope, user_id, month),
+    )
+
+
+def invalidate(booking, previous_date=None):
+    """
+    Drop every cached month a booking appears in, and the month it moved out
+    of (previous_date), once the transaction commits.
+    """
+    months = {_month_of(booking.date)}
+    if previous_date is not None:
+        months.add(_month_of(previous_date))
+    scopes = set()
+    for month in months:
+        scopes.update([
+            _scope("caregiver", booking.caregiver_id, month),
+            _scope("family", booking.family_id, month),
+            _scope("all", None, month),
+        ])
+
+    def bump():
+        for scope in scopes:
+            cache.bump(NAMESPACE, scope=scope)
+
+    transaction.on_commit(bump)
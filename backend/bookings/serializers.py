@@ -9,6 +9,7 @@ from verifications.models import CaregiverVerification
 from reviews.models import Review
 from django.db.models import Avg, Count
 from backend.error_messages import ErrorMessages
+from backend.sparse import SparseFieldsMixin
 
 
 class CaregiverListSerializer(serializers.ModelSerializer):
@@ -195,11 +196,14 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         if caregiver_id:
             try:
                 caregiver_profile = CaregiverProfile.objects.get(user_id=caregiver_id)
-                caregiver_services = set(caregiver_profile.service_types or [])
-                requested_services = set(data.get("service_types", []))
+                requested_services = {s.strip() for s in data.get("service_types", [])}
+                # indexed lookup on the caregiver's catalog links
+                offered_services = set(
+                    caregiver_profile.services.filter(name__in=requested_services).values_list("name", flat=True)
+                )
 
-                if not requested_services.issubset(caregiver_services):
-                    invalid_services = requested_services - caregiver_services
+                if not requested_services.issubset(offered_services):
+                    invalid_services = requested_services - offered_services
                     raise serializers.ValidationError(
                         f"Services not offered by this caregiver: {', '.join(invalid_services)}"
                     )
@@ -236,8 +240,20 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         return value
 
 
-class BookingSerializer(serializers.ModelSerializer):
-    """Full booking details - used for list and detail views"""
+class BookingSeriesCreateSerializer(BookingCreateSerializer):
+    """Booking request plus a recurrence rule; `date` is the first visit"""
+    frequency = serializers.ChoiceField(choices=["daily", "weekly"])
+    interval = serializers.IntegerField(required=False, default=1, min_value=1, max_value=12)
+    count = serializers.IntegerField(required=False, min_value=1)
+    until = serializers.DateField(required=False)
+    weekdays = serializers.ListField(child=serializers.CharField(), required=False)
+
+    class Meta(BookingCreateSerializer.Meta):
+        fields = BookingCreateSerializer.Meta.fields + ["frequency", "interval", "count", "until", "weekdays"]
+
+
+class BookingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Full booking details - used for list and detail views (list views accept ?fields=/?exclude=)"""
     family_name = serializers.CharField(source="family.username", read_only=True)
     caregiver_name = serializers.CharField(source="caregiver.username", read_only=True)
     family_profile_image = serializers.SerializerMethodField()
@@ -281,9 +297,21 @@ class BookingSerializer(serializers.ModelSerializer):
             "verification_status",
             "review_rating",
             "has_review",
+            "series",
             "created_at",
         ]
-        read_only_fields = ["family", "status", "created_at", "total_amount"]
+        read_only_fields = ["family", "status", "created_at", "total_amount", "series"]
+
+    # model columns the method fields read, for sparse_queryset()
+    sparse_sources = {
+        "family_profile_image": ["family__profile__profile_image"],
+        "caregiver_profile_image": ["caregiver__profile__profile_image"],
+        "booking_status": ["status"],
+        "payment_status": ["status"],
+        "verification_status": ["caregiver"],
+        "review_rating": ["review__rating"],
+        "has_review": [],
+    }
 
     def get_booking_status(self, obj):
         """
@@ -0,0 +1,243 @@
+"""
+Recurring bookings: one request for daily or weekly visits.
+
+A series expands its recurrence rule into dates, checks every occurrence
+against the caregiver's weekly schedule and existing bookings with one
+query each, then creates all occurrences with bulk_create in a single
+transaction. bulk_create skips post_save, so the per-booking side effects
+(catalog links, calendar cache, dashboards) are done here once for the whole
+series, and the caregiver gets one grouped notification instead of one per
+visit.
+
+The caregiver answers the whole series at once (respond()), and unanswered
+series expire together (expire()). Both move each pending occurrence through
+the state machine with its per-booking notifications muted, then send one
+grouped notification per person.
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+
+from accounts import availability, dashboards
+from accounts.models import CaregiverAvailabilityOverride, ServiceType
+from .models import Booking, BookingSeries
+from . import schedule
+
+MAX_OCCURRENCES = 62
+# statuses that occupy the caregiver's time (see check_caregiver_overlap)
+BLOCKING_STATUSES = ("accepted", "in_progress", "completion_requested", "awaiting_confirmation")
+
+
+def expand(start_date, frequency, interval=1, count=None, until=None, weekdays=None):
+    """
+    Occurrence dates for a recurrence rule, first one on start_date (or the
+    first listed weekday on or after it). Raises ValueError on a bad rule.
+    """
+    if frequency not in ("daily", "weekly"):
+        raise ValueError("frequency must be daily or weekly.")
+    if interval < 1:
+        raise ValueError("interval must be at least 1.")
+    if not count and not until:
+        raise ValueError("Give either count or until.")
+    if count and count > MAX_OCCURRENCES:
+        raise ValueError(f"A series can have at most {MAX_OCCURRENCES} visits.")
+    if until and until < start_date:
+        raise ValueError("until must not be before the start date.")
+
+    if frequency == "daily":
+        weekday_set = None
+        period = interval
+    else:
+        try:
+            weekday_set = {availability.DAYS.index(d) for d in weekdays} if weekdays else {start_date.weekday()}
+        except ValueError:
+            raise ValueError("weekdays must be mon, tue, wed, thu, fri, sat or sun.")
+        period = 7 * interval
+
+    # weekly rules run from the Monday of the first week
+    anchor = start_date - timedelta(days=start_date.weekday()) if frequency == "weekly" else start_date
+    dates = []
+    day = start_date
+    while len(dates) < (count or MAX_OCCURRENCES + 1):
+        if until and day > until:
+            break
+        offset = (day - anchor).days
+        in_period = offset % period < 7 if frequency == "weekly" else offset % period == 0
+        if in_period and (weekday_set is None or day.weekday() in weekday_set):
+            dates.append(day)
+        day += timedelta(days=1)
+    if len(dates) > MAX_OCCURRENCES:
+        raise ValueError(f"A series can have at most {MAX_OCCURRENCES} visits.")
+    if not dates:
+        raise ValueError("The recurrence rule produces no visits.")
+    return dates
+
+
+def _interval(day, start_time, duration_hours):
+    start = datetime.combine(day, start_time)
+    return start, start + timedelta(hours=float(duration_hours))
+
+
+def find_conflicts(caregiver_id, dates, start_time, duration_hours, exclude_booking_id=None):
+    """
+    {date: booking_id} for occurrences overlapping the caregiver's booked
+    time (one query). exclude_booking_id leaves out the booking being checked.
+    """
+    existing = Booking.objects.filter(
+        caregiver_id=caregiver_id,
+        date__range=(dates[0] - timedelta(days=1), dates[-1]),
+        status__in=BLOCKING_STATUSES,
+    ).exclude(pk=exclude_booking_id).values_list("id", "date", "start_time", "duration_hours")
+    booked = [(booking_id, *_interval(d, t or datetime.min.time(), h)) for booking_id, d, t, h in existing]
+
+    conflicts = {}
+    for day in dates:
+        start, end = _interval(day, start_time, duration_hours)
+        for booking_id, b_start, b_end in booked:
+            if start < b_end and b_start < end:
+                conflicts[day] = booking_id
+                break
+    return conflicts
+
+
+def outside_schedule(caregiver_profile, dates, start_time, duration_hours):
+    """Occurrence dates the caregiver's weekly schedule (and overrides) does not cover."""
+    if caregiver_profile is None:
+        return []
+    touched = {d + timedelta(days=1) for d in dates} | set(dates)
+    overrides = {
+        (caregiver_id, day): mask
+        for caregiver_id, day, mask in CaregiverAvailabilityOverride.objects.filter(
+            caregiver_id=caregiver_profile.user_id, date__in=touched
+        ).values_list("caregiver_id", "date", "hours_mask")
+    }
+    mask = availability.enforced_mask(caregiver_profile.weekly_availability, caregiver_profile.schedule_explicit)
+    rows = [(caregiver_profile.user_id, mask)]
+    return [
+        day for day in dates
+        if not availability.available_user_ids(rows, day, start_time, duration_hours, overrides)
+    ]
+
+
+def create_series(family, caregiver, rule, dates, booking_fields, total_amount):
+    """Create the series and its pending occurrences; returns (series, bookings)."""
+    with transaction.atomic():
+        series = BookingSeries.objects.create(
+            family=family,
+            caregiver=caregiver,
+            frequency=rule["frequency"],
+            interval=rule.get("interval") or 1,
+            weekdays=rule.get("weekdays") or [],
+            start_date=dates[0],
+            end_date=dates[-1],
+            occurrence_count=len(dates),
+        )
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                family=family,
+                caregiver=caregiver,
+                series=series,
+                date=day,
+                status="pending",
+                total_amount=total_amount,
+                **booking_fields,
+            )
+            for day in dates
+        ])
+        services = ServiceType.for_names(booking_fields.get("service_types"))
+        Booking.services.through.objects.bulk_create([
+            Booking.services.through(booking_id=booking.pk, servicetype_id=service.pk)
+            for booking in bookings
+            for service in services
+        ])
+        transaction.on_commit(lambda: _after_create(series, bookings))
+    return series, bookings
+
+
+def _after_create(series, bookings):
+    for month_start in sorted({b.date.replace(day=1) for b in bookings}):
+        schedule.invalidate(Booking(date=month_start, family_id=series.family_id, caregiver_id=series.caregiver_id))
+    dashboards.invalidate(series.family_id, series.caregiver_id)
+    _notify(
+        series.caregiver,
+        "New recurring booking request",
+        (
+            f"{series.family.username} sent you a {series.frequency} booking request for "
+            f"{series.occurrence_count} visits ({series.start_date} to {series.end_date})."
+        ),
+        bookings[0],
+    )
+
+
+def _quiet(booking):
+    # the post_save notification handlers skip these; the series sends one for all
+    booking._grouped_notification = True
+    return booking
+
+
+def respond(booking_series, to_status, **fields):
+    """
+    Accept or reject every pending occurrence of the series. Returns
+    (changed bookings, dates left pending because the slot is taken).
+    """
+    from . import state_machine
+
+    changed, taken = [], []
+    for booking in booking_series.bookings.filter(status="pending").order_by("date"):
+        try:
+            changed.append(state_machine.transition(_quiet(booking), to_status, **fields))
+        except state_machine.SlotTaken:
+            taken.append(booking.date)
+        except state_machine.TransitionError:
+            continue  # answered on its own meanwhile
+    if changed:
+        caregiver_name = booking_series.caregiver.username
+        if to_status == "accepted":
+            title, message = (
+                "Recurring booking accepted",
+                f"{caregiver_name} accepted {len(changed)} of your {booking_series.frequency} visits "
+                f"({booking_series.start_date} to {booking_series.end_date}).",
+            )
+        else:
+            title, message = (
+                "Recurring booking declined",
+                fields.get("rejection_reason") or f"{caregiver_name} declined your {booking_series.frequency} booking request.",
+            )
+        _notify(booking_series.family, title, message, changed[0])
+    return changed, taken
+
+
+def expire(booking_series, bookings):
+    """Expire the series' stale pending occurrences with one notification per person."""
+    from . import state_machine
+
+    expired = []
+    for booking in bookings:
+        try:
+            expired.append(state_machine.transition(_quiet(booking), "expired"))
+        except state_machine.TransitionError:
+            continue
+    if expired:
+        _notify(
+            booking_series.family,
+            "Recurring booking expired",
+            f"Your {booking_series.frequency} booking request to {booking_series.caregiver.username} "
+            f"expired because there was no response within 30 minutes.",
+            expired[0],
+        )
+        _notify(
+            booking_series.caregiver,
+            "Recurring booking request expired",
+            f"The {booking_series.frequency} booking request from {booking_series.family.username} "
+            f"expired because it was not accepted or rejected within 30 minutes.",
+            expired[0],
+        )
+    return expired
+
+
+def _notify(user, title, message, booking):
+    # related_id is a booking, like every booking notification; its `series`
+    # field leads to GET /api/bookings/series/<id>/
+    from notifications.signals import _create_and_broadcast
+
+    _create_and_broadcast(user, "booking", title, message, booking.pk)
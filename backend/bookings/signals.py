@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import CaregiverProfile, ServiceType, User, UserProfile
+from reviews.models import Review
+from verifications.models import CaregiverVerification
+from .models import Booking
+from . import directory, ranking, schedule, tracks
+
+# statuses after which no more location fixes are accepted
+TRACKING_FINISHED_STATUSES = ("completion_requested", "awaiting_confirmation", "completed", "expired")
+
+
+@receiver(post_save, sender=Booking)
+def _finalize_location_track(instance, created, **kwargs):
+    """Compact the caregiver's route once the service is over."""
+    if not created and instance.status in TRACKING_FINISHED_STATUSES:
+        tracks.finalize_track(instance.pk)
+
+
+def _refresh_ranking(caregiver_id):
+    transaction.on_commit(lambda: ranking.refresh_caregiver(caregiver_id))
+
+
+@receiver(post_save, sender=Booking)
+def _link_booking_services(instance, created, **kwargs):
+    """A booking's services are fixed at creation; link them to the catalog once."""
+    if created:
+        instance.services.set(ServiceType.for_names(instance.service_types))
+
+
+@receiver(post_save, sender=Booking)
+def _booking_changed(instance, **kwargs):
+    # _previous_status/_previous_date are set by the pre_save in notifications/signals.py
+    # (the state machine sets _previous_status and never moves a booking's date)
+    if ranking.affects_features(getattr(instance, "_previous_status", None), instance.status):
+        _refresh_ranking(instance.caregiver_id)
+    schedule.invalidate(instance, previous_date=getattr(instance, "_previous_date", None))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def _review_changed(instance, **kwargs):
+    _refresh_ranking(instance.caregiver_id)
+    _refresh_card(instance.caregiver_id)
+
+
+@receiver(post_delete, sender=Booking)
+def _booking_deleted(instance, **kwargs):
+    schedule.invalidate(instance)
+
+
+def _refresh_card(caregiver_id):
+    transaction.on_commit(lambda: directory.refresh(caregiver_id))
+
+
+@receiver(post_save, sender=CaregiverProfile)
+@receiver(post_delete, sender=CaregiverProfile)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=CaregiverVerification)
+@receiver(post_delete, sender=CaregiverVerification)
+def _caregiver_card_changed(instance, **kwargs):
+    """Re-render the caregiver's pre-serialized directory card (bookings/directory.py)."""
+    _refresh_card(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def _caregiver_account_changed(instance, created, update_fields=None, **kwargs):
+    if instance.role == "caregiver" and not created and (
+        update_fields is None or {"username", "email"} & set(update_fields)
+    ):
+        _refresh_card(instance.pk)
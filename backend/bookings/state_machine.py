@@ -0,0 +1,115 @@
+"""
+Booking status transitions.
+
+Every status change goes through transition(), which checks the move
+against TRANSITIONS and writes it as a single conditional UPDATE
+(... WHERE id = <pk> AND status = <expected>). If another request changed
+the booking first, no row matches and StaleTransition is raised instead
+of silently overwriting it. No row lock is held across the request.
+
+Accepting also takes a per-caregiver lock for the length of that short
+transaction: a Postgres transaction-level advisory lock, or a row lock on
+the caregiver's user row elsewhere. The overlap check and the UPDATE
+happen under it, so two overlapping requests cannot both be accepted.
+
+A queryset UPDATE does not fire model signals, so post_save is sent by
+hand afterwards with the previous status attached, exactly as a save()
+would have (notifications, reminders, tracks, ranking, calendar cache).
+"""
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Booking
+from . import series
+
+TRANSITIONS = {
+    "pending": {"accepted", "rejected", "expired"},
+    "accepted": {"in_progress", "completion_requested", "awaiting_confirmation", "expired"},
+    "in_progress": {"completion_requested", "awaiting_confirmation", "completed", "expired"},
+    "completion_requested": {"completed"},
+    "awaiting_confirmation": {"completed"},
+}
+# first argument of pg_advisory_xact_lock(int, int), keeps our locks apart from others
+ACCEPT_LOCK_NAMESPACE = 4201
+
+
+class TransitionError(Exception):
+    """A status change that cannot be applied."""
+
+
+class InvalidTransition(TransitionError):
+    pass
+
+
+class StaleTransition(TransitionError):
+    """The booking's status changed since it was read."""
+
+
+class SlotTaken(TransitionError):
+    def __init__(self, message, conflict_id):
+        super().__init__(message)
+        self.conflict_id = conflict_id
+
+
+def can_transition(from_status, to_status):
+    return to_status in TRANSITIONS.get(from_status, ())
+
+
+def _lock_caregiver(caregiver_id):
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [ACCEPT_LOCK_NAMESPACE, caregiver_id])
+    else:
+        list(User.objects.select_for_update().filter(pk=caregiver_id).values_list("pk"))
+
+
+def transition(booking, to_status, force=False, **fields):
+    """
+    Move booking to to_status, also setting fields, if it is still in the
+    status it was read with. force skips the transition table (admin
+    overrides) but not the conditional UPDATE. Updates the instance in place.
+    """
+    expected = booking.status
+    if expected == to_status and not fields:
+        return booking
+    if not force and not can_transition(expected, to_status):
+        raise InvalidTransition(f"Invalid status change from {expected} to {to_status}.")
+
+    with transaction.atomic():
+        if to_status == "accepted":
+            _lock_caregiver(booking.caregiver_id)
+            conflicts = series.find_conflicts(
+                booking.caregiver_id,
+                [booking.date],
+                booking.start_time or datetime.min.time(),
+                booking.duration_hours,
+                exclude_booking_id=booking.pk,
+            )
+            conflict_id = conflicts.get(booking.date)
+            if conflict_id:
+                raise SlotTaken(
+                    f"You already have an accepted booking (#{conflict_id}) that overlaps with this time slot.",
+                    conflict_id,
+                )
+        fields.setdefault("updated_at", timezone.now())
+        updated = Booking.objects.filter(pk=booking.pk, status=expected).update(status=to_status, **fields)
+        if not updated:
+            raise StaleTransition(f"This booking was already updated (it is no longer {expected}).")
+
+    booking.status = to_status
+    for name, value in fields.items():
+        setattr(booking, name, value)
+    booking._previous_status = expected
+    post_save.send(
+        sender=Booking,
+        instance=booking,
+        created=False,
+        update_fields=frozenset(["status", *fields]),
+        raw=False,
+        using=booking._state.db,
+    )
+    return booking
@@ -1,7 +1,12 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
 from accounts.models import User
-from django.utils.timezone import now
-from datetime import timedelta
+from django.utils.timezone import localtime, now
+from datetime import time, timedelta
+from bookings import tracks
+from bookings.models import Booking, LocationTrack
 
 
 class BookingTests(TestCase):
@@ -90,4 +95,665 @@ class BookingTests(TestCase):
             HTTP_AUTHORIZATION=f'Bearer {self.token}',
             content_type='application/json'
         )
-        self.assertEqual(response.status_code, 400)
\ No newline at end of file
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    def test_booking_list_answers_if_none_match(self):
+        from bookings import state_machine
+        booking = Booking.objects.create(
+            family=self.careseeker, caregiver=self.caregiver, date=(now() + timedelta(days=2)).date(),
+            start_time=time(10, 0), duration_hours=2, status='pending',
+        )
+
+        def booking_list(**headers):
+            return self.client.get('/api/bookings/list/', HTTP_AUTHORIZATION=f'Bearer {self.token}', **headers)
+
+        first = booking_list()
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertTrue(etag.startswith('W/'))
+
+        not_modified = booking_list(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        state_machine.transition(booking, 'accepted', responded_at=now())
+        changed = booking_list(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.data[0]['status'], 'accepted')
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    def test_booking_list_sparse_fields(self):
+        for day in range(3):
+            Booking.objects.create(
+                family=self.careseeker, caregiver=self.caregiver, date=(now() + timedelta(days=day + 2)).date(),
+                start_time=time(10, 0), duration_hours=2, status='accepted',
+            )
+
+        def booking_list(params):
+            return self.client.get('/api/bookings/list/', params, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+        with CaptureQueriesContext(connection) as full:
+            booking_list({})
+        # auth, expiry and ETag validators, then the rows in one joined query
+        with self.assertNumQueries(6):
+            response = booking_list({'fields': 'id,caregiver_name,date,status'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [sorted(row) for row in response.data], [['caregiver_name', 'date', 'id', 'status']] * 3
+        )
+        self.assertGreater(len(full.captured_queries), 8)
+
+        response = booking_list({'exclude': 'payment_status,has_review,verification_status,review_rating'})
+        self.assertNotIn('payment_status', response.data[0])
+        self.assertIn('caregiver_profile_image', response.data[0])
+
+        response = booking_list({'fields': 'id,bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Unknown field(s): bogus.')
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "calendar-groups_bookings_by_day"},
+            "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "calendar-groups_bookings_by_day-l1"},
+        },
+        CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    )
+    def test_month_calendar_groups_bookings_by_day(self):
+        day = now().date().replace(day=10)
+        for hour, hours, booking_status in ((9, 3, 'accepted'), (14, 2, 'pending'), (16, 1, 'rejected')):
+            Booking.objects.create(
+                family=self.careseeker, caregiver=self.caregiver, date=day,
+                start_time=time(hour), duration_hours=hours, status=booking_status,
+            )
+        response = self.client.get(
+            '/api/bookings/calendar/', {'month': f'{day:%Y-%m}'},
+            HTTP_AUTHORIZATION=f'Bearer {self.caregiver_token}',
+        )
+        self.assertEqual(response.status_code, 200)
+        [entry] = response.data['days']
+        self.assertEqual((entry['date'], entry['bookings'], entry['hours'], entry['pending']), (day.isoformat(), 2, 5, 1))
+        self.assertEqual([(i['start'], i['end']) for i in entry['intervals']], [('09:00', '12:00'), ('14:00', '16:00')])
+
+        bad = self.client.get(
+            '/api/bookings/calendar/', {'month': '2026-13'},
+            HTTP_AUTHORIZATION=f'Bearer {self.caregiver_token}',
+        )
+        self.assertEqual(bad.status_code, 400)
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "calendar-follows_a_booking_to_another_month"},
+            "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "calendar-follows_a_booking_to_another_month-l1"},
+        },
+        CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    )
+    def test_month_calendar_follows_a_booking_to_another_month(self):
+        day = now().date().replace(day=10)
+        next_day = (day + timedelta(days=31)).replace(day=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                family=self.careseeker, caregiver=self.caregiver, date=day,
+                start_time=time(9), duration_hours=3, status='accepted',
+            )
+
+        def days(month):
+            response = self.client.get(
+                '/api/bookings/calendar/', {'month': f'{month:%Y-%m}'},
+                HTTP_AUTHORIZATION=f'Bearer {self.caregiver_token}',
+            )
+            return [entry['date'] for entry in response.data['days']]
+
+        self.assertEqual((days(day), days(next_day)), ([day.isoformat()], []))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.date = next_day
+            booking.save()
+        self.assertEqual((days(day), days(next_day)), ([], [next_day.isoformat()]))
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    def test_booking_series_created_in_one_request(self):
+        from accounts.models import CaregiverProfile
+        from notifications.models import Notification
+        from verifications.models import CaregiverVerification
+        CaregiverVerification.objects.create(user=self.caregiver, verification_status='approved')
+        CaregiverProfile.objects.create(
+            user=self.caregiver, service_types=['Elderly Companionship'], available_hours='9AM - 6PM', hourly_rate=300,
+        )
+        first_day = (now() + timedelta(days=2)).date()
+        Booking.objects.create(
+            family=self.careseeker, caregiver=self.caregiver, date=first_day + timedelta(days=4),
+            start_time=time(10), duration_hours=2, status='accepted',
+        )
+        series_data = {
+            'caregiver': self.caregiver.id,
+            'service_types': ['Elderly Companionship'],
+            'date': first_day.isoformat(),
+            'start_time': '09:00',
+            'duration_hours': 2,
+            'emergency_contact_phone': '9841234567',
+            'person_name': 'Shanti Devi',
+            'person_age': 80,
+            'frequency': 'daily',
+            'count': 5,
+        }
+
+        def post():
+            return self.client.post(
+                '/api/bookings/series/', series_data,
+                HTTP_AUTHORIZATION=f'Bearer {self.token}', content_type='application/json',
+            )
+
+        # the fifth visit overlaps the accepted booking
+        response = post()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['dates'], [(first_day + timedelta(days=4)).isoformat()])
+
+        series_data['start_time'] = '13:00'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = post()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['occurrence_count'], 5)
+        bookings = Booking.objects.filter(series_id=response.data['series_id'])
+        self.assertEqual(bookings.count(), 5)
+        self.assertEqual(float(bookings.first().total_amount), 600)
+        self.assertEqual(
+            Notification.objects.filter(user=self.caregiver, title='New recurring booking request').count(), 1
+        )
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    def test_booking_series_answered_and_expired_as_a_whole(self):
+        from bookings import series
+        from bookings.models import BookingSeries
+        from bookings.views import expire_pending_bookings
+        from notifications.models import Notification
+        first_day = (now() + timedelta(days=2)).date()
+
+        def make_series():
+            booking_series, _ = series.create_series(
+                self.careseeker, self.caregiver, {'frequency': 'daily'},
+                [first_day + timedelta(days=i) for i in range(3)],
+                {'start_time': time(9), 'duration_hours': 2, 'service_types': []}, total_amount=600,
+            )
+            return booking_series
+
+        accepted = make_series()
+        response = self.client.put(
+            f'/api/bookings/series/{accepted.pk}/respond/', {'status': 'accepted'},
+            HTTP_AUTHORIZATION=f'Bearer {self.caregiver_token}', content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([b['status'] for b in response.data['bookings']], ['accepted'] * 3)
+        self.assertEqual(Notification.objects.filter(user=self.careseeker).count(), 1)
+
+        # a series left unanswered past the window expires as a whole
+        stale = make_series()
+        Booking.objects.filter(series=stale).update(created_at=now() - timedelta(hours=1))
+        Notification.objects.all().delete()
+        expire_pending_bookings()
+        self.assertEqual(set(Booking.objects.filter(series=stale).values_list('status', flat=True)), {'expired'})
+        self.assertEqual(Notification.objects.filter(user=self.careseeker).count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.caregiver).count(), 1)
+
+        detail = self.client.get(
+            f'/api/bookings/series/{stale.pk}/', HTTP_AUTHORIZATION=f'Bearer {self.token}',
+        )
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.data['occurrence_count'], 3)
+        self.assertEqual(BookingSeries.objects.count(), 2)
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    def test_booking_series_keeps_advance_booking_time(self):
+        from accounts.models import CaregiverProfile
+        from verifications.models import CaregiverVerification
+        CaregiverVerification.objects.create(user=self.caregiver, verification_status='approved')
+        CaregiverProfile.objects.create(
+            user=self.caregiver, service_types=['Elderly Companionship'], available_hours='9AM - 6PM', hourly_rate=300,
+        )
+        series_data = {
+            'caregiver': self.caregiver.id,
+            'service_types': ['Elderly Companionship'],
+            'date': (now() + timedelta(days=1)).date().isoformat(),
+            'start_time': '09:00',
+            'duration_hours': 2,
+            'emergency_contact_phone': '9841234567',
+            'person_name': 'Shanti Devi',
+            'person_age': 80,
+            'frequency': 'weekly',
+            'count': 3,
+        }
+        # the first visit is tomorrow, inside a three-day lead time
+        with patch('bookings.views.MINIMUM_ADVANCE_BOOKING_HOURS', 72):
+            response = self.client.post(
+                '/api/bookings/series/', series_data,
+                HTTP_AUTHORIZATION=f'Bearer {self.token}', content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_directory_filters_by_catalog_services(self):
+        from accounts.models import CaregiverProfile, ServiceType
+        from verifications.models import CaregiverVerification
+        CaregiverVerification.objects.create(user=self.caregiver, verification_status='approved')
+        profile = CaregiverProfile.objects.create(
+            user=self.caregiver,
+            service_types=['Elderly Companionship', 'Physiotherapy Support'],
+            available_hours='9AM - 6PM',
+        )
+        self.assertEqual(
+            sorted(profile.services.values_list('name', flat=True)),
+            ['Elderly Companionship', 'Physiotherapy Support'],
+        )
+        self.assertTrue(ServiceType.objects.filter(name='Physiotherapy Support').exists())
+
+        def directory(services):
+            response = self.client.get(
+                '/api/bookings/caregivers/', {'services': services},
+                HTTP_AUTHORIZATION=f'Bearer {self.token}',
+            )
+            self.assertEqual(response.status_code, 200)
+            return [c['user_id'] for c in response.json()]
+
+        self.assertEqual(len(directory('Elderly Companionship,Physiotherapy Support')), 1)
+        self.assertEqual(directory('Elderly Companionship,Medication Reminders'), [])
+
+    def test_directory_rejects_bad_duration(self):
+        for duration in ('nan', 'inf', '1e12', '-2', '0', '25'):
+            response = self.client.get(
+                '/api/bookings/caregivers/',
+                {'date': '2026-03-02', 'start_time': '10:00', 'duration_hours': duration},
+                HTTP_AUTHORIZATION=f'Bearer {self.token}',
+            )
+            self.assertEqual(response.status_code, 400, duration)
+            self.assertEqual(
+                response.data['error'], 'date must be YYYY-MM-DD, start_time HH:MM and duration_hours a number.'
+            )
+
+    def test_directory_rejects_non_finite_radius(self):
+        for radius in ('nan', 'inf', '-inf'):
+            response = self.client.get(
+                '/api/bookings/caregivers/', {'near': '27.7,85.3', 'radius_km': radius},
+                HTTP_AUTHORIZATION=f'Bearer {self.token}',
+            )
+            self.assertEqual(response.status_code, 400, radius)
+            self.assertEqual(response.data['error'], 'near must be lat,lng and radius_km a number.')
+
+    def test_bookable_flag_follows_verification_and_profile(self):
+        from accounts.models import CaregiverProfile
+        from verifications.models import CaregiverVerification
+        profile = CaregiverProfile.objects.create(user=self.caregiver, service_types=['Elderly Companionship'])
+        verification = CaregiverVerification.objects.create(user=self.caregiver, verification_status='pending')
+
+        def bookable():
+            return CaregiverProfile.objects.get(pk=profile.pk).is_bookable
+
+        self.assertFalse(bookable())
+        verification.verification_status = 'approved'
+        verification.save()
+        self.assertFalse(bookable())  # no available hours yet
+        profile.available_hours = '9AM - 6PM'
+        profile.save()
+        self.assertTrue(bookable())
+
+        response = self.client.get('/api/bookings/caregivers/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual([c['user_id'] for c in response.json()], [self.caregiver.id])
+
+        verification.delete()
+        self.assertFalse(bookable())
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+            "local": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "l1"},
+        },
+        CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    )
+    def test_directory_cards_with_viewer_overlay(self):
+        from accounts.models import CaregiverProfile
+        from bookings import directory
+        from verifications.models import CaregiverVerification
+        with self.captureOnCommitCallbacks(execute=True):
+            CaregiverVerification.objects.create(user=self.caregiver, verification_status='approved')
+            profile = CaregiverProfile.objects.create(
+                user=self.caregiver, service_types=['Elderly Companionship'], available_hours='9AM - 6PM',
+            )
+        card = directory.cards_for([self.caregiver.id])[self.caregiver.id]
+        self.assertIn(b'"username":"krishnatamang"', card)
+        self.assertNotIn(b'booking_status', card)
+
+        def directory_entry():
+            response = self.client.get('/api/bookings/caregivers/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            [entry] = response.json()
+            return entry
+
+        self.assertEqual((directory_entry()['booking_status'], directory_entry()['has_active_booking']), (None, False))
+        Booking.objects.create(
+            family=self.careseeker, caregiver=self.caregiver, date=(now() + timedelta(days=2)).date(),
+            start_time=time(10, 0), duration_hours=2, status='pending',
+        )
+        entry = directory_entry()
+        self.assertEqual((entry['booking_status'], entry['has_active_booking']), ('pending', True))
+
+        # profile edits re-render the card after commit
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.bio = 'Ten years with elderly patients'
+            profile.save()
+        self.assertEqual(directory_entry()['bio'], 'Ten years with elderly patients')
+
+        # sparse items skip the viewer query unless a viewer field is asked for
+        with self.assertNumQueries(1):  # auth only; ranking and cards are cached
+            response = self.client.get(
+                '/api/bookings/caregivers/', {'fields': 'user_id,username,match_score'},
+                HTTP_AUTHORIZATION=f'Bearer {self.token}',
+            )
+        self.assertEqual(sorted(response.json()[0]), ['match_score', 'user_id', 'username'])
+
+        # the pre-rendered body still goes through content negotiation
+        browsable = self.client.get(
+            '/api/bookings/caregivers/', {'format': 'api'}, HTTP_AUTHORIZATION=f'Bearer {self.token}',
+        )
+        self.assertEqual(browsable.status_code, 200)
+        self.assertTrue(browsable['Content-Type'].startswith('text/html'))
+        self.assertIn('krishnatamang', browsable.content.decode())
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class LocationTrackTests(TestCase):
+
+    def setUp(self):
+        self.careseeker = User.objects.create_user(
+            email='gita.rai@gmail.com',
+            username='gitarai',
+            password='Gita@2081',
+            role='careseeker'
+        )
+        self.caregiver = User.objects.create_user(
+            email='hari.magar@gmail.com',
+            username='harimagar',
+            password='Hari@2081',
+            role='caregiver'
+        )
+        self.booking = Booking.objects.create(
+            family=self.careseeker,
+            caregiver=self.caregiver,
+            date=now().date(),
+            start_time='09:00',
+            duration_hours=3,
+            status='in_progress',
+        )
+        # a straight walk north with one detour point in the middle
+        self.points = [(27.7000 + i * 0.0001, 85.3000, 1700000000 + i * 5) for i in range(50)]
+        self.points[25] = (self.points[25][0], 85.3010, self.points[25][2])
+
+    def test_track_round_trip(self):
+        decoded = tracks.decode_track(tracks.encode_track(self.points))
+        self.assertEqual(len(decoded), 50)
+        self.assertAlmostEqual(decoded[25][1], 85.3010, places=6)
+        self.assertEqual(decoded[-1][2], 1700000000 + 49 * 5)
+
+    def test_track_simplified_when_service_ends(self):
+        tracks.append_points(self.booking.id, self.points)
+        self.booking.status = 'completion_requested'
+        self.booking.save()
+
+        track = LocationTrack.objects.get(booking=self.booking)
+        self.assertTrue(track.is_simplified)
+        self.assertEqual(track.raw_point_count, 50)
+        # endpoints plus the detour and its neighbours survive
+        self.assertLessEqual(track.point_count, 5)
+        self.assertIn(85.3010, tracks.decode_track(track.data)[:, 1].round(6))
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS=3600,
+)
+class LiveLocationSocketTests(TestCase):
+
+    def setUp(self):
+        import fakeredis
+        patcher = patch('backend.redis_client._client', fakeredis.FakeRedis(decode_responses=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.careseeker = User.objects.create_user(
+            email='gita.rai@gmail.com', username='gitarai', password='Gita@2081', role='careseeker'
+        )
+        self.caregiver = User.objects.create_user(
+            email='hari.magar@gmail.com', username='harimagar', password='Hari@2081', role='caregiver'
+        )
+        started = localtime() - timedelta(minutes=30)
+        self.booking = Booking.objects.create(
+            family=self.careseeker,
+            caregiver=self.caregiver,
+            date=started.date(),
+            start_time=started.time(),
+            duration_hours=3,
+            status='in_progress',
+        )
+
+    def _socket(self, user, booking_id=None):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from rest_framework_simplejwt.tokens import AccessToken
+        from chat.routing import websocket_urlpatterns
+        path = f'/ws/bookings/{booking_id or self.booking.id}/location/?token={AccessToken.for_user(user)}'
+        return WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+
+    async def test_fixes_stream_to_family_and_persist_throttled(self):
+        family, caregiver = self._socket(self.careseeker), self._socket(self.caregiver)
+        self.assertTrue((await family.connect())[0])
+        self.assertFalse((await family.receive_json_from())['is_available'])
+        await caregiver.connect()
+        await caregiver.receive_json_from()
+
+        await caregiver.send_json_to({'latitude': 27.7172, 'longitude': 85.3240})
+        fix = await family.receive_json_from()
+        self.assertEqual((fix['type'], fix['latitude'], fix['longitude']), ('location', 27.7172, 85.3240))
+        await self.booking.arefresh_from_db()
+        self.assertEqual(float(self.booking.caregiver_latitude), 27.7172)
+
+        # a few metres later: broadcast, but not written to the row yet
+        await caregiver.send_json_to({'latitude': 27.7173, 'longitude': 85.3240})
+        self.assertEqual((await family.receive_json_from())['latitude'], 27.7173)
+        await self.booking.arefresh_from_db()
+        self.assertEqual(float(self.booking.caregiver_latitude), 27.7172)
+
+        await caregiver.send_json_to({'latitude': 'north'})
+        self.assertEqual((await caregiver.receive_json_from())['type'], 'error')
+        # the family cannot move the caregiver
+        await family.send_json_to({'latitude': 0, 'longitude': 0})
+        self.assertTrue(await family.receive_nothing())
+
+        # closing the caregiver's socket writes the newest fix
+        await caregiver.disconnect()
+        await self.booking.arefresh_from_db()
+        self.assertEqual(float(self.booking.caregiver_latitude), 27.7173)
+
+        late = self._socket(self.careseeker)
+        await late.connect()
+        self.assertEqual((await late.receive_json_from())['latitude'], 27.7173)
+        await late.disconnect()
+        await family.disconnect()
+
+    async def test_only_participants_of_in_progress_bookings_connect(self):
+        from asgiref.sync import sync_to_async
+        outsider = await sync_to_async(User.objects.create_user)(
+            email='sita.karki@gmail.com', username='sitakarki', password='Sita@2081', role='careseeker'
+        )
+        self.assertEqual(await self._socket(outsider).connect(), (False, 4003))
+
+        await Booking.objects.filter(pk=self.booking.pk).aupdate(status='accepted')
+        self.assertEqual(await self._socket(self.careseeker).connect(), (False, 4003))
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class CaregiverRankingTests(TestCase):
+
+    def test_features_refresh_and_rank_best_first(self):
+        from accounts.models import CaregiverProfile
+        from bookings import ranking
+        from bookings.models import CaregiverRankFeatures
+        from reviews.models import Review
+
+        family = User.objects.create_user(
+            email='mina.gurung@gmail.com', username='minagurung', password='Mina@2081', role='careseeker'
+        )
+        steady = User.objects.create_user(
+            email='kamal.bhatta@gmail.com', username='kamalbhatta', password='Kamal@2081', role='caregiver'
+        )
+        flaky = User.objects.create_user(
+            email='suman.lama@gmail.com', username='sumanlama', password='Suman@2081', role='caregiver'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for caregiver, status in ((steady, 'completed'), (steady, 'completed'), (flaky, 'rejected')):
+                booking = Booking.objects.create(
+                    family=family, caregiver=caregiver, date=now().date(), start_time='09:00',
+                    duration_hours=2, status=status, responded_at=now() + timedelta(minutes=5),
+                )
+                if status == 'completed':
+                    Review.objects.create(booking=booking, caregiver=caregiver, careseeker=family, rating=5)
+
+        features = CaregiverRankFeatures.objects.get(caregiver=steady)
+        self.assertEqual((features.rating_count, features.completed_count), (2, 2))
+        self.assertEqual(CaregiverRankFeatures.objects.get(caregiver=flaky).accepted_count, 0)
+
+        profiles = [
+            CaregiverProfile.objects.create(user=flaky, service_types=['elderly_care']),
+            CaregiverProfile.objects.create(user=steady, service_types=['child_care']),
+        ]
+        ranked, scores, _ = ranking.rank(profiles)
+        self.assertEqual([p.user_id for p in ranked], [steady.id, flaky.id])
+        self.assertGreater(scores[0], scores[1])
+        # proximity and requested services add to the precomputed base score
+        _, boosted, order = ranking.rank(profiles, distances=[0.5, 9.5], radius_km=10, service_types=['elderly_care'])
+        self.assertEqual(order.tolist(), [1, 0])
+        bonus = ranking.WEIGHTS['distance'] * 0.95 + ranking.WEIGHTS['services']
+        self.assertAlmostEqual(boosted[1] - scores[1], bonus)
+
+
+    def test_snapshot_rereads_only_changed_caregivers(self):
+        import fakeredis
+        from accounts.models import CaregiverProfile
+        from bookings import ranking
+
+        redis_patch = patch('backend.redis_client._client', fakeredis.FakeRedis(decode_responses=True))
+        redis_patch.start()
+        self.addCleanup(redis_patch.stop)
+        snapshot = ranking.FeatureSnapshot()
+        snapshot_patch = patch.object(ranking, '_snapshot', snapshot)
+        snapshot_patch.start()
+        self.addCleanup(snapshot_patch.stop)
+
+        family = User.objects.create_user(
+            email='mina.gurung@gmail.com', username='minagurung', password='Mina@2081', role='careseeker'
+        )
+        caregivers = [
+            User.objects.create_user(
+                email=f'caregiver{i}@gmail.com', username=f'caregiver{i}', password='Care@2081', role='caregiver'
+            )
+            for i in range(3)
+        ]
+        profiles = [CaregiverProfile.objects.create(user=c) for c in caregivers]
+        with self.captureOnCommitCallbacks(execute=True):
+            for caregiver in caregivers:
+                Booking.objects.create(
+                    family=family, caregiver=caregiver, date=now().date(), start_time='09:00',
+                    duration_hours=2, status='completed', responded_at=now(),
+                )
+        ranking.rank(profiles)
+        self.assertEqual(len(snapshot.ids), 3)
+        version = snapshot.version
+
+        # a new request and in_progress (still an accepted booking) change no features; accepting does
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                family=family, caregiver=caregivers[0], date=now().date(), start_time=time(13, 0), duration_hours=2,
+            )
+            booking.status = 'accepted'
+            booking.save()
+            booking.status = 'in_progress'
+            booking.save()
+        self.assertEqual(ranking.get_redis().get(ranking.VERSION_KEY), str(version + 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                family=family, caregiver=caregivers[1], date=now().date(), start_time='15:00',
+                duration_hours=2, status='rejected', responded_at=now(),
+            )
+        with CaptureQueriesContext(connection) as queries:
+            _, scores, order = ranking.rank(profiles)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('IN', queries[0]['sql'])
+        self.assertEqual(snapshot.version, version + 2)
+        # caregiver 0 gained an accepted booking, caregiver 1 a rejection
+        self.assertEqual(order.tolist(), [0, 2, 1])
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class BookingStateMachineTests(TestCase):
+
+    def setUp(self):
+        self.family = User.objects.create_user(
+            email='rita.karki@gmail.com', username='ritakarki', password='Rita@2081', role='careseeker'
+        )
+        self.caregiver = User.objects.create_user(
+            email='bishal.rana@gmail.com', username='bishalrana', password='Bishal@2081', role='caregiver'
+        )
+        day = (now() + timedelta(days=3)).date()
+        self.first, self.second = [
+            Booking.objects.create(
+                family=self.family, caregiver=self.caregiver, date=day,
+                start_time=time(hour), duration_hours=3, status='pending',
+            )
+            for hour in (9, 11)
+        ]
+
+    def test_accept_is_conditional_and_fires_signals(self):
+        from bookings import state_machine
+        from notifications.models import Notification
+        stale_copy = Booking.objects.get(pk=self.first.pk)
+
+        state_machine.transition(self.first, 'accepted', responded_at=now())
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.status, 'accepted')
+        self.assertIsNotNone(self.first.responded_at)
+        self.assertTrue(Notification.objects.filter(user=self.family, title='Booking accepted').exists())
+
+        # a second request that read the booking while it was pending loses
+        with self.assertRaises(state_machine.StaleTransition):
+            state_machine.transition(stale_copy, 'rejected')
+        with self.assertRaises(state_machine.InvalidTransition):
+            state_machine.transition(self.first, 'pending')
+
+    def test_overlapping_accept_is_refused(self):
+        from bookings import state_machine
+        state_machine.transition(self.first, 'accepted')
+        with self.assertRaises(state_machine.SlotTaken) as ctx:
+            state_machine.transition(self.second, 'accepted')
+        self.assertEqual(ctx.exception.conflict_id, self.first.pk)
+        self.assertEqual(Booking.objects.get(pk=self.second.pk).status, 'pending')
+
+    def test_forced_accept_sees_conflicts_past_itself(self):
+        from bookings import state_machine
+        state_machine.transition(self.first, 'accepted')
+        # the booking being moved is itself in a blocking status
+        Booking.objects.filter(pk=self.second.pk).update(status='completion_requested')
+        self.second.refresh_from_db()
+        with self.assertRaises(state_machine.SlotTaken) as ctx:
+            state_machine.transition(self.second, 'accepted', force=True)
+        self.assertEqual(ctx.exception.conflict_id, self.first.pk)
+
+    def test_expiry_sweep_skips_bookings_answered_meanwhile(self):
+        from bookings import state_machine, views
+        Booking.objects.filter(pk__in=[self.first.pk, self.second.pk]).update(created_at=now() - timedelta(hours=1))
+        stale_copy = Booking.objects.get(pk=self.first.pk)
+        state_machine.transition(self.first, 'accepted')
+
+        class StaleRead(list):
+            # what the sweep's query returned before the accept landed
+            def filter(self, **kwargs):
+                return self
+
+        views.expire_pending_bookings(StaleRead([stale_copy, self.second]))
+        self.assertEqual(Booking.objects.get(pk=self.first.pk).status, 'accepted')
+        self.assertEqual(Booking.objects.get(pk=self.second.pk).status, 'expired')
@@ -0,0 +1,152 @@
+"""
+Route history for bookings, stored as one packed blob per booking.
+
+Wire/storage format (served as-is by the replay endpoint):
+    header  "<4sIq"  magic b"CNT1", point count, start time (unix seconds)
+    body    zlib-compressed little-endian int32 triples (lat*1e6, lng*1e6, seconds)
+            first triple absolute (time 0), every later one a delta from the previous
+
+Fixes are buffered in Redis (location:track:<booking_id>) and appended to the
+blob whenever bookings/location.py writes the booking row. When the booking
+leaves in_progress the track is simplified with Douglas-Peucker at
+LOCATION_TRACK_TOLERANCE_METERS.
+"""
+import logging
+import struct
+import zlib
+
+import numpy as np
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from backend.redis_client import get_redis
+from .models import LocationTrack
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CNT1"
+HEADER = struct.Struct("<4sIq")
+SCALE = 1e6
+METERS_PER_DEGREE = 111320.0
+BUFFER_TTL_SECONDS = 24 * 3600
+
+
+def _buffer_key(booking_id):
+    return f"location:track:{booking_id}"
+
+
+def encode_track(points):
+    """Pack an (n, 3) array of lat, lng, unix time into the track format."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if not len(points):
+        return b""
+    start = int(points[0, 2])
+    ints = np.empty(points.shape, dtype=np.int64)
+    ints[:, 0] = np.round(points[:, 0] * SCALE)
+    ints[:, 1] = np.round(points[:, 1] * SCALE)
+    ints[:, 2] = np.round(points[:, 2] - start)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 3), dtype=np.int64))
+    body = zlib.compress(deltas.astype("<i4").tobytes())
+    return HEADER.pack(MAGIC, len(points), start) + body
+
+
+def decode_track(blob):
+    """Unpack a track blob into an (n, 3) array of lat, lng, unix time."""
+    if not blob:
+        return np.empty((0, 3))
+    magic, count, start = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("not a location track")
+    deltas = np.frombuffer(zlib.decompress(bytes(blob[HEADER.size:])), dtype="<i4").reshape(count, 3)
+    ints = np.cumsum(deltas.astype(np.int64), axis=0)
+    points = np.empty((count, 3))
+    points[:, 0] = ints[:, 0] / SCALE
+    points[:, 1] = ints[:, 1] / SCALE
+    points[:, 2] = ints[:, 2] + start
+    return points
+
+
+def simplify(points, tolerance_m):
+    """Douglas-Peucker on a local equirectangular projection; keeps endpoints."""
+    n = len(points)
+    if n < 3:
+        return points
+    lat0 = np.radians(points[0, 0])
+    xy = np.column_stack((
+        points[:, 1] * METERS_PER_DEGREE * np.cos(lat0),
+        points[:, 0] * METERS_PER_DEGREE,
+    ))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        segment = xy[first + 1:last]
+        ab = b - a
+        length = np.hypot(*ab)
+        if length == 0:
+            dist = np.hypot(*(segment - a).T)
+        else:
+            dist = np.abs(ab[0] * (segment[:, 1] - a[1]) - ab[1] * (segment[:, 0] - a[0])) / length
+        idx = int(np.argmax(dist))
+        if dist[idx] > tolerance_m:
+            split = first + 1 + idx
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def buffer_point(pipe, booking_id, lat, lng, ts):
+    """Queue a fix on an open Redis pipeline (executed by the caller)."""
+    pipe.rpush(_buffer_key(booking_id), f"{lat},{lng},{ts}")
+    pipe.expire(_buffer_key(booking_id), BUFFER_TTL_SECONDS)
+
+
+def _drain_buffer(booking_id):
+    try:
+        pipe = get_redis().pipeline()
+        pipe.lrange(_buffer_key(booking_id), 0, -1)
+        pipe.delete(_buffer_key(booking_id))
+        raw, _ = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Track buffer unavailable for booking %s: %s", booking_id, e)
+        return []
+    return [tuple(float(v) for v in item.split(",")) for item in raw]
+
+
+def append_points(booking_id, points=None):
+    """Append fixes (or whatever is buffered in Redis) to the booking's track."""
+    if points is None:
+        points = _drain_buffer(booking_id)
+    if not points:
+        return None
+    with transaction.atomic():
+        track, _ = LocationTrack.objects.select_for_update().get_or_create(booking_id=booking_id)
+        combined = np.concatenate((decode_track(track.data), np.asarray(points).reshape(-1, 3)))
+        track.data = encode_track(combined)
+        track.point_count = len(combined)
+        track.raw_point_count += len(points)
+        track.save(update_fields=["data", "point_count", "raw_point_count", "updated_at"])
+    return track
+
+
+def finalize_track(booking_id):
+    """Flush buffered fixes and simplify the route once tracking is over."""
+    append_points(booking_id)
+    with transaction.atomic():
+        track = LocationTrack.objects.select_for_update().filter(
+            booking_id=booking_id, is_simplified=False
+        ).first()
+        if track is None:
+            return None
+        simplified = simplify(decode_track(track.data), settings.LOCATION_TRACK_TOLERANCE_METERS)
+        track.data = encode_track(simplified)
+        track.point_count = len(simplified)
+        track.is_simplified = True
+        track.save(update_fields=["data", "point_count", "is_simplified", "updated_at"])
+    return track
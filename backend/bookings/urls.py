@@ -1,7 +1,11 @@
 from django.urls import path
 from .views import (
     VerifiedCaregiverListView,
+    CaregiverLocationAutocompleteView,
     BookingCreateView,
+    BookingSeriesCreateView,
+    BookingSeriesDetailView,
+    BookingSeriesRespondView,
     BookingListView,
     BookingRespondView,
     BookingMarkServiceCompleteView,
@@ -11,18 +15,26 @@ from .views import (
     BookingProofUploadView,
     BookingUpdateLocationView,
     BookingCaregiverLocationView,
+    BookingTrackView,
+    BookingCalendarView,
     CheckAvailabilityView,
 )
 
 urlpatterns = [
     path("caregivers/", VerifiedCaregiverListView.as_view(), name="caregivers-list"),
+    path("caregivers/locations/", CaregiverLocationAutocompleteView.as_view(), name="caregivers-location-autocomplete"),
     path("", BookingCreateView.as_view(), name="booking-create"),
+    path("series/", BookingSeriesCreateView.as_view(), name="booking-series-create"),
+    path("series/<int:pk>/", BookingSeriesDetailView.as_view(), name="booking-series-detail"),
+    path("series/<int:pk>/respond/", BookingSeriesRespondView.as_view(), name="booking-series-respond"),
+    path("calendar/", BookingCalendarView.as_view(), name="booking-calendar"),
     path("check-availability/", CheckAvailabilityView.as_view(), name="check-availability"),
     path("list/", BookingListView.as_view(), name="booking-list"),
     path("assigned/", AssignedBookingsView.as_view(), name="assigned-bookings"),
     path("<int:pk>/update-status/", BookingUpdateStatusView.as_view(), name="booking-update-status"),
     path("<int:pk>/update-location/", BookingUpdateLocationView.as_view(), name="booking-update-location"),
     path("<int:pk>/caregiver-location/", BookingCaregiverLocationView.as_view(), name="booking-caregiver-location"),
+    path("<int:pk>/track/", BookingTrackView.as_view(), name="booking-track"),
     path("<int:pk>/upload-proof/", BookingProofUploadView.as_view(), name="booking-upload-proof"),
     path("<int:pk>/respond/", BookingRespondView.as_view(), name="booking-respond"),
     path("<int:pk>/mark-service-complete/", BookingMarkServiceCompleteView.as_view(), name="booking-mark-service-complete"),
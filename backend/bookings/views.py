@@ -1,3 +1,6 @@
+from django.db import DatabaseError
+from django.db.models import Count, Max, Q
+from django.http import HttpResponse
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
@@ -7,12 +10,17 @@ from .permissions import IsCareSeeker
 from django.utils import timezone
 from django.conf import settings
 from datetime import datetime, timedelta
+import hashlib
+import math
+from urllib.parse import urlencode
+from accounts import availability, geo
+from accounts.autocomplete import location_index
 from accounts.models import User, CaregiverProfile, UserActivity
-from verifications.models import CaregiverVerification
-from .models import Booking
+from .models import Booking, BookingSeries, LocationTrack
+from . import directory, location, ranking, schedule, series, state_machine, tracks
 from .serializers import (
-    CaregiverListSerializer,
     BookingCreateSerializer,
+    BookingSeriesCreateSerializer,
     BookingSerializer,
     BookingStatusUpdateSerializer,
     BookingProofUploadSerializer,
@@ -21,7 +29,11 @@ from .permissions import IsCareSeeker
 from verifications.permissions import IsCaregiver
 import pytz
 from notifications.models import Notification
+from backend import cache
+from backend.conditional import ConditionalGetMixin
 from backend.error_messages import ErrorMessages
+from backend.renderers import PreRendered
+from backend.sparse import SparseFieldsetMixin, parse_fields, sparse_queryset
 
 
 def _is_mobile_request(request):
@@ -37,50 +49,59 @@ IN_PROGRESS_AUTO_EXPIRE_HOURS = 3
 AUTO_REJECTION_REASON = "Caregiver unavailable at this time. Please choose another caregiver."
 MANUAL_REJECTION_REASON = "Caregiver declined your booking. Please choose another caregiver."
 MINIMUM_ADVANCE_BOOKING_HOURS = 1
+DEFAULT_SEARCH_RADIUS_KM = 10
+MAX_SEARCH_RADIUS_KM = 100
 
 
 def expire_pending_bookings(queryset=None):
-    try:
-        expiry_time = timezone.now() - timedelta(minutes=PENDING_RESPONSE_WINDOW_MINUTES)
-        expired_bookings = (
-            queryset.filter(status="pending", created_at__lt=expiry_time)
-            if queryset is not None
-            else Booking.objects.filter(status="pending", created_at__lt=expiry_time)
-        )
+    expiry_time = timezone.now() - timedelta(minutes=PENDING_RESPONSE_WINDOW_MINUTES)
+    expired_bookings = (
+        queryset.filter(status="pending", created_at__lt=expiry_time)
+        if queryset is not None
+        else Booking.objects.filter(status="pending", created_at__lt=expiry_time)
+    )
 
-        print(f"[EXPIRY] Found {expired_bookings.count()} expired bookings")
+    by_series = {}
+    for booking in expired_bookings:
+        if booking.series_id:
+            # a series expires as a whole, with one notification per person
+            by_series.setdefault(booking.series_id, []).append(booking)
+            continue
+        print(f"[EXPIRY] Expiring booking {booking.id} created at {booking.created_at}")
+        try:
+            state_machine.transition(booking, "expired")
+        except state_machine.TransitionError:
+            continue  # answered since it was read, leave it alone
+        except DatabaseError as e:
+            print(f"[EXPIRY] Error expiring booking {booking.id}: {e}")
+            continue
 
-        for booking in expired_bookings:
-            try:
-                print(f"[EXPIRY] Expiring booking {booking.id} created at {booking.created_at}")
-                booking.status = "expired"
-                booking.save(update_fields=["status", "updated_at"])
+        family_message = (
+            f"Your booking request to {booking.caregiver.username} expired because there was no response within 30 minutes."
+        )
+        caregiver_message = (
+            f"Your booking request from {booking.family.username} expired because it was not accepted or rejected within 30 minutes."
+        )
+        Notification.objects.create(
+            user=booking.family,
+            type="booking",
+            title="Booking Expired",
+            message=family_message,
+            related_id=booking.id,
+        )
+        Notification.objects.create(
+            user=booking.caregiver,
+            type="booking",
+            title="Booking Request Expired",
+            message=caregiver_message,
+            related_id=booking.id,
+        )
 
-                family_message = (
-                    f"Your booking request to {booking.caregiver.username} expired because there was no response within 30 minutes."
-                )
-                caregiver_message = (
-                    f"Your booking request from {booking.family.username} expired because it was not accepted or rejected within 30 minutes."
-                )
-                Notification.objects.create(
-                    user=booking.family,
-                    type="booking",
-                    title="Booking Expired",
-                    message=family_message,
-                    related_id=booking.id,
-                )
-                Notification.objects.create(
-                    user=booking.caregiver,
-                    type="booking",
-                    title="Booking Request Expired",
-                    message=caregiver_message,
-                    related_id=booking.id,
-                )
-            except Exception as e:
-                print(f"[EXPIRY] Error expiring booking {booking.id}: {e}")
-                continue
-    except Exception:
-        pass
+    for booking_series in BookingSeries.objects.filter(pk__in=list(by_series)).select_related("family", "caregiver"):
+        try:
+            series.expire(booking_series, by_series[booking_series.pk])
+        except DatabaseError as e:
+            print(f"[EXPIRY] Error expiring series {booking_series.id}: {e}")
 
 
 def expire_stale_in_progress_bookings(queryset):
@@ -89,47 +110,34 @@ def expire_stale_in_progress_bookings(queryset):
     expiry_cutoff = now - timedelta(hours=IN_PROGRESS_AUTO_EXPIRE_HOURS)
     for booking in queryset.filter(status="in_progress"):
         if booking.end_datetime <= expiry_cutoff:
-            booking.status = "expired"
-            booking.save()
+            try:
+                state_machine.transition(booking, "expired")
+            except state_machine.TransitionError:
+                continue
 
 
-def get_verified_caregiver_ids():
-    # only caregivers who passed admin verification can accept bookings
-    return set(
-        CaregiverVerification.objects.filter(verification_status="approved").values_list(
-            "user_id", flat=True
-        )
-    )
+def _transition_error_response(error):
+    # a concurrent update won the race: tell the client to reload
+    code = status.HTTP_409_CONFLICT if isinstance(error, state_machine.StaleTransition) else status.HTTP_400_BAD_REQUEST
+    return Response({"error": str(error)}, status=code)
 
 
-def get_active_bookings_for_caregiver(caregiver_id):
-    # returns bookings that are actually happening right now or in the future
-    # we filter by end_datetime in Python instead of the DB because it's a calculated property
-    now = timezone.localtime()
-    
-    bookings = Booking.objects.filter(
-        caregiver_id=caregiver_id,
-        status__in=["accepted", "completion_requested"]
+def is_bookable_caregiver(caregiver_id):
+    # only verified caregivers with a complete profile can take bookings
+    # (flag kept in sync by accounts/signals.py, partial index on it)
+    return CaregiverProfile.objects.filter(user_id=caregiver_id, is_bookable=True).exists()
+
+
+def booking_list_validators(bookings):
+    # conditional GET state for a booking list: status/detail changes, payments, reviews
+    state = bookings.aggregate(
+        count=Count("id"),
+        last_modified=Max("updated_at"),
+        payment_modified=Max("payment__updated_at"),
+        reviews=Count("review"),
     )
-    
-    active_bookings = [b for b in bookings if b.end_datetime > now]
-    
-    return active_bookings
-
-
-def caregiver_has_overlap(caregiver_id, date, start_time, duration_hours, exclude_booking_id=None):
-    # checks if a caregiver is already booked during the requested time
-    # TODO: optimize this with better interval logic
-    active_bookings = get_active_bookings_for_caregiver(caregiver_id)
-    
-    for booking in active_bookings:
-        if exclude_booking_id and booking.id == exclude_booking_id:
-            continue
-            
-        if booking.overlaps_with(date, start_time, duration_hours):
-            return True
-    
-    return False
+    last_modified = max(filter(None, (state["last_modified"], state["payment_modified"])), default=None)
+    return tuple(state.values()), last_modified
 
 
 def check_caregiver_overlap(caregiver, booking):
@@ -185,6 +193,15 @@ def check_caregiver_overlap(caregiver, booking):
         return False, None
 
 
+def starts_too_soon(date, start_time):
+    # bookings must start MINIMUM_ADVANCE_BOOKING_HOURS after the current hour slot (Nepal time)
+    nepal_tz = pytz.timezone("Asia/Kathmandu")
+    now_np = timezone.now().astimezone(nepal_tz)
+    booking_dt_np = nepal_tz.localize(datetime.combine(date, start_time))
+    current_slot_np = now_np.replace(minute=0, second=0, microsecond=0)
+    return booking_dt_np < current_slot_np + timedelta(hours=MINIMUM_ADVANCE_BOOKING_HOURS)
+
+
 def check_caregiver_available(caregiver, booking):
     try:
         is_overlap, _ = check_caregiver_overlap(caregiver, booking)
@@ -195,32 +212,176 @@ def check_caregiver_available(caregiver, booking):
 
 
 class VerifiedCaregiverListView(APIView):
-    # returns caregivers that can accept bookings - verified with complete profiles
+    # returns caregivers that can accept bookings - verified with complete profiles.
+    # The body is assembled from cached, already-encoded cards (bookings/directory.py)
+    # and passed through the renderers as PreRendered bytes.
     permission_classes = [IsAuthenticated, IsCareSeeker]
 
     def get(self, request):
-        verified_ids = get_verified_caregiver_ids()
-        
-        # Filter only caregivers who are ready for booking:
-        # - verified, has service_types, and available_hours
+        try:
+            query = self._normalize(request.query_params)
+            fields = parse_fields(request.query_params, directory.FIELDS)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # the filtered, ranked list is the same for everyone asking the same
+        # question: computed once (single-flight) and cached briefly
+        query_key = hashlib.md5(urlencode(sorted(query.items())).encode(), usedforsecurity=False).hexdigest()
+        ranked = cache.get_or_compute(
+            "directory", [query_key], lambda: self._ranked(query), ttl=settings.DIRECTORY_CACHE_TTL_SECONDS
+        )
+
+        # cached viewer-independent cards + this viewer's booking fields
+        # (?fields=/?exclude= trims both)
+        return Response(PreRendered(directory.render_page(ranked, request.user, fields)))
+
+    def _normalize(self, params):
+        """Query params -> canonical dict (same search, same key); ValueError on bad input."""
+        query = {}
+        required = sorted({s.strip() for s in params.get("services", "").split(",") if s.strip()})
+        if required:
+            query["services"] = ",".join(required)
+        location = params.get("location", "").strip().lower()
+        if location:
+            query["location"] = location
+        gender = params.get("gender", "").strip().lower()
+        if gender and gender != "all":
+            query["gender"] = gender
+
+        date_param = params.get("date", "").strip()
+        if date_param:
+            try:
+                query["date"] = datetime.strptime(date_param, "%Y-%m-%d").date().isoformat()
+                query["start_time"] = datetime.strptime((params.get("start_time") or "")[:5], "%H:%M").strftime("%H:%M")
+                query["duration_hours"] = float(params.get("duration_hours") or 1)
+                if not (math.isfinite(query["duration_hours"]) and 0 < query["duration_hours"] <= 24):
+                    raise ValueError
+            except ValueError:
+                raise ValueError("date must be YYYY-MM-DD, start_time HH:MM and duration_hours a number.")
+
+        near = params.get("near", "").strip()
+        if near:
+            try:
+                lat, lng = geo.parse_near(near)
+                radius_km = float(params.get("radius_km") or DEFAULT_SEARCH_RADIUS_KM)
+                if not math.isfinite(radius_km):
+                    raise ValueError
+            except ValueError:
+                raise ValueError("near must be lat,lng and radius_km a number.")
+            # ~10 m grid, so nearby viewers share results
+            query["near"] = f"{lat:.4f},{lng:.4f}"
+            query["radius_km"] = min(max(radius_km, 0.1), MAX_SEARCH_RADIUS_KM)
+
+        service_types = sorted({s.strip() for s in params.get("service_types", "").split(",") if s.strip()})
+        if service_types:
+            query["service_types"] = ",".join(service_types)
+        limit = params.get("limit")
+        if limit and limit.isdigit():
+            query["limit"] = int(limit)
+        return query
+
+    def _ranked(self, query):
+        """[(user_id, match score, distance km or None)] best match first."""
+        # Only caregivers who are ready for booking: verified, has
+        # service_types and available_hours (denormalized is_bookable flag)
         profiles = (
-            CaregiverProfile.objects.filter(user_id__in=verified_ids)
-            .exclude(service_types=[])  # must have at least one service
-            .exclude(available_hours="")  # must have available hours
+            CaregiverProfile.objects.filter(is_bookable=True)
             .select_related("user", "user__profile")
         )
-        
+
+        # ?services=A,B -> caregivers offering all of them (indexed catalog links)
+        if "services" in query:
+            required = query["services"].split(",")
+            profiles = profiles.filter(
+                pk__in=CaregiverProfile.services.through.objects.filter(servicetype__name__in=required)
+                .values("caregiverprofile_id")
+                .annotate(matched=Count("servicetype_id"))
+                .filter(matched=len(required))
+                .values("caregiverprofile_id")
+            )
+
         # Optional filters from query params
-        location = request.query_params.get("location", "").strip()
-        if location:
-            profiles = profiles.filter(user__profile__address__icontains=location)
-        
-        gender = request.query_params.get("gender", "").strip()
-        if gender and gender.lower() != "all":
-            profiles = profiles.filter(gender=gender.lower())
-        
-        serializer = CaregiverListSerializer(profiles, many=True, context={"request": request})
-        return Response(serializer.data)
+        if "location" in query:
+            profiles = profiles.filter(user__profile__address__icontains=query["location"])
+        if "gender" in query:
+            profiles = profiles.filter(gender=query["gender"])
+
+        # ?near=lat,lng&radius_km=10 -> only caregivers within the radius, closest first
+        distances = None
+        if "near" in query:
+            lat, lng = geo.parse_near(query["near"])
+            profiles, distances = self._within_radius(profiles, lat, lng, query["radius_km"])
+
+        # ?date=YYYY-MM-DD&start_time=HH:MM&duration_hours=N -> only caregivers whose
+        # weekly schedule (and date overrides) covers every requested hour; checked
+        # on the loaded rows, after the indexed filters
+        if "date" in query:
+            profiles = list(profiles)
+            available = availability.filter_available(
+                profiles,
+                datetime.strptime(query["date"], "%Y-%m-%d").date(),
+                datetime.strptime(query["start_time"], "%H:%M").time(),
+                query["duration_hours"],
+            )
+            if distances is not None:
+                keep = {p.user_id for p in available}
+                distances = [d for p, d in zip(profiles, distances) if p.user_id in keep]
+            profiles = available
+
+        # best matches first: precomputed caregiver features plus distance and
+        # overlap with ?service_types=a,b, scored in one pass (bookings/ranking.py)
+        profiles, scores, order = ranking.rank(
+            profiles,
+            distances=distances,
+            radius_km=query.get("radius_km"),
+            service_types=query.get("service_types", "").split(","),
+        )
+        if distances is not None:
+            distances = [distances[i] for i in order]
+        else:
+            distances = [None] * len(profiles)
+
+        ranked = [
+            (profile.user_id, float(score), distance)
+            for profile, score, distance in zip(profiles, scores, distances)
+        ]
+        if "limit" in query:
+            ranked = ranked[:query["limit"]]
+        return ranked
+
+    def _within_radius(self, profiles, lat, lng, radius_km):
+        """Prune by covering geohash cells (indexed), then rank by haversine distance."""
+        cell_filter = Q()
+        for cell in geo.covering_cells(lat, lng, radius_km):
+            cell_filter |= Q(user__profile__geohash__startswith=cell)
+        candidates = list(profiles.filter(cell_filter))
+        if not candidates:
+            return [], []
+
+        distances = geo.haversine_km(
+            lat,
+            lng,
+            [p.user.profile.latitude for p in candidates],
+            [p.user.profile.longitude for p in candidates],
+        )
+        order = [i for i in distances.argsort(kind="stable") if distances[i] <= radius_km]
+        return [candidates[i] for i in order], [float(distances[i]) for i in order]
+
+
+class CaregiverLocationAutocompleteView(APIView):
+    """
+    Location suggestions for the caregiver search box, served from memory.
+
+    GET /api/bookings/caregivers/locations/?q=bane&limit=8
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get("limit", 8)), 1), 20)
+        except ValueError:
+            limit = 8
+        return Response(location_index.search(request.query_params.get("q", ""), limit=limit))
 
 
 class BookingCreateView(APIView):
@@ -251,8 +412,7 @@ class BookingCreateView(APIView):
             )
         
         # Only allow booking with verified caregivers
-        verified_ids = get_verified_caregiver_ids()
-        if caregiver_id not in verified_ids:
+        if not is_bookable_caregiver(caregiver_id):
             return Response(
                 {"error": "Caregiver is not verified or does not exist"},
                 status=status.HTTP_400_BAD_REQUEST,
@@ -276,20 +436,25 @@ class BookingCreateView(APIView):
 
             # Enforce minimum one-hour advance booking time in Nepal timezone.
             try:
-                nepal_tz = pytz.timezone("Asia/Kathmandu")
-                now_np = timezone.now().astimezone(nepal_tz)
-                booking_dt_np = nepal_tz.localize(datetime.combine(date, start_time))
-                current_slot_np = now_np.replace(minute=0, second=0, microsecond=0)
-                min_slot_np = current_slot_np + timedelta(hours=MINIMUM_ADVANCE_BOOKING_HOURS)
-                if booking_dt_np < min_slot_np:
-                    return Response(
-                        {
-                            "error": ErrorMessages.CAREGIVER_NOT_AVAILABLE
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
+                too_soon = starts_too_soon(date, start_time)
             except Exception:
-                pass
+                too_soon = False
+            if too_soon:
+                return Response(
+                    {
+                        "error": ErrorMessages.CAREGIVER_NOT_AVAILABLE
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            caregiver_profile = CaregiverProfile.objects.filter(user=caregiver).first()
+            if caregiver_profile and not availability.is_available(
+                caregiver_profile, date, start_time, duration_hours
+            ):
+                return Response(
+                    {"error": ErrorMessages.CAREGIVER_OUTSIDE_SCHEDULE},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
             booking_stub = Booking(
                 family=request.user,
@@ -343,6 +508,145 @@ class BookingCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BookingSeriesCreateView(APIView):
+    """
+    Family books recurring visits in one request.
+
+    POST /api/bookings/series/ takes the booking fields plus frequency
+    (daily|weekly), interval, count or until, and weekdays for weekly
+    series. Every visit is checked up front and all are created together.
+    """
+    permission_classes = [IsAuthenticated, IsCareSeeker]
+
+    def post(self, request):
+        try:
+            caregiver_id = int(request.data.get("caregiver"))
+        except (TypeError, ValueError):
+            return Response({"error": ErrorMessages.BOOKING_REQUIRED_FIELDS}, status=status.HTTP_400_BAD_REQUEST)
+        if not is_bookable_caregiver(caregiver_id):
+            return Response(
+                {"error": "Caregiver is not verified or does not exist"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        caregiver = User.objects.filter(id=caregiver_id, role="caregiver").first()
+        if caregiver is None:
+            return Response({"error": "Caregiver not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = BookingSeriesCreateSerializer(data=request.data, context={"request": request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = dict(serializer.validated_data)
+        rule = {key: data.pop(key, None) for key in ("frequency", "interval", "count", "until", "weekdays")}
+        data.pop("caregiver", None)
+        start_date = data.pop("date")
+        start_time = data["start_time"]
+        duration_hours = data.get("duration_hours", 1)
+        try:
+            dates = series.expand(start_date, **rule)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # same lead time as a single booking, measured to the first visit
+        if starts_too_soon(dates[0], start_time):
+            return Response({"error": ErrorMessages.CAREGIVER_NOT_AVAILABLE}, status=status.HTTP_400_BAD_REQUEST)
+
+        caregiver_profile = CaregiverProfile.objects.filter(user=caregiver).first()
+        off_schedule = series.outside_schedule(caregiver_profile, dates, start_time, duration_hours)
+        if off_schedule:
+            return Response(
+                {"error": ErrorMessages.CAREGIVER_OUTSIDE_SCHEDULE, "dates": [d.isoformat() for d in off_schedule]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        conflicts = series.find_conflicts(caregiver.id, dates, start_time, duration_hours)
+        if conflicts:
+            return Response(
+                {"error": ErrorMessages.CAREGIVER_NOT_AVAILABLE, "dates": [d.isoformat() for d in sorted(conflicts)]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        hourly_rate = (caregiver_profile.hourly_rate if caregiver_profile else None) or 0
+        booking_series, bookings = series.create_series(
+            request.user,
+            caregiver,
+            rule,
+            dates,
+            data,
+            total_amount=float(hourly_rate) * duration_hours,
+        )
+        return Response(
+            {
+                "series_id": booking_series.id,
+                "occurrence_count": len(bookings),
+                "bookings": BookingSerializer(bookings, many=True, context={"request": request}).data,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+def _series_data(booking_series, request):
+    bookings = booking_series.bookings.select_related("family", "caregiver").order_by("date")
+    return {
+        "series_id": booking_series.id,
+        "frequency": booking_series.frequency,
+        "interval": booking_series.interval,
+        "weekdays": booking_series.weekdays,
+        "start_date": booking_series.start_date,
+        "end_date": booking_series.end_date,
+        "occurrence_count": booking_series.occurrence_count,
+        "bookings": BookingSerializer(bookings, many=True, context={"request": request}).data,
+    }
+
+
+class BookingSeriesDetailView(APIView):
+    """GET /api/bookings/series/<id>/ - the series rule and its visits, for either participant"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        booking_series = BookingSeries.objects.filter(
+            Q(family=request.user) | Q(caregiver=request.user), pk=pk
+        ).first()
+        if booking_series is None:
+            return Response({"error": "Booking series not found"}, status=status.HTTP_404_NOT_FOUND)
+        expire_pending_bookings(booking_series.bookings.all())
+        return Response(_series_data(booking_series, request))
+
+
+class BookingSeriesRespondView(APIView):
+    """
+    Caregiver accepts or rejects every pending visit of a series at once.
+
+    Visits whose slot has been taken since stay pending and are returned
+    in "dates"; the family gets one notification for the whole series.
+    """
+    permission_classes = [IsAuthenticated, IsCaregiver]
+
+    def put(self, request, pk):
+        booking_series = BookingSeries.objects.filter(pk=pk, caregiver=request.user).select_related("family", "caregiver").first()
+        if booking_series is None:
+            return Response({"error": "Booking series not found"}, status=status.HTTP_404_NOT_FOUND)
+        new_status = request.data.get("status")
+        if new_status not in ("accepted", "rejected"):
+            return Response(
+                {"error": "Status must be accepted or rejected"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # same 30-minute window as a single request, for the series as a whole
+        expire_pending_bookings(booking_series.bookings.all())
+        fields = {"responded_at": timezone.now()}
+        if new_status == "rejected":
+            fields["rejection_reason"] = (request.data.get("rejection_reason") or "").strip() or MANUAL_REJECTION_REASON
+        changed, taken = series.respond(booking_series, new_status, **fields)
+        if not changed and not taken:
+            return Response(
+                {"error": ErrorMessages.BOOKING_EXPIRED},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        data = _series_data(booking_series, request)
+        data["dates"] = [d.isoformat() for d in taken]
+        return Response(data)
+
+
 class CheckAvailabilityView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -396,26 +700,40 @@ class CheckAvailabilityView(APIView):
             return Response({"is_available": True})
 
 
-class BookingListView(APIView):
+class BookingListView(SparseFieldsetMixin, ConditionalGetMixin, APIView):
     """Returns bookings based on user role - sent vs received"""
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        expire_pending_bookings()
+    def get_queryset(self, request):
         # Careseekers see bookings they made, caregivers see requests they received
         if request.user.role == "careseeker":
-            bookings = Booking.objects.filter(family=request.user)
-        elif request.user.role == "caregiver":
-            bookings = Booking.objects.filter(caregiver=request.user)
-        else:
+            return Booking.objects.filter(family=request.user)
+        if request.user.role == "caregiver":
+            return Booking.objects.filter(caregiver=request.user)
+        return None
+
+    def get_validators(self, request):
+        # runs before get(): expire first so the ETag matches what get() returns
+        expire_pending_bookings()
+        bookings = self.get_queryset(request)
+        if bookings is None:
+            return None, None
+        # Auto-expire pending bookings that exceeded 30-minute response window
+        expire_pending_bookings(bookings)
+        expire_stale_in_progress_bookings(bookings)
+        return booking_list_validators(bookings)
+
+    def get(self, request):
+        bookings = self.get_queryset(request)
+        if bookings is None:
             return Response(
                 {"error": ErrorMessages.UNAUTHORIZED},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        # Auto-expire pending bookings that exceeded 30-minute response window
-        expire_pending_bookings(bookings)
-        expire_stale_in_progress_bookings(bookings)
-        serializer = BookingSerializer(bookings, many=True, context={"request": request})
+        # ?fields=id,caregiver_name,date,status for compact rows
+        fields = self.get_sparse_fields(BookingSerializer)
+        bookings = sparse_queryset(bookings, BookingSerializer, fields)
+        serializer = BookingSerializer(bookings, many=True, context={"request": request, "fields": fields})
         return Response(serializer.data)
 
 
@@ -445,8 +763,11 @@ class BookingMarkServiceCompleteView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        booking.status = "awaiting_confirmation" if _is_mobile_request(request) else "completion_requested"
-        booking.save()
+        new_status = "awaiting_confirmation" if _is_mobile_request(request) else "completion_requested"
+        try:
+            state_machine.transition(booking, new_status)
+        except state_machine.TransitionError as e:
+            return _transition_error_response(e)
 
         serializer = BookingSerializer(booking, context={"request": request})
         return Response(serializer.data)
@@ -471,8 +792,10 @@ class BookingConfirmCompletionView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        booking.status = "completed"
-        booking.save()
+        try:
+            state_machine.transition(booking, "completed")
+        except state_machine.TransitionError as e:
+            return _transition_error_response(e)
 
         if _is_mobile_request(request):
             UserActivity.objects.create(
@@ -501,8 +824,10 @@ class BookingRespondView(APIView):
         # Check if pending booking has expired (30-minute window)
         if booking.status == "pending":
             if timezone.now() - booking.created_at > timedelta(minutes=PENDING_RESPONSE_WINDOW_MINUTES):
-                booking.status = "expired"
-                booking.save()
+                try:
+                    state_machine.transition(booking, "expired")
+                except state_machine.TransitionError:
+                    pass
                 return Response(
                     {"error": ErrorMessages.BOOKING_EXPIRED},
                     status=status.HTTP_400_BAD_REQUEST,
@@ -520,40 +845,33 @@ class BookingRespondView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # When accepting, check for time conflicts with other active bookings
-        # This uses the new time-aware overlap logic that considers end times
-        if new_status == "accepted":
-            has_overlap = caregiver_has_overlap(
-                caregiver_id=request.user.id,
-                date=booking.date,
-                start_time=booking.start_time,
-                duration_hours=booking.duration_hours,
-                exclude_booking_id=booking.id  # Don't compare booking with itself
-            )
-            
-            if has_overlap:
-                return Response(
-                    {"error": "You have another booking that overlaps with this time slot. Please reject this request or complete the conflicting booking first."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        booking.status = new_status
+        fields = {"responded_at": timezone.now()}
         if new_status == "rejected":
-            rejection_reason = (request.data.get("rejection_reason") or "").strip() or MANUAL_REJECTION_REASON
-            booking.rejection_reason = rejection_reason
-        booking.save()
+            fields["rejection_reason"] = (request.data.get("rejection_reason") or "").strip() or MANUAL_REJECTION_REASON
+        # accepting re-checks overlaps under a per-caregiver lock (bookings/state_machine.py)
+        try:
+            state_machine.transition(booking, new_status, **fields)
+        except state_machine.SlotTaken:
+            return Response(
+                {"error": "You have another booking that overlaps with this time slot. Please reject this request or complete the conflicting booking first."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except state_machine.TransitionError as e:
+            return _transition_error_response(e)
         return Response(BookingSerializer(booking, context={"request": request}).data)
 
 
-class AssignedBookingsView(APIView):
+class AssignedBookingsView(SparseFieldsetMixin, APIView):
     """Return caregiver's assigned bookings for mobile dashboard."""
     permission_classes = [IsAuthenticated, IsCaregiver]
 
     def get(self, request):
+        fields = self.get_sparse_fields(BookingSerializer)
         expire_pending_bookings()
         bookings = Booking.objects.filter(caregiver=request.user).order_by("-created_at")
         expire_stale_in_progress_bookings(bookings)
-        serializer = BookingSerializer(bookings, many=True, context={"request": request})
+        bookings = sparse_queryset(bookings, BookingSerializer, fields)
+        serializer = BookingSerializer(bookings, many=True, context={"request": request, "fields": fields})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -576,37 +894,32 @@ class BookingUpdateStatusView(APIView):
         requested_status = serializer.validated_data["status"]
         event_time = serializer.validated_data["parsed_timestamp"]
 
-        if requested_status == "accepted":
-            try:
-                has_overlap, conflict_id = check_caregiver_overlap(
-                    booking.caregiver, booking
-                )
-                if has_overlap:
-                    return Response(
-                        {
-                            "error": (
-                                f"You already have an accepted booking (#{conflict_id}) "
-                                "that overlaps with this time slot. Please complete "
-                                "or reject that booking first before accepting this one."
-                            )
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-            except Exception:
-                pass
-            booking.status = "accepted"
-        elif requested_status == "rejected":
-            booking.status = "rejected"
-            booking.rejection_reason = (serializer.validated_data.get("rejection_reason") or "").strip() or MANUAL_REJECTION_REASON
+        fields = {}
+        if requested_status in ("accepted", "rejected"):
+            fields["responded_at"] = booking.responded_at or timezone.now()
+        if requested_status == "rejected":
+            fields["rejection_reason"] = (serializer.validated_data.get("rejection_reason") or "").strip() or MANUAL_REJECTION_REASON
         elif requested_status == "in_progress":
-            booking.status = "in_progress"
-            booking.check_in_time = event_time
-            booking.check_out_time = None
+            fields["check_in_time"] = event_time
+            fields["check_out_time"] = None
         elif requested_status in ("awaiting_confirmation", "completed"):
-            booking.status = requested_status
-            booking.check_out_time = event_time
+            fields["check_out_time"] = event_time
 
-        booking.save()
+        try:
+            state_machine.transition(booking, requested_status, **fields)
+        except state_machine.SlotTaken as e:
+            return Response(
+                {
+                    "error": (
+                        f"You already have an accepted booking (#{e.conflict_id}) "
+                        "that overlaps with this time slot. Please complete "
+                        "or reject that booking first before accepting this one."
+                    )
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except state_machine.TransitionError as e:
+            return _transition_error_response(e)
 
         if requested_status in ("awaiting_confirmation", "completed") and _is_mobile_request(request):
             UserActivity.objects.create(
@@ -666,29 +979,24 @@ class BookingUpdateLocationView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # the row itself is only written on the throttle in bookings/location.py;
+        # apps that can should use ws/bookings/<id>/location/ instead of polling
         try:
-            latitude = float(request.data.get("latitude"))
-            longitude = float(request.data.get("longitude"))
+            payload = location.record_location(
+                booking.pk, request.data.get("latitude"), request.data.get("longitude")
+            )
         except (TypeError, ValueError):
             return Response(
                 {"error": "latitude and longitude are required numeric fields."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except location.LocationNotAllowed:
+            return Response(
+                {"error": "Location updates are only allowed when booking is in_progress."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        booking.caregiver_latitude = latitude
-        booking.caregiver_longitude = longitude
-        booking.location_updated_at = timezone.now()
-        booking.save(update_fields=["caregiver_latitude", "caregiver_longitude", "location_updated_at"])
-
-        return Response(
-            {
-                "latitude": float(booking.caregiver_latitude),
-                "longitude": float(booking.caregiver_longitude),
-                "updated_at": booking.location_updated_at,
-                "is_available": True,
-            },
-            status=status.HTTP_200_OK,
-        )
+        return Response(payload, status=status.HTTP_200_OK)
 
 
 class BookingCaregiverLocationView(APIView):
@@ -704,29 +1012,69 @@ class BookingCaregiverLocationView(APIView):
         expire_stale_in_progress_bookings(Booking.objects.filter(pk=booking.pk))
         booking.refresh_from_db()
 
-        has_location = (
-            booking.caregiver_latitude is not None
-            and booking.caregiver_longitude is not None
-            and booking.location_updated_at is not None
-        )
+        return Response(location.get_location(booking), status=status.HTTP_200_OK)
 
-        if not has_location:
-            return Response(
-                {
-                    "latitude": None,
-                    "longitude": None,
-                    "updated_at": None,
-                    "is_available": False,
-                },
-                status=status.HTTP_200_OK,
-            )
 
-        return Response(
-            {
-                "latitude": float(booking.caregiver_latitude),
-                "longitude": float(booking.caregiver_longitude),
-                "updated_at": booking.location_updated_at,
-                "is_available": True,
-            },
-            status=status.HTTP_200_OK,
-        )
+class BookingTrackView(APIView):
+    """
+    Route replay for a booking, for its family, caregiver or an admin.
+
+    GET /api/bookings/<pk>/track/           packed track (application/octet-stream,
+                                            format documented in bookings/tracks.py)
+    GET /api/bookings/<pk>/track/?decoded=1 [[latitude, longitude, unix_time], ...] as JSON
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        try:
+            booking = Booking.objects.only("id", "family_id", "caregiver_id").get(pk=pk)
+        except Booking.DoesNotExist:
+            return Response({"error": ErrorMessages.BOOKING_EXPIRED}, status=status.HTTP_404_NOT_FOUND)
+
+        if not (request.user.is_staff or request.user.id in (booking.family_id, booking.caregiver_id)):
+            return Response({"error": ErrorMessages.UNAUTHORIZED}, status=status.HTTP_403_FORBIDDEN)
+
+        track = LocationTrack.objects.filter(booking_id=booking.pk).first()
+        data = bytes(track.data) if track else b""
+
+        if request.query_params.get("decoded"):
+            return Response({
+                "booking_id": booking.pk,
+                "is_simplified": bool(track and track.is_simplified),
+                "points": tracks.decode_track(data).tolist(),
+            })
+
+        response = HttpResponse(data, content_type="application/octet-stream")
+        response["X-Track-Points"] = str(track.point_count if track else 0)
+        response["X-Track-Simplified"] = "1" if track and track.is_simplified else "0"
+        return response
+
+
+class BookingCalendarView(APIView):
+    """
+    Per-day booking counts, hours and booked intervals for one month.
+
+    GET /api/bookings/calendar/?month=YYYY-MM
+    Caregivers get their schedule, careseekers their own bookings. Admins get
+    platform-wide day totals, or one caregiver's calendar with ?caregiver_id=.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            month = schedule.parse_month(request.query_params.get("month") or f"{timezone.localdate():%Y-%m}")
+        except ValueError:
+            return Response({"error": "month must be YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        if user.is_staff:
+            caregiver_id = request.query_params.get("caregiver_id")
+            if caregiver_id and not caregiver_id.isdigit():
+                return Response({"error": "Invalid caregiver ID"}, status=status.HTTP_400_BAD_REQUEST)
+            scope, user_id = ("caregiver", int(caregiver_id)) if caregiver_id else ("all", None)
+        elif user.role == "caregiver":
+            scope, user_id = "caregiver", user.id
+        else:
+            scope, user_id = "family", user.id
+
+        return Response(schedule.month_calendar(scope, user_id, month))
@@ -1,16 +1,22 @@
 """
-WebSocket handler for real-time chat.
+WebSocket handlers for real-time chat.
 
 When users connect:
 1. Verify JWT token from query string
 2. Make sure they're actually in this conversation
 3. Mark them online and broadcast presence
 4. Listen for new messages and broadcast to room
+
+ChatConsumer serves one conversation per socket (ws/chat/<id>/).
+UserStreamConsumer serves one socket per user session (ws/stream/) and
+carries chat, presence and notification events for every conversation the
+client subscribes to with control frames.
 """
-import json
 import logging
 
-from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
@@ -19,13 +25,251 @@ from rest_framework_simplejwt.tokens import UntypedToken
 
 logger = logging.getLogger(__name__)
 
+from accounts import presence
 from .models import Conversation, Message
+from .realtime import RealtimeMixin, decode_frame, group_send
 
 User = get_user_model()
 
+# how many conversations one multiplexed socket may follow at once
+MAX_STREAM_SUBSCRIPTIONS = 50
+# messages replayed per sync request; clients ask again while has_more is true
+SYNC_BATCH_SIZE = 200
+CLIENT_ID_MAX_LENGTH = 64
+
+
+def conversation_group(conversation_id):
+    """Channel layer group shared by every socket following a conversation."""
+    return f"conversation_{conversation_id}"
+
+
+def notifications_group(user_id):
+    """Channel layer group that receives a user's notification events."""
+    return f"notifications_user_{user_id}"
+
+
+def get_token_from_scope(scope):
+    """Read the JWT from the ?token=xxx query string."""
+    query_string = scope.get("query_string", b"").decode()
+    for part in query_string.split("&"):
+        if part.startswith("token="):
+            return part[6:].strip() or None
+    return None
+
+
+def get_since_id_from_scope(scope):
+    """Read ?since_id=<message id> (last message the client already has)."""
+    query_string = scope.get("query_string", b"").decode()
+    for part in query_string.split("&"):
+        if part.startswith("since_id="):
+            return _parse_id(part[9:]) or 0
+    return None
+
+
+def clean_client_id(value):
+    """Client message ids are optional opaque strings up to 64 chars."""
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    return value if 0 < len(value) <= CLIENT_ID_MAX_LENGTH else None
+
+
+def message_payload(message, sender):
+    """Wire shape of a chat message (same as MessageSerializer minus conversation)."""
+    return {
+        "id": message.id,
+        "sender_id": sender.id,
+        "sender_name": sender.username,
+        "text": message.text,
+        "client_id": message.client_id,
+        "created_at": message.created_at.isoformat(),
+    }
+
+
+@database_sync_to_async
+def get_user_from_token(token_str):
+    """Validate JWT and return User or None."""
+    try:
+        validated = UntypedToken(token_str)
+        user_id = validated.get("user_id")
+        if user_id is None:
+            return None
+        return User.objects.get(id=user_id)
+    except (InvalidToken, TokenError, KeyError, User.DoesNotExist) as e:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Chat WebSocket JWT validation failed: %s", e)
+        return None
+    except Exception as e:
+        logger.warning("Chat WebSocket token validation error: %s", e)
+        return None
+
+
+@database_sync_to_async
+def user_in_conversation(user, conv_id):
+    """Check if user is a participant in the conversation."""
+    return Conversation.objects.filter(
+        Q(user1=user) | Q(user2=user),
+        id=conv_id,
+    ).exists()
+
+
+@database_sync_to_async
+def get_conversation_ids(user_id):
+    """All conversation ids the user takes part in (used for presence fan-out)."""
+    return list(
+        Conversation.objects.filter(Q(user1_id=user_id) | Q(user2_id=user_id)).values_list("id", flat=True)
+    )
+
+
+@database_sync_to_async
+def save_message(conversation_id, text, sender, client_id=None):
+    """
+    Save message to DB. Returns (message, created); a retried client_id
+    returns the stored message with created=False.
+    """
+    try:
+        conv = Conversation.objects.get(id=conversation_id)
+    except Conversation.DoesNotExist:
+        return None, False
+    try:
+        with transaction.atomic():
+            message = Message.objects.create(
+                conversation=conv,
+                sender=sender,
+                text=text,
+                client_id=client_id,
+            )
+        return message, True
+    except IntegrityError:
+        if client_id is None:
+            raise
+        message = Message.objects.filter(sender=sender, client_id=client_id).first()
+        return message, False
+
+
+@database_sync_to_async
+def get_messages_since(conversation_id, since_id, limit=SYNC_BATCH_SIZE):
+    """Messages after since_id, oldest first. Returns (payloads, has_more)."""
+    messages = list(
+        Message.objects.filter(conversation_id=conversation_id, id__gt=since_id)
+        .select_related("sender")
+        .order_by("id")[: limit + 1]
+    )
+    return [message_payload(m, m.sender) for m in messages[:limit]], len(messages) > limit
+
+
+@database_sync_to_async
+def create_message_notification(message, sender):
+    """Create notification for the message recipient."""
+    from notifications.signals import create_message_notification as _create
+    conv = message.conversation
+    recipient = conv.get_other_user(sender)
+    preview = f"{sender.username}: {message.text}"
+    _create(
+        sender=sender,
+        recipient=recipient,
+        conversation_id=conv.id,
+        preview_text=preview,
+    )
 
-class ChatConsumer(AsyncWebsocketConsumer):
+
+async def broadcast_presence(channel_layer, conversation_ids, user_id, is_online):
+    """Broadcast presence to all participants of the given conversations."""
+    status = await get_presence_status(user_id)
+    payload = {
+        "type": "presence",
+        "user_id": user_id,
+        "is_online": is_online,
+        "last_seen": status["last_seen"],
+    }
+    for conv_id in conversation_ids:
+        conv_id = int(conv_id)
+        await group_send(
+            channel_layer,
+            conversation_group(conv_id),
+            {"type": "presence_update", "conversation_id": conv_id, "payload": payload},
+            frames={
+                "plain": payload,
+                "stream": {"stream": "presence", "conversation_id": conv_id, "payload": payload},
+            },
+        )
+
+
+@database_sync_to_async
+def get_presence_status(user_id):
+    """Presence from the Redis store, falling back to the users table."""
+    db_last_seen = User.objects.filter(id=user_id).values_list("last_seen", flat=True).first()
+    status = presence.get_status(user_id, db_last_seen=db_last_seen)
+    if status is None:
+        status = {"is_online": False, "last_seen": db_last_seen.isoformat() if db_last_seen else None}
+    return status
+
+
+class PresenceMixin:
+    """
+    Registers the socket in the presence store and keeps it alive.
+
+    Rides on RealtimeMixin's heartbeat, so WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS
+    must stay well under PRESENCE_TTL_SECONDS; if the worker dies the entry
+    expires on its own.
+    """
+
+    async def presence_join(self, user_id):
+        """Returns True when the user just came online."""
+        self._presence_user_id = user_id
+        return await sync_to_async(presence.connect)(user_id, self.channel_name)
+
+    async def presence_leave(self):
+        """Returns True when the user just went offline."""
+        user_id = getattr(self, "_presence_user_id", None)
+        if user_id is None:
+            return False
+        return await sync_to_async(presence.disconnect)(user_id, self.channel_name)
+
+    async def on_heartbeat(self):
+        await super().on_heartbeat()
+        await sync_to_async(presence.heartbeat)(self._presence_user_id, self.channel_name)
+        await database_sync_to_async(presence.maybe_flush_last_seen)()
+
+
+async def send_chat_message(channel_layer, conversation_id, text, user, client_id=None):
+    """
+    Persist a message, notify the recipient and broadcast it to the room.
+    Returns (message, created); a duplicate client_id is not broadcast again.
+    """
+    message, created = await save_message(conversation_id, text, user, client_id)
+    if not message or not created:
+        return message, False
+
+    # Create notification for recipient and broadcast via notifications WebSocket
+    await create_message_notification(message, user)
+
+    # Broadcast to room (including sender)
+    payload = message_payload(message, user)
+    await group_send(
+        channel_layer,
+        conversation_group(conversation_id),
+        {"type": "chat_message", "conversation_id": int(conversation_id), "message": payload},
+        frames={
+            "plain": payload,
+            "stream": {"stream": "chat", "conversation_id": int(conversation_id), "payload": payload},
+        },
+    )
+    return message, True
+
+
+class ChatConsumer(PresenceMixin, RealtimeMixin, AsyncWebsocketConsumer):
     # handles one WebSocket connection for a conversation
+    #
+    # client -> server: {"text": "hi", "client_id": "<uuid>"} (client_id optional,
+    # retries with the same id are stored once) or {"action": "sync", "since_id": 42}.
+    # Reconnecting with ?since_id=42 syncs straight away; the reply is the missed
+    # messages followed by {"type": "synced", "last_id": ..., "has_more": ...}.
+
+    def connection_kind(self):
+        # one socket per open conversation: cap the tabs on each conversation,
+        # not how many conversations a user has open
+        return f"chat:{self.conversation_id}"
 
     async def connect(self):
         """
@@ -34,55 +278,66 @@ class ChatConsumer(AsyncWebsocketConsumer):
         - User is a participant in this conversation
         """
         self.conversation_id = self.scope["url_route"]["kwargs"]["conversation_id"]
-        self.room_name = f"conversation_{self.conversation_id}"
-
-        # get token from query string (e.g ?token=xxx)
-        query_string = self.scope.get("query_string", b"").decode()
-        token = None
-        for part in query_string.split("&"):
-            if part.startswith("token="):
-                token = part[6:].strip()
-                break
+        self.room_name = conversation_group(self.conversation_id)
 
+        token = get_token_from_scope(self.scope)
         if not token:
             await self.close(code=4001)
             return
 
-        user = await self._get_user_from_token(token)
+        user = await get_user_from_token(token)
         if not user:
             await self.close(code=4001)
             return
 
         # make sure they're actually in this conversation
-        in_conversation = await self._user_in_conversation(user, self.conversation_id)
+        in_conversation = await user_in_conversation(user, self.conversation_id)
         if not in_conversation:
             await self.close(code=4003)
             return
 
         self.scope["user"] = user
+        if not await self.open_connection(user.id):
+            return
 
         await self.channel_layer.group_add(self.room_name, self.channel_name)
-        await self.accept()
+        await self.accept_connection()
 
-        # mark them as online and tell others
-        await self._update_presence(user.id, is_online=True)
-        await self._broadcast_presence(user.id, is_online=True)
+        # mark them as online and tell others; every conversation hears about
+        # the first connection, later tabs only refresh this room
+        if await self.presence_join(user.id):
+            conversation_ids = await get_conversation_ids(user.id)
+        else:
+            conversation_ids = [self.conversation_id]
+        await broadcast_presence(self.channel_layer, conversation_ids, user.id, is_online=True)
+
+        since_id = get_since_id_from_scope(self.scope)
+        if since_id is not None:
+            await self._send_missed(since_id)
 
     async def disconnect(self, close_code):
+        await self.close_connection()
         user = self.scope.get("user")
-        if user:
-            # mark them offline and tell others before disconnecting
-            await self._update_presence(user.id, is_online=False)
-            await self._broadcast_presence(user.id, is_online=False)
-        await self.channel_layer.group_discard(self.room_name, self.channel_name)
+        if user and hasattr(self, "_presence_user_id"):
+            # only the user's last open socket takes them offline
+            if await self.presence_leave():
+                await broadcast_presence(
+                    self.channel_layer, await get_conversation_ids(user.id), user.id, is_online=False
+                )
+        if hasattr(self, "room_name"):
+            await self.channel_layer.group_discard(self.room_name, self.channel_name)
 
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         # when a new message comes in:
         # save it, then broadcast to everyone in the room
+        self.mark_activity()
         try:
-            data = json.loads(text_data)
+            data = decode_frame(text_data, bytes_data)
+            if data.get("action") == "sync":
+                await self._send_missed(_parse_id(data.get("since_id")) or 0)
+                return
             text = (data.get("text") or "").strip()
-        except (json.JSONDecodeError, TypeError):
+        except (ValueError, AttributeError):
             return
 
         if not text:
@@ -92,117 +347,217 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if not user:
             return
 
-        message = await self._save_message(text, user)
-        if not message:
-            return
-
-        # Create notification for recipient and broadcast via notifications WebSocket
-        await self._create_message_notification(message, user)
-
-        # Broadcast to room (including sender)
-        await self.channel_layer.group_send(
-            self.room_name,
-            {
-                "type": "chat_message",
-                "message": {
-                    "id": message.id,
-                    "sender_id": user.id,
-                    "sender_name": user.username,
-                    "text": message.text,
-                    "created_at": message.created_at.isoformat(),
-                },
-            },
+        message, created = await send_chat_message(
+            self.channel_layer, self.conversation_id, text, user, clean_client_id(data.get("client_id"))
         )
+        if message and not created:
+            # retried send: the room already has it, just confirm to this socket
+            await self.send_payload(message_payload(message, user))
+
+    async def _send_missed(self, since_id):
+        payloads, has_more = await get_messages_since(self.conversation_id, since_id)
+        for payload in payloads:
+            await self.send_payload(payload)
+        await self.send_payload({
+            "type": "synced",
+            "last_id": payloads[-1]["id"] if payloads else since_id,
+            "has_more": has_more,
+        })
 
     async def chat_message(self, event):
         """Send the message to the WebSocket."""
-        await self.send(text_data=json.dumps(event["message"]))
+        await self.send_frame(event["message"], event)
 
     async def presence_update(self, event):
         """Send presence update to the WebSocket."""
-        await self.send(text_data=json.dumps(event["payload"]))
-
-    @database_sync_to_async
-    def _update_presence(self, user_id, is_online):
-        """Update user presence in database."""
-        now = timezone.now()
-        User.objects.filter(id=user_id).update(is_online=is_online, last_seen=now)
-
-    async def _broadcast_presence(self, user_id, is_online):
-        """Broadcast presence to all participants in the room."""
-        last_seen = await self._get_user_last_seen(user_id)
-        await self.channel_layer.group_send(
-            self.room_name,
-            {
-                "type": "presence_update",
-                "payload": {
-                    "type": "presence",
-                    "user_id": user_id,
-                    "is_online": is_online,
-                    "last_seen": last_seen,
-                },
-            },
-        )
+        payload = event["payload"]
+        await self.send_frame(payload, event, coalesce_key=("presence", payload["user_id"]))
 
-    @database_sync_to_async
-    def _get_user_last_seen(self, user_id):
-        """Get user's last_seen as ISO string."""
-        try:
-            user = User.objects.get(id=user_id)
-            return user.last_seen.isoformat() if user.last_seen else None
-        except User.DoesNotExist:
-            return None
 
-    @database_sync_to_async
-    def _get_user_from_token(self, token_str):
-        """Validate JWT and return User or None."""
-        try:
-            validated = UntypedToken(token_str)
-            user_id = validated.get("user_id")
-            if user_id is None:
-                return None
-            return User.objects.get(id=user_id)
-        except (InvalidToken, TokenError, KeyError, User.DoesNotExist) as e:
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug("Chat WebSocket JWT validation failed: %s", e)
-            return None
-        except Exception as e:
-            logger.warning("Chat WebSocket token validation error: %s", e)
-            return None
+class UserStreamConsumer(PresenceMixin, RealtimeMixin, AsyncWebsocketConsumer):
+    """
+    One multiplexed socket per user session: ws://host/ws/stream/?token=<jwt>
 
-    @database_sync_to_async
-    def _user_in_conversation(self, user, conv_id):
-        """Check if user is a participant in the conversation."""
-        try:
-            conv = Conversation.objects.get(id=conv_id)
-            return user in (conv.user1, conv.user2)
-        except Conversation.DoesNotExist:
-            return False
+    Client -> server control frames:
+        {"action": "subscribe", "conversation_id": 5}
+        {"action": "unsubscribe", "conversation_id": 5}
+        {"action": "send", "conversation_id": 5, "text": "hi", "client_id": "<uuid>"}
+        {"action": "sync", "conversation_id": 5, "since_id": 42}
+        {"action": "pong"}                      (reply to every ping)
 
-    @database_sync_to_async
-    def _save_message(self, text, sender):
-        """Save message to DB and return it."""
-        try:
-            conv = Conversation.objects.get(id=self.conversation_id)
-            msg = Message.objects.create(
-                conversation=conv,
-                sender=sender,
-                text=text,
+    Frames are JSON text, or MessagePack binary when the client negotiates
+    the "carenest.msgpack" subprotocol.
+
+    Server -> client frames are wrapped with the stream they belong to:
+        {"stream": "chat", "conversation_id": 5, "payload": {...message...}}
+        {"stream": "presence", "conversation_id": 5, "payload": {...}}
+        {"stream": "notification", "payload": {...notification...}}
+        {"stream": "control", "action": "subscribed", "conversation_id": 5}
+        {"stream": "control", "action": "synced", "conversation_id": 5, "last_id": 57, "has_more": false}
+        {"stream": "control", "action": "ping", "ts": 1700000000.0}
+
+    Clients that stop answering pings are closed with 4002 (idle) or, once
+    WEBSOCKET_MAX_UNANSWERED_PINGS are outstanding, handled per
+    WEBSOCKET_OVERFLOW_POLICY.
+    """
+
+    send_pings = True
+    frame_shape = "stream"
+
+    async def connect(self):
+        self.user = None
+        self.subscriptions = set()
+
+        token = get_token_from_scope(self.scope)
+        if not token:
+            await self.close(code=4001)
+            return
+
+        user = await get_user_from_token(token)
+        if not user:
+            await self.close(code=4001)
+            return
+
+        self.user = user
+        self.scope["user"] = user
+        self.notifications_room = notifications_group(user.id)
+        if not await self.open_connection(user.id):
+            return
+
+        await self.channel_layer.group_add(self.notifications_room, self.channel_name)
+        await self.accept_connection()
+
+        if await self.presence_join(user.id):
+            await broadcast_presence(
+                self.channel_layer, await get_conversation_ids(user.id), user.id, is_online=True
             )
-            return msg
-        except Conversation.DoesNotExist:
-            return None
 
-    @database_sync_to_async
-    def _create_message_notification(self, message, sender):
-        """Create notification for the message recipient."""
-        from notifications.signals import create_message_notification
-        conv = message.conversation
-        recipient = conv.get_other_user(sender)
-        preview = f"{sender.username}: {message.text}"
-        create_message_notification(
-            sender=sender,
-            recipient=recipient,
-            conversation_id=conv.id,
-            preview_text=preview,
+    async def disconnect(self, close_code):
+        await self.close_connection()
+        if not getattr(self, "_presence_user_id", None):
+            return
+        for conv_id in list(self.subscriptions):
+            await self.channel_layer.group_discard(conversation_group(conv_id), self.channel_name)
+        self.subscriptions.clear()
+        await self.channel_layer.group_discard(self.notifications_room, self.channel_name)
+
+        if await self.presence_leave():
+            await broadcast_presence(
+                self.channel_layer, await get_conversation_ids(self.user.id), self.user.id, is_online=False
+            )
+
+    async def receive(self, text_data=None, bytes_data=None):
+        self.mark_activity()
+        try:
+            data = decode_frame(text_data, bytes_data)
+        except ValueError:
+            await self._send_control(error="invalid_frame")
+            return
+
+        action = data.get("action")
+        if action == "pong":
+            await self.handle_pong()
+        elif action == "subscribe":
+            await self._subscribe(data.get("conversation_id"))
+        elif action == "unsubscribe":
+            await self._unsubscribe(data.get("conversation_id"))
+        elif action == "send":
+            await self._send_message(data)
+        elif action == "sync":
+            await self._send_missed(data)
+        else:
+            await self._send_control(error="unknown_action", action=action)
+
+    async def _subscribe(self, conversation_id):
+        conv_id = _parse_id(conversation_id)
+        if conv_id is None:
+            await self._send_control(error="invalid_conversation", action="subscribe")
+            return
+        if conv_id in self.subscriptions:
+            await self._send_control(action="subscribed", conversation_id=conv_id)
+            return
+        if len(self.subscriptions) >= MAX_STREAM_SUBSCRIPTIONS:
+            await self._send_control(error="too_many_subscriptions", conversation_id=conv_id)
+            return
+        if not await user_in_conversation(self.user, conv_id):
+            await self._send_control(error="forbidden", conversation_id=conv_id)
+            return
+
+        await self.channel_layer.group_add(conversation_group(conv_id), self.channel_name)
+        self.subscriptions.add(conv_id)
+        await self._send_control(action="subscribed", conversation_id=conv_id)
+
+    async def _unsubscribe(self, conversation_id):
+        conv_id = _parse_id(conversation_id)
+        if conv_id in self.subscriptions:
+            await self.channel_layer.group_discard(conversation_group(conv_id), self.channel_name)
+            self.subscriptions.discard(conv_id)
+        await self._send_control(action="unsubscribed", conversation_id=conv_id)
+
+    async def _send_message(self, data):
+        conv_id = _parse_id(data.get("conversation_id"))
+        text = (data.get("text") or "").strip() if isinstance(data.get("text"), str) else ""
+        if not text:
+            return
+        # sending requires a subscription so membership is checked only once
+        if conv_id not in self.subscriptions:
+            await self._send_control(error="not_subscribed", conversation_id=conv_id)
+            return
+        message, created = await send_chat_message(
+            self.channel_layer, conv_id, text, self.user, clean_client_id(data.get("client_id"))
         )
+        if message and not created:
+            await self.send_payload({
+                "stream": "chat",
+                "conversation_id": message.conversation_id,
+                "payload": message_payload(message, self.user),
+            })
+
+    async def _send_missed(self, data):
+        """Replay messages the client missed while it was disconnected."""
+        conv_id = _parse_id(data.get("conversation_id"))
+        if conv_id not in self.subscriptions:
+            await self._send_control(error="not_subscribed", conversation_id=conv_id)
+            return
+        since_id = _parse_id(data.get("since_id")) or 0
+        payloads, has_more = await get_messages_since(conv_id, since_id)
+        for payload in payloads:
+            await self.send_payload({"stream": "chat", "conversation_id": conv_id, "payload": payload})
+        await self._send_control(
+            action="synced",
+            conversation_id=conv_id,
+            last_id=payloads[-1]["id"] if payloads else since_id,
+            has_more=has_more,
+        )
+
+    async def _send_control(self, **fields):
+        await self.send_payload({"stream": "control", **fields})
+
+    async def chat_message(self, event):
+        await self.send_frame({
+            "stream": "chat",
+            "conversation_id": event.get("conversation_id"),
+            "payload": event["message"],
+        }, event)
+
+    async def presence_update(self, event):
+        payload = event["payload"]
+        await self.send_frame({
+            "stream": "presence",
+            "conversation_id": event.get("conversation_id"),
+            "payload": payload,
+        }, event, coalesce_key=("presence", event.get("conversation_id"), payload["user_id"]))
+
+    async def notification_new(self, event):
+        await self.send_frame({
+            "stream": "notification",
+            "payload": event["notification"],
+        }, event)
+
+
+def _parse_id(value):
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed > 0 else None
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from chat.realtime import get_metrics
+
+FIELDS = ("sent", "delivered", "coalesced", "slow_closes")
+
+
+class Command(BaseCommand):
+    help = "Show per-group WebSocket delivery counters (last 24h) from Redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--group", default="*", help="Group name or glob, e.g. conversation_*")
+
+    def handle(self, *args, **options):
+        metrics = get_metrics(options["group"])
+        if not metrics:
+            self.stdout.write("No WebSocket metrics recorded.")
+            return
+        self.stdout.write("group".ljust(40) + "".join(f.rjust(12) for f in FIELDS))
+        for group in sorted(metrics):
+            counts = metrics[group]
+            self.stdout.write(group.ljust(40) + "".join(str(counts.get(f, 0)).rjust(12) for f in FIELDS))
@@ -55,10 +55,19 @@ class Message(models.Model):
         related_name="sent_messages",
     )
     text = models.TextField()
+    # id generated by the sending client so retried sends are not stored twice
+    client_id = models.CharField(max_length=64, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ["created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["sender", "client_id"],
+                condition=models.Q(client_id__isnull=False),
+                name="unique_message_client_id",
+            )
+        ]
 
     def __str__(self):
         return f"Message {self.id} from {self.sender.username}"
@@ -0,0 +1,327 @@
+"""
+Connection hygiene shared by every WebSocket consumer.
+
+- Per-user connection cap (WEBSOCKET_MAX_CONNECTIONS_PER_USER), counted in
+  Redis so it holds across daphne processes. Each consumer type has its own
+  count (connection_kind()); the legacy per-conversation chat sockets are
+  counted per conversation, so having many chats open is not capped.
+- A heartbeat task per socket. Sockets that speak the ping/pong protocol
+  (send_pings = True) get a ping every WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS
+  and are closed after WEBSOCKET_IDLE_TIMEOUT_SECONDS without any frame.
+- Slow-consumer backpressure. A client that stops reading is detected by
+  pings it has not answered (WEBSOCKET_MAX_UNANSWERED_PINGS) or, for sockets
+  without pings, by how long events sat in the channel layer. What happens
+  next is WEBSOCKET_OVERFLOW_POLICY: "close" drops the connection,
+  "coalesce" keeps only the newest frame per coalesce key (presence,
+  location) and delivers the parked frames once the client catches up (a
+  pong, the next on-time event, or the next heartbeat). A client twice as
+  far behind is closed under either policy.
+- Per-group counters (sent, delivered, coalesced, slow_closes) collected in
+  process and flushed to Redis hashes ws:metrics:<group> on each heartbeat.
+- Wire format negotiation. A client offering the "carenest.msgpack"
+  subprotocol gets binary MessagePack frames (and may send them); everyone
+  else gets JSON text. group_send() encodes each frame shape once per format
+  so a busy room is not re-serialized per recipient.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, defaultdict
+
+import msgpack
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CLOSE_IDLE_TIMEOUT = 4002
+CLOSE_TOO_MANY_CONNECTIONS = 4008
+CLOSE_SLOW_CONSUMER = 4009
+
+# Sec-WebSocket-Protocol value -> wire format
+SUBPROTOCOLS = {
+    "carenest.msgpack": "msgpack",
+    "carenest.json": "json",
+}
+WIRE_FORMATS = ("json", "msgpack")
+
+METRICS_KEY_PREFIX = "ws:metrics:"
+METRICS_TTL_SECONDS = 24 * 3600
+
+# group -> Counter, flushed to Redis by whichever socket heartbeats next
+_metrics = defaultdict(Counter)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record_metric(group, field, amount=1):
+    if group:
+        _metrics[group][field] += amount
+
+
+def flush_metrics():
+    """Push this process's counters to Redis and reset them."""
+    if not _metrics:
+        return
+    pending = dict(_metrics)
+    _metrics.clear()
+    try:
+        pipe = get_redis().pipeline()
+        for group, counts in pending.items():
+            key = METRICS_KEY_PREFIX + group
+            for field, amount in counts.items():
+                pipe.hincrby(key, field, amount)
+            pipe.expire(key, METRICS_TTL_SECONDS)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("WebSocket metrics flush failed: %s", e)
+
+
+def get_metrics(pattern="*"):
+    """Return {group: {field: count}} for groups matching pattern."""
+    client = get_redis()
+    result = {}
+    for key in client.scan_iter(match=METRICS_KEY_PREFIX + pattern, count=500):
+        result[key[len(METRICS_KEY_PREFIX):]] = {k: int(v) for k, v in client.hgetall(key).items()}
+    return result
+
+
+def encode_frame(payload, wire_format):
+    if wire_format == "msgpack":
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload)
+
+
+def decode_frame(text_data=None, bytes_data=None):
+    """Decode an inbound frame to a dict; raises ValueError if it is not one."""
+    try:
+        if bytes_data is not None:
+            data = msgpack.unpackb(bytes_data, raw=False)
+        else:
+            data = json.loads(text_data)
+    except (ValueError, TypeError, msgpack.UnpackException):
+        raise ValueError("invalid frame")
+    if not isinstance(data, dict):
+        raise ValueError("invalid frame")
+    return data
+
+
+async def group_send(channel_layer, group, event, frames=None):
+    """
+    channel_layer.group_send that stamps the event for lag and metrics.
+
+    frames maps a frame shape (e.g. "plain", "stream") to the payload
+    consumers send for it; each is encoded here once per wire format into
+    event["frames"][format][shape].
+    """
+    event["group"] = group
+    event["sent_at"] = time.time()
+    if frames:
+        event["frames"] = {
+            fmt: {shape: encode_frame(payload, fmt) for shape, payload in frames.items()}
+            for fmt in WIRE_FORMATS
+        }
+    record_metric(group, "sent")
+    await channel_layer.group_send(group, event)
+
+
+def _connections_key(user_id, kind):
+    return f"ws:conns:{user_id}:{kind}"
+
+
+def register_connection(user_id, connection_id, kind):
+    """Add a live connection; returns the user's live connection count of that kind (0 on error)."""
+    now = time.time()
+    key = _connections_key(user_id, kind)
+    ttl = _setting("WEBSOCKET_IDLE_TIMEOUT_SECONDS", 75) * 2
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.zadd(key, {connection_id: now + ttl})
+        pipe.zcard(key)
+        pipe.expire(key, ttl)
+        return pipe.execute()[2]
+    except redis.RedisError as e:
+        logger.warning("WebSocket connection registry unavailable: %s", e)
+        return 0
+
+
+def refresh_connection(user_id, connection_id, kind):
+    ttl = _setting("WEBSOCKET_IDLE_TIMEOUT_SECONDS", 75) * 2
+    key = _connections_key(user_id, kind)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zadd(key, {connection_id: time.time() + ttl}, xx=True)
+        pipe.expire(key, ttl)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("WebSocket connection refresh failed: %s", e)
+
+
+def unregister_connection(user_id, connection_id, kind):
+    try:
+        get_redis().zrem(_connections_key(user_id, kind), connection_id)
+    except redis.RedisError as e:
+        logger.warning("WebSocket connection unregister failed: %s", e)
+
+
+class RealtimeMixin:
+    """
+    Mix into an AsyncWebsocketConsumer before it. Call open_connection(user_id)
+    before accept(), send frames with send_frame(), and call
+    close_connection() from disconnect().
+    """
+
+    # sockets whose clients answer {"action": "ping"} with {"action": "pong"}
+    send_pings = False
+    # frame shape this consumer sends, picked from event["frames"]
+    frame_shape = "plain"
+    wire_format = "json"
+
+    def connection_kind(self):
+        """What the per-user cap counts this socket with: its consumer type."""
+        return type(self).__name__
+
+    async def open_connection(self, user_id):
+        """Register the socket. Returns False (and closes) if the user is over the cap."""
+        self._rt_user_id = user_id
+        self._rt_last_activity = time.monotonic()
+        self._rt_unanswered_pings = 0
+        # coalesce key -> (encoded frame, group), newest only
+        self._rt_pending = {}
+        self._rt_closing = False
+        self._rt_kind = self.connection_kind()
+
+        count = await sync_to_async(register_connection)(user_id, self.channel_name, self._rt_kind)
+        if count > _setting("WEBSOCKET_MAX_CONNECTIONS_PER_USER", 5):
+            await sync_to_async(unregister_connection)(user_id, self.channel_name, self._rt_kind)
+            self._rt_user_id = None
+            await self.close(code=CLOSE_TOO_MANY_CONNECTIONS)
+            return False
+
+        self._rt_task = asyncio.ensure_future(self._heartbeat_loop())
+        return True
+
+    async def accept_connection(self):
+        """accept(), honouring the first wire-format subprotocol the client offered."""
+        for subprotocol in self.scope.get("subprotocols") or []:
+            if subprotocol in SUBPROTOCOLS:
+                self.wire_format = SUBPROTOCOLS[subprotocol]
+                await self.accept(subprotocol=subprotocol)
+                return
+        await self.accept()
+
+    async def close_connection(self):
+        task = getattr(self, "_rt_task", None)
+        if task:
+            task.cancel()
+        user_id = getattr(self, "_rt_user_id", None)
+        if user_id is not None:
+            await sync_to_async(unregister_connection)(user_id, self.channel_name, self._rt_kind)
+            self._rt_user_id = None
+
+    def mark_activity(self):
+        """Call for every inbound frame; a pong also clears the backlog."""
+        self._rt_last_activity = time.monotonic()
+
+    async def handle_pong(self):
+        self._rt_unanswered_pings = 0
+        await self._flush_pending()
+
+    async def _flush_pending(self):
+        pending, self._rt_pending = self._rt_pending, {}
+        for data, group in pending.values():
+            await self._write(data)
+            record_metric(group, "delivered")
+
+    async def on_heartbeat(self):
+        """Hook for subclasses/mixins that need periodic work (presence)."""
+
+    async def _heartbeat_loop(self):
+        interval = _setting("WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS", 25)
+        idle_timeout = _setting("WEBSOCKET_IDLE_TIMEOUT_SECONDS", 75)
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                if self.send_pings:
+                    if time.monotonic() - self._rt_last_activity > idle_timeout:
+                        await self.close(code=CLOSE_IDLE_TIMEOUT)
+                        return
+                    await self.send_payload({"stream": "control", "action": "ping", "ts": time.time()})
+                    self._rt_unanswered_pings += 1
+                if self._rt_pending and not self._backlog(None):
+                    await self._flush_pending()
+                await sync_to_async(refresh_connection)(self._rt_user_id, self.channel_name, self._rt_kind)
+                await self.on_heartbeat()
+                await sync_to_async(flush_metrics)()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning("WebSocket heartbeat stopped: %s", e)
+
+    def _backlog(self, event):
+        """0 keeping up, 1 behind (apply the overflow policy), 2 twice as far behind."""
+        if self.send_pings:
+            behind = self._rt_unanswered_pings
+            limit = _setting("WEBSOCKET_MAX_UNANSWERED_PINGS", 2)
+        else:
+            sent_at = (event or {}).get("sent_at")
+            if sent_at is None:
+                return 0
+            behind = time.time() - sent_at
+            limit = _setting("WEBSOCKET_SLOW_CONSUMER_LAG_SECONDS", 10)
+        if behind >= 2 * limit:
+            return 2
+        return 1 if behind >= limit else 0
+
+    async def send_frame(self, payload, event=None, coalesce_key=None):
+        """
+        Send a payload for a channel-layer event, applying the overflow policy
+        when the client is not keeping up. Uses the event's pre-encoded frame
+        for this consumer's shape when group_send() provided one.
+        """
+        if self._rt_closing:
+            return
+        group = (event or {}).get("group")
+        encoded = (event or {}).get("frames", {}).get(self.wire_format, {})
+        data = encoded.get(self.frame_shape)
+        if data is None:
+            data = encode_frame(payload, self.wire_format)
+
+        backlog = self._backlog(event)
+        if backlog:
+            policy = _setting("WEBSOCKET_OVERFLOW_POLICY", "close")
+            if policy == "coalesce" and coalesce_key is not None:
+                if coalesce_key in self._rt_pending:
+                    record_metric(group, "coalesced")
+                self._rt_pending[coalesce_key] = (data, group)
+                return
+            if policy == "close" or backlog > 1:
+                record_metric(group, "slow_closes")
+                self._rt_closing = True
+                await self.close(code=CLOSE_SLOW_CONSUMER)
+                return
+        elif self._rt_pending:
+            # caught up: deliver what was parked first, unless this frame replaces it
+            if self._rt_pending.pop(coalesce_key, None) is not None:
+                record_metric(group, "coalesced")
+            await self._flush_pending()
+
+        await self._write(data)
+        record_metric(group, "delivered")
+
+    async def send_payload(self, payload):
+        """Write one frame to the socket, bypassing backpressure (control frames)."""
+        await self._write(encode_frame(payload, self.wire_format))
+
+    async def _write(self, data):
+        if isinstance(data, bytes):
+            await self.send(bytes_data=data)
+        else:
+            await self.send(text_data=data)
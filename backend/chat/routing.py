@@ -1,9 +1,13 @@
-"""WebSocket URL routing for chat and notifications."""
+"""WebSocket URL routing for chat, notifications and live booking location."""
 from django.urls import re_path
-from .consumers import ChatConsumer
+from .consumers import ChatConsumer, UserStreamConsumer
+from bookings.consumers import BookingLocationConsumer
 from notifications.consumers import NotificationConsumer
 
 websocket_urlpatterns = [
     re_path(r"ws/chat/(?P<conversation_id>\d+)/$", ChatConsumer.as_asgi()),
     re_path(r"ws/notifications/$", NotificationConsumer.as_asgi()),
+    # single multiplexed socket: chat + presence + notifications
+    re_path(r"ws/stream/$", UserStreamConsumer.as_asgi()),
+    re_path(r"ws/bookings/(?P<booking_id>\d+)/location/$", BookingLocationConsumer.as_asgi()),
 ]
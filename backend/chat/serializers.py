@@ -14,8 +14,8 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
-        fields = ["id", "conversation", "sender_id", "sender_name", "text", "created_at"]
-        read_only_fields = ["id", "conversation", "sender", "created_at"]
+        fields = ["id", "conversation", "sender_id", "sender_name", "text", "client_id", "created_at"]
+        read_only_fields = ["id", "conversation", "sender", "client_id", "created_at"]
 
     def validate_text(self, value):
         if not (value or "").strip():
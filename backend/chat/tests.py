@@ -0,0 +1,335 @@
+import json
+import time
+from unittest.mock import patch
+
+import fakeredis
+import msgpack
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from chat.consumers import conversation_group, save_message
+from chat.models import Conversation, Message
+from chat.realtime import CLOSE_SLOW_CONSUMER, CLOSE_TOO_MANY_CONNECTIONS
+from chat.routing import websocket_urlpatterns
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class ChatSyncTests(TestCase):
+
+    def setUp(self):
+        self.careseeker = User.objects.create_user(
+            email='sita.karki@gmail.com',
+            username='sitakarki',
+            password='Sita@2081',
+            role='careseeker'
+        )
+        self.caregiver = User.objects.create_user(
+            email='ram.gurung@gmail.com',
+            username='ramgurung',
+            password='Ram@2081',
+            role='caregiver'
+        )
+        User.objects.filter(id__in=[self.careseeker.id, self.caregiver.id]).update(is_verified=True)
+        self.conversation = Conversation.objects.create(user1=self.careseeker, user2=self.caregiver)
+
+        login = self.client.post('/api/user/login/', {
+            'email': 'sita.karki@gmail.com',
+            'password': 'Sita@2081'
+        }, content_type='application/json')
+        self.token = login.data['token']
+
+    def test_retried_client_id_is_stored_once(self):
+        # a resend with the same client_id returns the first message
+        first, created = async_to_sync(save_message)(self.conversation.id, 'Namaste', self.careseeker, 'abc-1')
+        self.assertTrue(created)
+        again, created = async_to_sync(save_message)(self.conversation.id, 'Namaste', self.careseeker, 'abc-1')
+        self.assertFalse(created)
+        self.assertEqual(again.id, first.id)
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_messages_since_id(self):
+        old = Message.objects.create(conversation=self.conversation, sender=self.careseeker, text='one')
+        new = Message.objects.create(conversation=self.conversation, sender=self.caregiver, text='two')
+        response = self.client.get(
+            f'/api/chat/messages/{self.conversation.id}/?since_id={old.id}',
+            HTTP_AUTHORIZATION=f'Bearer {self.token}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([m['id'] for m in response.data], [new.id])
+
+
+    def test_conversation_list_etag_follows_the_other_participant(self):
+        from verifications.models import CaregiverVerification
+
+        def conversations(**headers):
+            return self.client.get('/api/chat/conversations/', HTTP_AUTHORIZATION=f'Bearer {self.token}', **headers)
+
+        etag = conversations()['ETag']
+        self.assertEqual(conversations(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # an approved verification changes the badge without any new message
+        CaregiverVerification.objects.create(user=self.caregiver, verification_status='approved')
+        response = conversations(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data[0]['other_user_is_verified'])
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class SocketTestCase(TestCase):
+    """Two users sharing a conversation, the socket routes and a fake Redis."""
+
+    def setUp(self):
+        patcher = patch("backend.redis_client._client", fakeredis.FakeRedis(decode_responses=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.careseeker = User.objects.create_user(
+            email='sita.karki@gmail.com', username='sitakarki', password='Sita@2081', role='careseeker'
+        )
+        self.caregiver = User.objects.create_user(
+            email='ram.gurung@gmail.com', username='ramgurung', password='Ram@2081', role='caregiver'
+        )
+        self.conversation = Conversation.objects.create(user1=self.careseeker, user2=self.caregiver)
+        self.room = conversation_group(self.conversation.id)
+        self.app = URLRouter(websocket_urlpatterns)
+
+    def communicator(self, path, user=None, subprotocols=None):
+        token = AccessToken.for_user(user or self.careseeker)
+        return WebsocketCommunicator(self.app, f"{path}?token={token}", subprotocols=subprotocols)
+
+    async def send_to_room(self, event, lag=0):
+        from channels.layers import get_channel_layer
+        event.update(group=self.room, sent_at=time.time() - lag)
+        await get_channel_layer().group_send(self.room, event)
+
+    def presence_event(self, last_seen):
+        payload = {"type": "presence", "user_id": self.caregiver.id, "is_online": False, "last_seen": last_seen}
+        return {"type": "presence_update", "conversation_id": self.conversation.id, "payload": payload}
+
+    def chat_event(self, text):
+        message = {"id": 1, "sender_id": self.caregiver.id, "text": text}
+        return {"type": "chat_message", "conversation_id": self.conversation.id, "message": message}
+
+
+
+@override_settings(
+    WEBSOCKET_OVERFLOW_POLICY="coalesce",
+    WEBSOCKET_SLOW_CONSUMER_LAG_SECONDS=10,
+    WEBSOCKET_MAX_UNANSWERED_PINGS=1,
+    WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS=3600,
+)
+class RealtimeBackpressureTests(SocketTestCase):
+
+    async def test_late_presence_is_coalesced_and_sent_before_next_on_time_frame(self):
+        ws = self.communicator(f"/ws/chat/{self.conversation.id}/")
+        connected, _ = await ws.connect()
+        self.assertTrue(connected)
+        await ws.receive_json_from()  # own presence
+
+        await self.send_to_room(self.presence_event("first"), lag=15)
+        await self.send_to_room(self.presence_event("second"), lag=15)
+        self.assertTrue(await ws.receive_nothing())
+
+        await self.send_to_room(self.chat_event("Namaste"))
+        self.assertEqual((await ws.receive_json_from())["last_seen"], "second")
+        self.assertEqual((await ws.receive_json_from())["text"], "Namaste")
+        self.assertTrue(await ws.receive_nothing())
+        await ws.disconnect()
+
+    @override_settings(WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS=0.05)
+    async def test_coalesced_presence_is_sent_on_heartbeat(self):
+        ws = self.communicator(f"/ws/chat/{self.conversation.id}/")
+        await ws.connect()
+        await ws.receive_json_from()
+
+        await self.send_to_room(self.presence_event("late"), lag=15)
+        self.assertEqual((await ws.receive_json_from(timeout=2))["last_seen"], "late")
+        await ws.disconnect()
+
+    async def test_frames_far_behind_close_the_socket(self):
+        ws = self.communicator(f"/ws/chat/{self.conversation.id}/")
+        await ws.connect()
+        await ws.receive_json_from()
+
+        await self.send_to_room(self.chat_event("late"), lag=25)
+        self.assertEqual(await ws.receive_output(), {"type": "websocket.close", "code": CLOSE_SLOW_CONSUMER})
+        await ws.disconnect()
+
+    @override_settings(
+        WEBSOCKET_OVERFLOW_POLICY="close",
+        CHANNEL_LAYERS={"default": {**IN_MEMORY_LAYER["default"], "CONFIG": {"capacity": 500}}},
+    )
+    async def test_delivered_frames_do_not_count_as_backlog(self):
+        ws = self.communicator("/ws/stream/")
+        await ws.connect()
+        await ws.send_json_to({"action": "subscribe", "conversation_id": self.conversation.id})
+        self.assertEqual((await ws.receive_json_from())["action"], "subscribed")
+
+        for i in range(300):
+            await self.send_to_room(self.chat_event(f"message {i}"))
+        for i in range(300):
+            self.assertEqual((await ws.receive_json_from())["payload"]["text"], f"message {i}")
+        await ws.disconnect()
+
+    @override_settings(WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS=0.5)
+    async def test_unanswered_ping_parks_presence_until_pong(self):
+        ws = self.communicator("/ws/stream/")
+        await ws.connect()
+        await ws.send_json_to({"action": "subscribe", "conversation_id": self.conversation.id})
+        self.assertEqual((await ws.receive_json_from())["action"], "subscribed")
+        self.assertEqual((await ws.receive_json_from(timeout=2))["action"], "ping")
+
+        await self.send_to_room(self.presence_event("parked"))
+        self.assertTrue(await ws.receive_nothing(timeout=0.2))
+
+        await ws.send_json_to({"action": "pong"})
+        self.assertEqual((await ws.receive_json_from())["payload"]["last_seen"], "parked")
+        await ws.disconnect()
+
+    @override_settings(WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS=0.05)
+    async def test_client_ignoring_pings_is_closed(self):
+        ws = self.communicator("/ws/stream/")
+        await ws.connect()
+        await ws.send_json_to({"action": "subscribe", "conversation_id": self.conversation.id})
+        await ws.receive_json_from()
+        for _ in range(2):
+            self.assertEqual((await ws.receive_json_from(timeout=2))["action"], "ping")
+
+        await self.send_to_room(self.chat_event("too late"))
+        while True:
+            output = await ws.receive_output(timeout=2)
+            if output["type"] == "websocket.close":
+                break
+        self.assertEqual(output["code"], CLOSE_SLOW_CONSUMER)
+        await ws.disconnect()
+
+
+@override_settings(WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS=3600)
+@override_settings(WEBSOCKET_MAX_CONNECTIONS_PER_USER=1)
+class ConnectionCapTests(SocketTestCase):
+
+    async def test_cap_counts_each_consumer_type(self):
+        stream = self.communicator("/ws/stream/")
+        notifications = self.communicator("/ws/notifications/")
+        self.assertTrue((await stream.connect())[0])
+        self.assertTrue((await notifications.connect())[0])
+
+        second_stream = self.communicator("/ws/stream/")
+        self.assertEqual(await second_stream.connect(), (False, CLOSE_TOO_MANY_CONNECTIONS))
+        await stream.disconnect()
+        await notifications.disconnect()
+
+    async def test_legacy_chat_sockets_are_capped_per_conversation(self):
+        other = await sync_to_async(User.objects.create_user)(
+            email='hari.thapa@gmail.com', username='haritapa', password='Hari@2081', role='caregiver'
+        )
+        second_conversation = await Conversation.objects.acreate(user1=self.careseeker, user2=other)
+        first = self.communicator(f"/ws/chat/{self.conversation.id}/")
+        second = self.communicator(f"/ws/chat/{second_conversation.id}/")
+        self.assertTrue((await first.connect())[0])
+        self.assertTrue((await second.connect())[0])
+
+        duplicate = self.communicator(f"/ws/chat/{self.conversation.id}/")
+        self.assertEqual(await duplicate.connect(), (False, CLOSE_TOO_MANY_CONNECTIONS))
+        await first.disconnect()
+        await second.disconnect()
+
+
+class UserStreamTests(SocketTestCase):
+
+    async def subscribe(self, ws, conversation_id):
+        await ws.send_json_to({"action": "subscribe", "conversation_id": conversation_id})
+        return await self.next_frame(ws)
+
+    async def next_frame(self, ws):
+        """Next frame that is not a presence update (those race with subscribe)."""
+        while True:
+            frame = await ws.receive_json_from()
+            if frame["stream"] != "presence":
+                return frame
+
+    async def test_chat_and_notifications_share_one_socket(self):
+        sita = self.communicator("/ws/stream/")
+        ram = self.communicator("/ws/stream/", user=self.caregiver)
+        self.assertTrue((await sita.connect())[0])
+        self.assertTrue((await ram.connect())[0])
+        await self.subscribe(sita, self.conversation.id)
+        self.assertEqual(
+            await self.subscribe(ram, self.conversation.id),
+            {"stream": "control", "action": "subscribed", "conversation_id": self.conversation.id},
+        )
+
+        await sita.send_json_to({
+            "action": "send", "conversation_id": self.conversation.id, "text": "Namaste", "client_id": "m-1",
+        })
+        frame = await self.next_frame(sita)
+        self.assertEqual((frame["stream"], frame["conversation_id"]), ("chat", self.conversation.id))
+        self.assertEqual(frame["payload"]["text"], "Namaste")
+        # the recipient gets the message and its notification on the same socket
+        frames = {f["stream"]: f for f in [await self.next_frame(ram), await self.next_frame(ram)]}
+        self.assertEqual(frames["chat"]["payload"], frame["payload"])
+        self.assertEqual(frames["notification"]["payload"]["type"], "message")
+
+        await ram.send_json_to({"action": "sync", "conversation_id": self.conversation.id, "since_id": 0})
+        self.assertEqual((await self.next_frame(ram))["payload"]["client_id"], "m-1")
+        synced = await self.next_frame(ram)
+        self.assertEqual((synced["action"], synced["has_more"]), ("synced", False))
+        await sita.disconnect()
+        await ram.disconnect()
+
+    async def test_subscriptions_are_checked(self):
+        outsider = await sync_to_async(User.objects.create_user)(
+            email='hari.thapa@gmail.com', username='harithapa', password='Hari@2081', role='careseeker'
+        )
+        ws = self.communicator("/ws/stream/", user=outsider)
+        await ws.connect()
+        self.assertEqual((await self.subscribe(ws, self.conversation.id))["error"], "forbidden")
+
+        await ws.send_json_to({"action": "send", "conversation_id": self.conversation.id, "text": "hi"})
+        self.assertEqual((await self.next_frame(ws))["error"], "not_subscribed")
+        await ws.send_json_to({"action": "dance"})
+        self.assertEqual((await self.next_frame(ws))["error"], "unknown_action")
+        self.assertFalse(await Message.objects.aexists())
+        await ws.disconnect()
+
+    async def test_bad_token_is_rejected(self):
+        ws = WebsocketCommunicator(self.app, "/ws/stream/?token=nope")
+        connected, code = await ws.connect()
+        self.assertEqual((connected, code), (False, 4001))
+
+
+@override_settings(WEBSOCKET_HEARTBEAT_INTERVAL_SECONDS=3600)
+class WireFormatTests(SocketTestCase):
+
+    async def test_msgpack_subprotocol(self):
+        ws = self.communicator("/ws/stream/", subprotocols=["carenest.msgpack", "carenest.json"])
+        self.assertEqual(await ws.connect(), (True, "carenest.msgpack"))
+
+        # binary in, binary out
+        await ws.send_to(bytes_data=msgpack.packb({"action": "subscribe", "conversation_id": self.conversation.id}))
+        frame = msgpack.unpackb(await ws.receive_from())
+        self.assertEqual(frame, {"stream": "control", "action": "subscribed", "conversation_id": self.conversation.id})
+        await ws.send_to(bytes_data=b"\xc1")
+        self.assertEqual(msgpack.unpackb(await ws.receive_from())["error"], "invalid_frame")
+        await ws.disconnect()
+
+    async def test_json_and_msgpack_clients_share_a_room(self):
+        packed = self.communicator(f"/ws/chat/{self.conversation.id}/", subprotocols=["carenest.msgpack"])
+        plain = self.communicator(f"/ws/chat/{self.conversation.id}/", user=self.caregiver, subprotocols=["v2"])
+        await packed.connect()
+        self.assertEqual(await plain.connect(), (True, None))
+        await packed.send_to(bytes_data=msgpack.packb({"text": "Namaste", "client_id": "m-1"}))
+
+        received = []
+        for ws, decode in ((packed, msgpack.unpackb), (plain, json.loads)):
+            frame = decode(await ws.receive_from())
+            while frame.get("type") == "presence":
+                frame = decode(await ws.receive_from())
+            received.append(frame)
+        self.assertEqual(received[0], received[1])
+        self.assertEqual((received[0]["text"], received[0]["client_id"]), ("Namaste", "m-1"))
+        await packed.disconnect()
+        await plain.disconnect()
@@ -7,6 +7,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from backend.conditional import ConditionalGetMixin
 from .models import Conversation, Message
 from .serializers import ConversationListSerializer, MessageSerializer
 from backend.error_messages import ErrorMessages
@@ -56,7 +57,7 @@ class ChatStartView(APIView):
         )
 
 
-class ConversationListView(APIView):
+class ConversationListView(ConditionalGetMixin, APIView):
     """
     List all conversations for the logged-in user.
 
@@ -64,6 +65,21 @@ class ConversationListView(APIView):
     """
     permission_classes = [IsAuthenticated]
 
+    def get_validators(self, request):
+        user = request.user
+        # the list also shows each participant's name, avatar and verification badge
+        state = Conversation.objects.filter(models.Q(user1=user) | models.Q(user2=user)).aggregate(
+            count=models.Count("id", distinct=True),
+            last_message_id=Max("messages__id"),
+            user1_modified=Max("user1__updated_at"),
+            user2_modified=Max("user2__updated_at"),
+            profile1_modified=Max("user1__profile__updated_at"),
+            profile2_modified=Max("user2__profile__updated_at"),
+            verification1_modified=Max("user1__verification__updated_at"),
+            verification2_modified=Max("user2__verification__updated_at"),
+        )
+        return tuple(state.values()), None
+
     def get(self, request):
         user = request.user
         qs = Conversation.objects.filter(
@@ -81,6 +97,7 @@ class MessageListView(APIView):
     Fetch messages for a conversation.
 
     GET /api/chat/messages/<conversation_id>/
+    GET /api/chat/messages/<conversation_id>/?since_id=42   (only newer messages)
 
     User must be a participant in the conversation.
     """
@@ -102,6 +119,15 @@ class MessageListView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        messages = conv.messages.all().order_by("created_at")
+        messages = conv.messages.select_related("sender").order_by("created_at")
+        since_id = request.query_params.get("since_id")
+        if since_id:
+            try:
+                messages = messages.filter(id__gt=int(since_id)).order_by("id")
+            except ValueError:
+                return Response(
+                    {"error": "since_id must be a message id."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
         serializer = MessageSerializer(messages, many=True)
         return Response(serializer.data)
@@ -1,8 +1,8 @@
 """
 WebSocket consumer for real-time notifications.
 Users connect to ws://host/ws/notifications/?token=<jwt>
+(offer the "carenest.msgpack" subprotocol for binary MessagePack frames)
 """
-import json
 from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
@@ -12,12 +12,14 @@ import logging
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import UntypedToken
 
+from chat.realtime import RealtimeMixin
+
 logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
 
-class NotificationConsumer(AsyncWebsocketConsumer):
+class NotificationConsumer(RealtimeMixin, AsyncWebsocketConsumer):
     """Handles WebSocket connections for user notifications."""
 
     async def connect(self):
@@ -35,18 +37,21 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             return
 
         self.user_id = user.id
+        if not await self.open_connection(user.id):
+            return
         self.room_name = f"notifications_user_{user.id}"
 
         await self.channel_layer.group_add(self.room_name, self.channel_name)
-        await self.accept()
+        await self.accept_connection()
 
     async def disconnect(self, close_code):
+        await self.close_connection()
         if hasattr(self, "room_name"):
             await self.channel_layer.group_discard(self.room_name, self.channel_name)
 
     async def notification_new(self, event):
         """Send new notification to the WebSocket."""
-        await self.send(text_data=json.dumps(event["notification"]))
+        await self.send_frame(event["notification"], event)
 
     @database_sync_to_async
     def _get_user_from_token(self, token_str):
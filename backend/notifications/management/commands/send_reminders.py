@@ -0,0 +1,29 @@
+import time
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications import reminders
+
+
+class Command(BaseCommand):
+    help = "Send 'booking starting soon' reminders from the Redis deadline index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run a single tick and exit.")
+        parser.add_argument("--interval", type=int, default=settings.REMINDER_TICK_SECONDS)
+
+    def handle(self, *args, **options):
+        rebuilt = reminders.rebuild()
+        self.stdout.write(f"Reminder index rebuilt from {rebuilt} accepted booking(s).")
+        while True:
+            try:
+                sent = reminders.tick()
+                if sent:
+                    self.stdout.write(f"Sent reminders for {sent} booking(s).")
+            except redis.RedisError as e:
+                self.stderr.write(f"Reminder tick failed: {e}")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
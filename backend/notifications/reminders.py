@@ -0,0 +1,172 @@
+"""
+"Starting soon" reminders for accepted bookings.
+
+Upcoming reminders live in one Redis sorted set used as a deadline index:
+
+    reminders:due                      member "<booking_id>:<minutes>", score = unix time to fire
+    reminders:sent:<booking_id>:<min>  marker so a reminder goes out once
+
+The Booking post_save signal adds a booking's reminders when it becomes
+accepted and removes them for any other status, so the worker never scans
+the bookings table. Each tick (manage.py send_reminders) pops the members
+that are due, loads just those bookings, and sends the family and the
+caregiver a Notification plus WebSocket/push in one batch. On startup the
+worker rebuilds the index from accepted bookings that have not started yet.
+"""
+import logging
+import time
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+DUE_KEY = "reminders:due"
+SENT_TTL_SECONDS = 2 * 86400
+BATCH_SIZE = 200
+
+
+def _offsets():
+    return sorted(settings.REMINDER_OFFSETS_MINUTES, reverse=True)
+
+
+def _member(booking_id, minutes):
+    return f"{booking_id}:{minutes}"
+
+
+def _sent_key(booking_id, minutes):
+    return f"reminders:sent:{booking_id}:{minutes}"
+
+
+def _reminder_times(booking, now):
+    """{member: fire_at} for reminders still worth sending."""
+    start = booking.start_datetime.timestamp()
+    if start <= now:
+        return {}
+    times = {}
+    offsets = _offsets()
+    for i, minutes in enumerate(offsets):
+        fire_at = start - minutes * 60
+        # past this reminder and the next one too: only the later one goes out
+        later = offsets[i + 1:]
+        if later and now >= start - later[0] * 60:
+            continue
+        times[_member(booking.pk, minutes)] = max(fire_at, now)
+    return times
+
+
+def schedule(booking, client=None):
+    """Add (or drop) a booking's reminders to match its status."""
+    try:
+        client = client or get_redis()
+        if booking.status != "accepted":
+            client.zrem(DUE_KEY, *[_member(booking.pk, m) for m in _offsets()])
+            return
+        times = _reminder_times(booking, time.time())
+        if times:
+            client.zadd(DUE_KEY, times, nx=True)
+    except redis.RedisError as e:
+        logger.warning("Reminder scheduling failed for booking %s: %s", booking.pk, e)
+
+
+def rebuild():
+    """Re-add reminders for every accepted booking that has not started (worker startup)."""
+    from bookings.models import Booking
+
+    today = timezone.localdate()
+    bookings = Booking.objects.filter(status="accepted", date__gte=today - timedelta(days=1))
+    client = get_redis()
+    pipe = client.pipeline()
+    now = time.time()
+    count = 0
+    for booking in bookings.only("id", "status", "date", "start_time"):
+        times = _reminder_times(booking, now)
+        if times:
+            pipe.zadd(DUE_KEY, times, nx=True)
+            count += 1
+    pipe.execute()
+    return count
+
+
+def _claim_due(client, now):
+    """Pop due members; ZREM decides which worker owns each one."""
+    members = client.zrangebyscore(DUE_KEY, "-inf", now, start=0, num=BATCH_SIZE)
+    if not members:
+        return []
+    pipe = client.pipeline()
+    for member in members:
+        pipe.zrem(DUE_KEY, member)
+    claimed = [m for m, removed in zip(members, pipe.execute()) if removed]
+
+    pipe = client.pipeline()
+    for member in claimed:
+        booking_id, minutes = member.split(":")
+        pipe.set(_sent_key(booking_id, minutes), 1, nx=True, ex=SENT_TTL_SECONDS)
+    return [
+        tuple(int(part) for part in m.split(":"))
+        for m, first_time in zip(claimed, pipe.execute())
+        if first_time
+    ]
+
+
+def _reminder_text(booking, minutes_left, other_party):
+    when = "now" if minutes_left <= 1 else f"in {minutes_left} minutes"
+    return f"Your booking with {other_party} on {booking.date} starts {when}."
+
+
+def tick():
+    """Send every reminder that is due. Returns the number of bookings reminded."""
+    from bookings.models import Booking
+    from .models import Notification
+    from .serializers import NotificationSerializer
+    from .signals import _broadcast_notification_to_user, _get_user_push_token
+    from .utils import send_push_notification
+
+    client = get_redis()
+    due = _claim_due(client, time.time())
+    if not due:
+        return 0
+
+    bookings = Booking.objects.select_related("family", "caregiver").in_bulk(
+        {booking_id for booking_id, _ in due}
+    )
+    now = timezone.now()
+    notifications = []
+    for booking_id, minutes in due:
+        booking = bookings.get(booking_id)
+        if booking is None or booking.status != "accepted" or booking.start_datetime <= now:
+            continue
+        minutes_left = round((booking.start_datetime - now).total_seconds() / 60)
+        title = "Booking starting soon"
+        notifications += [
+            Notification(
+                user=booking.family,
+                type="booking",
+                title=title,
+                message=_reminder_text(booking, minutes_left, booking.caregiver.username),
+                related_id=booking.id,
+            ),
+            Notification(
+                user=booking.caregiver,
+                type="booking",
+                title=title,
+                message=_reminder_text(booking, minutes_left, booking.family.username),
+                related_id=booking.id,
+            ),
+        ]
+
+    for n in Notification.objects.bulk_create(notifications):
+        _broadcast_notification_to_user(n.user_id, NotificationSerializer(n).data)
+        push_token = _get_user_push_token(n.user)
+        if push_token:
+            send_push_notification(
+                token=push_token,
+                title=n.title,
+                body=n.message,
+                data={"type": n.type, "related_id": n.related_id},
+            )
+    return len(notifications) // 2
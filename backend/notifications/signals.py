@@ -7,6 +7,9 @@ from django.utils import timezone
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
+from chat.realtime import group_send
+
+from . import reminders
 from .models import Notification
 from .utils import send_push_notification
 from bookings.models import Booking
@@ -48,23 +51,25 @@ def _broadcast_notification_to_user(user_id, notification_data):
     """Send notification payload to user's notification WebSocket channel."""
     channel_layer = get_channel_layer()
     if channel_layer:
-        async_to_sync(channel_layer.group_send)(
+        async_to_sync(group_send)(
+            channel_layer,
             f"notifications_user_{user_id}",
             {"type": "notification_new", "notification": notification_data},
+            frames={
+                "plain": notification_data,
+                "stream": {"stream": "notification", "payload": notification_data},
+            },
         )
 
 
 @receiver(pre_save, sender=Booking)
 def _store_previous_booking_status(instance, **kwargs):
-    """Store previous status before save for delta detection."""
+    """Store previous status (and date, for bookings/schedule.py) before save for delta detection."""
+    instance._previous_status = instance._previous_date = None
     if instance.pk:
-        try:
-            old = Booking.objects.get(pk=instance.pk)
-            instance._previous_status = old.status
-        except Booking.DoesNotExist:
-            instance._previous_status = None
-    else:
-        instance._previous_status = None
+        old = Booking.objects.filter(pk=instance.pk).values("status", "date").first()
+        if old:
+            instance._previous_status, instance._previous_date = old["status"], old["date"]
 
 
 def _create_and_broadcast(user, ntype, title, message, related_id):
@@ -116,6 +121,8 @@ def on_booking_change(instance, created, **kwargs):
     old_status = getattr(instance, "_previous_status", None)
     if old_status == instance.status:
         return
+    if getattr(instance, "_grouped_notification", False):
+        return  # a booking series notifies once for all its visits (bookings/series.py)
 
     if instance.status == "accepted":
         caregiver_name = _display_username(instance.caregiver) or "your caregiver"
@@ -188,6 +195,15 @@ def on_booking_change(instance, created, **kwargs):
         )
 
 
+@receiver(post_save, sender=Booking)
+def on_booking_schedule_reminders(instance, created, **kwargs):
+    """Keep the booking's "starting soon" reminders in step with its status."""
+    if created and instance.status != "accepted":
+        return  # nothing scheduled yet
+    if created or getattr(instance, "_previous_status", None) != instance.status:
+        reminders.schedule(instance)
+
+
 @receiver(post_save, sender=Booking)
 def on_booking_mobile_push(instance, created, **kwargs):
     try:
@@ -206,6 +222,8 @@ def on_booking_mobile_push(instance, created, **kwargs):
 
         if getattr(booking, "_previous_status", None) == booking.status:
             return
+        if getattr(booking, "_grouped_notification", False):
+            return
 
         if booking.status == 'pending':
             send_mobile_push(
@@ -0,0 +1,84 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from unittest.mock import patch
+from datetime import timedelta
+from accounts.models import User
+from bookings.models import Booking
+from notifications import reminders
+from notifications.models import Notification
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    REMINDER_OFFSETS_MINUTES=(60, 15),
+)
+class ReminderTests(TestCase):
+
+    def setUp(self):
+        import fakeredis
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        patcher = patch('backend.redis_client._client', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.family = User.objects.create_user(
+            email='gita.thapa@gmail.com', username='gitathapa', password='Gita@2081', role='careseeker'
+        )
+        self.caregiver = User.objects.create_user(
+            email='suman.rai@gmail.com', username='sumanrai', password='Suman@2081', role='caregiver'
+        )
+
+    def _booking(self, starts_in, status='accepted'):
+        start = timezone.localtime(timezone.now(), timezone.get_fixed_timezone(345)) + starts_in
+        return Booking.objects.create(
+            family=self.family, caregiver=self.caregiver, date=start.date(),
+            start_time=start.time().replace(second=0, microsecond=0), duration_hours=2, status=status,
+        )
+
+    def _due(self):
+        return self.redis.zrange(reminders.DUE_KEY, 0, -1, withscores=True)
+
+    def test_accept_schedules_and_status_change_removes(self):
+        booking = self._booking(timedelta(hours=3), status='pending')
+        self.assertEqual(self._due(), [])
+
+        booking.status = 'accepted'
+        booking.save()
+        start = booking.start_datetime.timestamp()
+        self.assertEqual(
+            self._due(), [(f'{booking.pk}:60', start - 3600), (f'{booking.pk}:15', start - 900)]
+        )
+
+        booking.status = 'expired'
+        booking.save()
+        self.assertEqual(self._due(), [])
+
+    def test_only_the_nearest_missed_offset_is_kept(self):
+        # accepted 10 minutes before the start: the 60-minute reminder is skipped,
+        # the 15-minute one is due now
+        booking = self._booking(timedelta(minutes=10))
+        [(member, fire_at)] = self._due()
+        self.assertEqual(member, f'{booking.pk}:15')
+        self.assertLessEqual(fire_at, timezone.now().timestamp())
+
+    def test_due_reminder_sent_once(self):
+        booking = self._booking(timedelta(minutes=10))
+        self.assertEqual(reminders.tick(), 1)
+        self.assertEqual(
+            set(Notification.objects.filter(title='Booking starting soon').values_list('user_id', flat=True)),
+            {self.family.id, self.caregiver.id},
+        )
+
+        # nothing left to claim, and a re-added member hits the sent marker
+        self.assertEqual(reminders.tick(), 0)
+        reminders.schedule(booking)
+        self.assertEqual(len(self._due()), 1)
+        self.assertEqual(reminders.tick(), 0)
+        self.assertEqual(Notification.objects.filter(title='Booking starting soon').count(), 2)
+
+    def test_tick_rechecks_status(self):
+        booking = self._booking(timedelta(minutes=10))
+        # changed without the signal, so the member is still in the index
+        Booking.objects.filter(pk=booking.pk).update(status='rejected')
+        self.assertEqual(reminders.tick(), 0)
+        self.assertEqual(self._due(), [])
+        self.assertFalse(Notification.objects.filter(title='Booking starting soon').exists())
@@ -1,27 +1,36 @@
 # API for getting notifications and marking them read
+from django.db.models import Count, Max, Q
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
+from backend.conditional import ConditionalGetMixin
 from .models import Notification
 from .serializers import NotificationSerializer
 
 
-class NotificationListView(APIView):
+class NotificationListView(ConditionalGetMixin, APIView):
     # returns all notifications for the logged-in user
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        qs = (
-            Notification.objects.filter(user=request.user)
-            .order_by("-created_at")
-            .distinct()
-        )
+    def get_queryset(self, request):
+        qs = Notification.objects.filter(user=request.user)
         # can filter by type if they want (booking, payment, message)
         ntype = request.query_params.get("type", "").strip().lower()
         if ntype in ("booking", "payment", "message"):
             qs = qs.filter(type=ntype)
+        return qs
+
+    def get_validators(self, request):
+        # new, deleted and newly read notifications all change one of these
+        state = self.get_queryset(request).aggregate(
+            count=Count("id"), last_id=Max("id"), unread=Count("id", filter=Q(is_read=False))
+        )
+        return tuple(state.values()), None
+
+    def get(self, request):
+        qs = self.get_queryset(request).order_by("-created_at").distinct()
         serializer = NotificationSerializer(qs, many=True)
         return Response({"notifications": serializer.data})
 
@@ -1,19 +1,25 @@
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, Max
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from backend.conditional import ConditionalGetMixin
 from bookings.models import Booking
 from .models import Review
 
 from rest_framework.generics import ListAPIView
 from .serializers import ReviewSerializer
 from backend.error_messages import ErrorMessages
-class ReviewListView(ListAPIView):
+class ReviewListView(ConditionalGetMixin, ListAPIView):
     # shows all reviews for a caregiver with average rating
     serializer_class = ReviewSerializer
 
+    def get_validators(self, request, caregiver_id):
+        # reviews are never edited, only added or removed
+        state = Review.objects.filter(caregiver_id=caregiver_id).aggregate(count=Count("id"), last_id=Max("id"))
+        return tuple(state.values()), None
+
     def get_queryset(self):
         caregiver_id = self.kwargs["caregiver_id"]
         return Review.objects.filter(caregiver_id=caregiver_id)
@@ -42,6 +42,7 @@ class CaregiverVerification(models.Model):
     )
     rejection_reason = models.TextField(blank=True, null=True)  # admin provides reason on reject
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     verified_at = models.DateTimeField(null=True, blank=True)  # timestamp of admin decision
     verified_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,